@@ -3,12 +3,20 @@ import logging
 import argparse
 import pandas as pd
 import reporting.calc as cal
+import reporting.utils as utl
 import reporting.export as exp
 import reporting.analyze as az
 import reporting.tbapi as tbapi
 import reporting.dictionary as dct
 import reporting.vendormatrix as vm
 import reporting.importhandler as ih
+import reporting.worker as wk
+import reporting.pipeline as pl
+import reporting.shard as sh
+import reporting.profiler as prf
+import reporting.history as hst
+
+log_handlers = []
 
 
 def set_log():
@@ -16,15 +24,21 @@ def set_log():
                                   '[%(levelname)8s] %(message)s')
     log = logging.getLogger()
     log.setLevel(logging.INFO)
+    for handler in log_handlers:
+        log.removeHandler(handler)
+        handler.close()
+    del log_handlers[:]
 
     console = logging.StreamHandler(sys.stdout)
     console.setFormatter(formatter)
     log.addHandler(console)
+    log_handlers.append(console)
 
     try:
         log_file = logging.FileHandler('logfile.log', mode='w')
         log_file.setFormatter(formatter)
         log.addHandler(log_file)
+        log_handlers.append(log_file)
     except PermissionError as e:
         logging.warning('Could not open logfile with error: \n {}'.format(e))
 
@@ -55,7 +69,34 @@ def get_args(arguments=None):
     parser.add_argument('--exp', choices=['all', 'db', 'ftp'])
     parser.add_argument('--tab', action='store_true')
     parser.add_argument('--basic', action='store_true')
-    if arguments:
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--stream', action='store_true', help=(
+        'Spool each finished vendor frame to disk until the merge, and '
+        'write the output file in row blocks after calculate_cost.  The '
+        'merged frame is still held in memory for calculate_cost.'))
+    parser.add_argument('--cache', action='store_true')
+    parser.add_argument('--chunksize', type=int, default=None, help=(
+        'Read and process raw files in chunks of this many rows.  Vendors '
+        'with row-wise transforms only are chunked, and the processed '
+        'chunks are spooled with --stream.'))
+    parser.add_argument('--vendor')
+    parser.add_argument('--pipeline', action='store_true')
+    parser.add_argument('--shards', type=int, default=0)
+    parser.add_argument('--shardworkers', type=int, default=0)
+    parser.add_argument('--shardworker', action='store_true')
+    parser.add_argument('--spill-memory', '--max-memory', help=(
+        'Resident memory (e.g. 4G) above which vendor frames held by '
+        'vm_loop and text columns during calculate_cost are spilled to '
+        'disk.  Not a cap: merging vendors, the output, exports and '
+        'analysis still hold the full frame.'))
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--sparse', action='store_true')
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--history', action='store_true')
+    parser.add_argument('--worker', action='store_true')
+    parser.add_argument('--watch', action='store_true')
+    parser.add_argument('--submit', action='store_true')
+    if arguments is not None:
         args, unknown = parser.parse_known_args(arguments.split())
     else:
         args, unknown = parser.parse_known_args()
@@ -65,46 +106,106 @@ def get_args(arguments=None):
 OUTPUT_FILE = 'Raw Data Output.csv'
 
 
-def main(arguments=None):
-    set_log()
-    args = get_args(arguments)
+def process(args):
     if args.update == 'all' or args.update == 'vm':
-        vm.vm_update()
+        with prf.stage('vm_update'):
+            vm.vm_update()
     if args.update == 'all' or args.update == 'dct':
-        dct.dict_update()
+        with prf.stage('dict_update'):
+            dct.dict_update()
     df = pd.DataFrame()
     matrix = vm.VendorMatrix()
-    if args.api:
-        api = ih.ImportHandler(args.api, matrix)
-        api.api_loop()
-    if args.ftp:
-        ftp = ih.ImportHandler(args.ftp, matrix)
-        ftp.ftp_loop()
-    if args.dbi:
-        dbi = ih.ImportHandler(args.dbi, matrix)
-        dbi.db_loop()
-    if args.s3:
-        s3 = ih.ImportHandler(args.s3, matrix)
-        s3.s3_loop()
+    if args.pipeline and not args.noprocess:
+        pipeline = pl.Pipeline(args, matrix)
+        with prf.stage('pipeline'):
+            df = pipeline.run()
+    else:
+        for arg, loop in [(args.api, 'api_loop'), (args.ftp, 'ftp_loop'),
+                          (args.dbi, 'db_loop'), (args.s3, 's3_loop')]:
+            if arg:
+                import_handler = ih.ImportHandler(arg, matrix)
+                with prf.stage(loop):
+                    getattr(import_handler, loop)()
+        if not args.noprocess and args.shards > 1:
+            with prf.stage('vm_loop'):
+                df = sh.vm_loop_sharded(
+                    matrix, args.shards, args.shardworkers,
+                    stream=args.stream, cache=args.cache,
+                    chunksize=args.chunksize, vendors=args.vendor,
+                    compact=args.compact, sparse=args.sparse)
+        elif not args.noprocess:
+            with prf.stage('vm_loop'):
+                df = matrix.vm_loop(processes=args.processes,
+                                    stream=args.stream, cache=args.cache,
+                                    chunksize=args.chunksize,
+                                    vendors=args.vendor, compact=args.compact,
+                                    sparse=args.sparse)
     if not args.noprocess:
-        df = matrix.vm_loop()
-        df = cal.calculate_cost(df)
+        with prf.stage('calculate_cost'):
+            df = cal.calculate_cost(df)
         try:
             logging.info('Writing to: {}'.format(OUTPUT_FILE))
-            df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8')
+            with prf.stage('write_output'):
+                if args.stream:
+                    utl.write_csv_chunks(df, OUTPUT_FILE)
+                else:
+                    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8')
             logging.info('Final Output Successfully generated')
         except IOError:
             logging.warning('{} could not be opened.  '
                             'Final Output not updated.'.format(OUTPUT_FILE))
     if args.exp:
         exp_class = exp.ExportHandler()
-        exp_class.export_loop(args.exp)
+        with prf.stage('export_loop'):
+            exp_class.export_loop(args.exp)
     if args.tab:
         tb = tbapi.TabApi()
-        tb.refresh_extract()
+        with prf.stage('refresh_extract'):
+            tb.refresh_extract()
     if args.analyze:
-        aly = az.Analyze(df=df, file_name=OUTPUT_FILE, matrix=matrix)
-        aly.do_all_analysis()
+        aly = az.Analyze(df=utl.dense_columns(df), file_name=OUTPUT_FILE,
+                         matrix=matrix)
+        with prf.stage('analyze'):
+            aly.do_all_analysis()
+
+
+def main(arguments=None):
+    set_log()
+    args = get_args(arguments)
+    if args.worker or args.submit:
+        if arguments is None:
+            arguments = ' '.join(sys.argv[1:])
+        if args.submit:
+            wk.submit_job(arguments)
+        else:
+            watch = wk.strip_args(arguments) if args.watch else None
+            wk.Worker(main, watch=watch).run()
+        return None
+    utl.set_csv_cache(args.cache)
+    if args.shardworker:
+        sh.ShardWorker().run(exit_when_empty=False)
+        return None
+    if args.history:
+        hst.RunHistory().query()
+        return None
+    utl.set_spill_memory(args.spill_memory)
+    prf.start(memory=args.profile)
+    status = hst.FAILED
+    try:
+        process(args)
+        status = hst.FINISHED
+    except SystemExit as e:
+        if not e.code:
+            status = hst.FINISHED
+        raise
+    finally:
+        report = prf.get_report()
+        prf.stop()
+        if args.profile:
+            prf.write_report(report)
+        if arguments is None:
+            arguments = ' '.join(sys.argv[1:])
+        hst.add_run(report, arguments, status)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,128 @@
+import os
+import shutil
+import logging
+import tempfile
+import pandas as pd
+import reporting.utils as utl
+from pandas.api.types import union_categoricals
+
+
+class FrameAccumulator(object):
+    spool_prefix = 'processor_spool_'
+
+    def __init__(self, columns=None, stream=False, path=None, key_cols=None):
+        self.columns = columns if columns else []
+        self.stream = stream
+        self.path = path
+        self.key_cols = key_cols
+        self.spool_dir = None
+        self.spilled = 0
+        self.frames = []
+        self.key_frames = []
+
+    def add(self, key, df):
+        if df is None:
+            return None
+        if self.key_cols:
+            self.key_frames.append(
+                df.reindex(columns=self.key_cols).drop_duplicates())
+        if not self.stream and utl.memory_check('adding {}'.format(key)):
+            self.spill_all()
+        if self.stream:
+            df = self.spill(key, df)
+        self.frames.append(df)
+
+    def add_columns(self, columns):
+        self.columns.extend(x for x in columns if x not in self.columns)
+
+    def spill_all(self):
+        frames = [x for x in self.frames if isinstance(x, pd.DataFrame)]
+        if frames:
+            logging.info('Spilling {} accumulated frames with {} rows to '
+                         'disk.'.format(len(frames),
+                                        sum(len(x) for x in frames)))
+        self.frames = [self.spill('frame {}'.format(idx), x)
+                       if isinstance(x, pd.DataFrame) else x
+                       for idx, x in enumerate(self.frames)]
+        self.stream = True
+
+    def spill(self, key, df):
+        if self.spool_dir is None:
+            if self.path:
+                os.makedirs(self.path, exist_ok=True)
+            self.spool_dir = tempfile.mkdtemp(prefix=self.spool_prefix,
+                                              dir=self.path)
+        file_name = os.path.join(self.spool_dir,
+                                 '{}.pkl'.format(self.spilled))
+        self.spilled += 1
+        df.to_pickle(file_name)
+        logging.info('Spilled {} rows of {} ({}) to {}'.format(
+            len(df), key, utl.bytes_to_size(os.path.getsize(file_name)),
+            file_name))
+        return file_name
+
+    @staticmethod
+    def load(frame):
+        if isinstance(frame, pd.DataFrame):
+            return frame
+        df = pd.read_pickle(frame)
+        os.remove(frame)
+        return df
+
+    @staticmethod
+    def union_categories(frames):
+        cat_cols = set(col for df in frames for col in df.columns
+                       if pd.api.types.is_categorical_dtype(df[col]))
+        for col in cat_cols:
+            sers = [df[col] for df in frames if col in df and len(df)]
+            categories = None
+            if sers and all(pd.api.types.is_categorical_dtype(x)
+                            for x in sers):
+                try:
+                    categories = union_categoricals(
+                        sers, sort_categories=True).categories
+                except TypeError:
+                    logging.debug('Categories of {} could not be '
+                                  'combined.'.format(col))
+            for idx, df in enumerate(frames):
+                if categories is None:
+                    if col in df:
+                        df[col] = df[col].astype(object)
+                    continue
+                if col in df:
+                    df[col] = df[col].astype('category').cat.set_categories(
+                        categories)
+                else:
+                    df[col] = pd.Categorical([None] * len(df),
+                                             categories=categories)
+        return frames
+
+    def get(self):
+        frames = [self.load(x) for x in self.frames]
+        if self.columns:
+            frames.insert(0, pd.DataFrame(columns=self.columns))
+            self.columns = []
+        frames = self.union_categories(frames)
+        if not frames:
+            df = pd.DataFrame()
+        elif len(frames) == 1:
+            df = frames[0]
+        else:
+            df = pd.concat(frames, ignore_index=True, sort=True)
+        self.frames = [df]
+        self.remove_spool()
+        return df
+
+    def get_keys(self):
+        if not self.key_frames:
+            return pd.DataFrame()
+        df = pd.concat(self.key_frames, ignore_index=True, sort=False)
+        df = df.drop_duplicates().reset_index(drop=True)
+        self.key_frames = [df]
+        logging.debug('Collected {} unique key rows.'.format(len(df)))
+        return df
+
+    def remove_spool(self):
+        if self.spool_dir and os.path.isdir(self.spool_dir):
+            shutil.rmtree(self.spool_dir)
+        self.spool_dir = None
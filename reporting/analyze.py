@@ -11,6 +11,7 @@ import seaborn as sns
 import datetime as dt
 import reporting.calc as cal
 import reporting.utils as utl
+import reporting.profiler as prf
 import reporting.vmcolumns as vmc
 import reporting.expcolumns as exc
 import reporting.vendormatrix as vm
@@ -86,10 +87,11 @@ class Analyze(object):
         self.analysis_dict.append(base_dict)
 
     def check_delivery(self, df):
-        plan_names = self.matrix.vendor_set(vm.plan_key)[vmc.fullplacename]
-        df = df.groupby(plan_names).apply(lambda x: 0 if x[dctc.PNC].sum() == 0
-                                          else x[vmc.cost].sum() /
-                                          x[dctc.PNC].sum())
+        plan_names = self.matrix.vendor_param(vm.plan_key,
+                                              vmc.fullplacename)
+        df = df.groupby(plan_names, observed=True).apply(
+            lambda x: 0 if x[dctc.PNC].sum() == 0
+            else x[vmc.cost].sum() / x[dctc.PNC].sum()).sort_index()
         f_df = df[df > 1]
         if f_df.empty:
             delivery_msg = 'Nothing has delivered in full.'
@@ -119,6 +121,7 @@ class Analyze(object):
 
     @staticmethod
     def get_rolling_mean_df(df, value_col, group_cols):
+        df = utl.expand_columns(df, group_cols)
         pdf = pd.pivot_table(df, index=vmc.date, columns=group_cols,
                              values=value_col, aggfunc=np.sum)
         if len(pdf.columns) > 10000:
@@ -134,7 +137,8 @@ class Analyze(object):
         return df
 
     def project_delivery_completion(self, df):
-        plan_names = self.matrix.vendor_set(vm.plan_key)[vmc.fullplacename]
+        plan_names = self.matrix.vendor_param(vm.plan_key,
+                                              vmc.fullplacename)
         average_df = self.get_rolling_mean_df(
             df=df, value_col=vmc.cost, group_cols=plan_names)
         if average_df.empty:
@@ -148,7 +152,8 @@ class Analyze(object):
             dt.datetime.today() - dt.timedelta(days=1), '%Y-%m-%d')
         average_df = average_df[average_df[vmc.date] == last_date]
         average_df = average_df.drop(columns=[vmc.cost])
-        df = df.groupby(plan_names)[vmc.cost, dctc.PNC].sum()
+        df = df.groupby(plan_names, observed=True)[vmc.cost, dctc.PNC].sum()
+        df = df.sort_index()
         df = df[df[dctc.PNC] - df[vmc.cost] > 0]
         df = df.reset_index()
         if df.empty:
@@ -207,8 +212,9 @@ class Analyze(object):
                                   message=update_msg, data=df.to_dict())
 
     def check_plan_error(self, df):
-        plan_names = self.matrix.vendor_set(vm.plan_key)[vmc.fullplacename]
-        er = self.matrix.vendor_set(vm.plan_key)[vmc.filenameerror]
+        plan_names = self.matrix.vendor_param(vm.plan_key,
+                                              vmc.fullplacename)
+        er = self.matrix.vendor_param(vm.plan_key, vmc.filenameerror)
         edf = utl.import_read_csv(er, utl.error_path)
         if edf.empty:
             plan_error_msg = ('No Planned error - all {} '
@@ -297,7 +303,7 @@ class Analyze(object):
                 logging.warning('{} not in df columns'.format(group))
                 columns = group + metrics
                 return pd.DataFrame({x: [] for x in columns})
-        df = df.groupby(group)[base_metrics].sum()
+        df = df.groupby(group, observed=True)[base_metrics].sum().sort_index()
         df = self.vc.calculate_all_metrics(calc_metrics, df)
         if sort:
             df = df.sort_values(sort, ascending=False)
@@ -485,12 +491,10 @@ class Analyze(object):
         df = pd.DataFrame()
         for source in data_sources:
             file_name = source.p[vmc.filename]
-            first_row = source.p[vmc.firstrow]
             missing_cols = []
             if os.path.exists(file_name):
-                tdf = utl.import_read_csv(file_name, nrows=first_row + 5)
-                tdf = utl.first_last_adj(tdf, first_row, 0)
-                cols = list(tdf.columns)
+                tdf = source.get_raw_preview()
+                cols = [] if tdf is None else list(tdf.columns)
                 active_metrics = source.get_active_metrics()
                 for k, v in active_metrics.items():
                     for c in v:
@@ -517,7 +521,8 @@ class Analyze(object):
         metrics = [x for x in metrics if x in df.columns]
         agg_map = {x: [np.min, np.max] if (x == vmc.date) else np.sum
                    for x in metrics}
-        df = df.groupby([vmc.vendorkey]).agg(agg_map)
+        df = df.groupby([vmc.vendorkey], observed=True).agg(agg_map)
+        df = df.sort_index()
         df.columns = [' - '.join(col).strip() for col in df.columns]
         df.columns = [x[:-6] if x[-6:] == ' - sum' else x for x in df.columns]
         df = df.reset_index()
@@ -553,16 +558,21 @@ class Analyze(object):
             json.dump(self.analysis_dict, fp)
 
     def do_all_analysis(self):
-        self.backup_files()
-        self.check_delivery(self.df)
-        self.check_plan_error(self.df)
-        self.project_delivery_completion(self.df)
-        self.check_raw_file_update_time()
-        self.generate_topline_and_weekly_metrics()
-        self.evaluate_on_kpis()
-        self.get_column_names_from_raw_files()
-        self.get_metrics_by_vendor_key()
-        self.write_analysis_dict()
+        for check, df_arg in [
+                (self.backup_files, False), (self.check_delivery, True),
+                (self.check_plan_error, True),
+                (self.project_delivery_completion, True),
+                (self.check_raw_file_update_time, False),
+                (self.generate_topline_and_weekly_metrics, False),
+                (self.evaluate_on_kpis, False),
+                (self.get_column_names_from_raw_files, False),
+                (self.get_metrics_by_vendor_key, False),
+                (self.write_analysis_dict, False)]:
+            with prf.stage(check.__name__):
+                if df_arg:
+                    check(self.df)
+                else:
+                    check()
 
 
 class ValueCalc(object):
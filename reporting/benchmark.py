@@ -0,0 +1,443 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+import datetime as dt
+import reporting.calc as cal
+import reporting.utils as utl
+import reporting.export as exp
+import reporting.analyze as az
+import reporting.profiler as prf
+import reporting.vmcolumns as vmc
+import reporting.expcolumns as exc
+import reporting.dictcolumns as dctc
+import reporting.vendormatrix as vm
+
+output_file = 'Raw Data Output.csv'
+log_file_name = 'logfile.log'
+translation_file = 'benchmark_translation.csv'
+merge_file = os.path.join(utl.raw_path, 'benchmark_creatives.csv')
+relational_file = 'benchmark_campaign.csv'
+start_date = dt.date(2020, 1, 1)
+transforms = ['', 'Pivot', 'DateSplit', 'Merge']
+buy_models = [(cal.BM_CPM, '4.0'), (cal.BM_CPC, '0.5'), (cal.BM_CPV, '0.05'),
+              (cal.BM_CPCV, '0.08'), (cal.BM_CPLP, '1.5'),
+              (cal.BM_CPA, '12.0'), (cal.BM_FLAT, '500.0')]
+raw_metrics = [(vmc.impressions, 'Imps', 5000), (vmc.clicks, 'Clicks', 100),
+               (vmc.cost, 'Spend', 0), (vmc.views, 'Views', 2000),
+               (vmc.views100, 'Completes', 1000),
+               (vmc.landingpage, 'Landing', 50),
+               (vmc.conv1, 'Conversions', 10)]
+pivot_metrics = ['Imps', 'Clicks', 'Spend']
+place_cols = ['Campaign', 'Vendor', 'Buy Model', 'Buy Rate', 'Ad']
+translation = [(dctc.FPN, exc.full_placement_name, 'TEXT'),
+               (dctc.CAM, 'campaignname', 'TEXT'),
+               (dctc.VEN, 'vendorname', 'TEXT'),
+               (vmc.date, exc.event_date, 'DATE'),
+               (vmc.impressions, 'impressions', 'REAL'),
+               (vmc.clicks, 'clicks', 'REAL'),
+               (cal.NCF, 'netcost', 'REAL')]
+
+
+class SyntheticProject(object):
+    def __init__(self, path, vendors=4, rows=10000, placements=200,
+                 campaigns=10, days=60, seed=0):
+        self.path = path
+        self.vendors = vendors
+        self.rows = rows
+        self.placements = placements
+        self.campaigns = campaigns
+        self.days = days
+        self.seed = seed
+        self.rng = np.random.RandomState(seed)
+        self.vm_rows = []
+
+    @staticmethod
+    def vendor_key(idx):
+        return 'Rawfile_Benchmark{}'.format(idx)
+
+    def get_params(self):
+        return {'vendors': self.vendors, 'rows': self.rows,
+                'placements': self.placements, 'campaigns': self.campaigns,
+                'days': self.days, 'seed': self.seed}
+
+    def create(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        for path in [utl.config_path, utl.raw_path, utl.dict_path,
+                     os.path.join(utl.dict_path, 'Relational'),
+                     os.path.join(utl.dict_path, 'Translational')]:
+            utl.dir_check(os.path.join(self.path, path))
+        self.vm_rows = []
+        for idx in range(self.vendors):
+            self.write_raw_file(idx)
+        self.write_merge_file()
+        self.write_matrix()
+        self.write_dictionaries()
+        self.write_configs()
+        logging.info('Created benchmark project in {} with {} vendors of {} '
+                     'rows.'.format(self.path, self.vendors, self.rows))
+
+    def get_placement_df(self, idx):
+        buy = self.rng.randint(len(buy_models), size=self.placements)
+        return pd.DataFrame({
+            'Campaign': ['Camp{}'.format(x) for x in self.rng.randint(
+                self.campaigns, size=self.placements)],
+            'Vendor': 'Vendor{}'.format(idx),
+            'Buy Model': [buy_models[x][0] for x in buy],
+            'Buy Rate': [buy_models[x][1] for x in buy],
+            'Ad': ['ad_{}'.format(x) for x in range(self.placements)]},
+            columns=place_cols)
+
+    def get_raw_df(self, idx, rows):
+        pdf = self.get_placement_df(idx)
+        df = pdf.iloc[self.rng.randint(len(pdf), size=rows)]
+        df = df.reset_index(drop=True)
+        dates = (pd.Timestamp(start_date) + pd.to_timedelta(
+            self.rng.randint(self.days, size=rows), unit='D'))
+        df.insert(0, 'Day', dates.strftime('%m/%d/%Y'))
+        for col, raw_col, high in raw_metrics:
+            if high:
+                df[raw_col] = self.rng.randint(high, size=rows)
+            else:
+                df[raw_col] = (self.rng.random_sample(rows) * 100).round(2)
+        return df
+
+    def write_raw_file(self, idx):
+        transform = transforms[idx % len(transforms)]
+        params = {vmc.date: 'Day'}
+        params.update({col: raw_col for col, raw_col, high in raw_metrics})
+        full_place_cols = place_cols[:4] + ['::Ad']
+        if transform == 'Pivot':
+            df = self.get_raw_df(idx, self.rows // len(pivot_metrics))
+            df = df.drop([x[1] for x in raw_metrics
+                          if x[1] not in pivot_metrics], axis=1)
+            df = df.melt(id_vars=['Day'] + place_cols, var_name='Metric',
+                         value_name='Value')
+            transform = 'Pivot::Metric::Value'
+            params = {vmc.date: 'Day'}
+            params.update({col: 'Value - {}'.format(raw_col)
+                           for col, raw_col, high in raw_metrics
+                           if raw_col in pivot_metrics})
+        elif transform == 'DateSplit':
+            df = self.get_raw_df(idx, self.rows)
+            df = df.rename(columns={'Day': 'Start'})
+            df.insert(1, 'End', (pd.to_datetime(df['Start']) + pd.to_timedelta(
+                self.rng.randint(3, size=len(df)), unit='D')).dt.strftime(
+                '%m/%d/%Y'))
+            transform = 'DateSplit::Start::End'
+            params[vmc.date] = 'Start'
+        else:
+            df = self.get_raw_df(idx, self.rows)
+            df['Spend'] = df['Spend'].map('${:,.2f}'.format)
+            if transform == 'Merge':
+                df['Creative ID'] = df['Ad'].str.replace('ad_', 'cr') + 'x'
+                df = df.drop('Ad', axis=1)
+                transform = 'Merge::{}::Creative ID::Creative Key'.format(
+                    merge_file)
+        file_name = 'benchmark_{}.csv'.format(idx)
+        df.to_csv(os.path.join(self.path, utl.raw_path, file_name),
+                  index=False)
+        self.add_vm_row(idx, file_name, full_place_cols, transform, params)
+
+    def write_merge_file(self):
+        df = pd.DataFrame({
+            'Creative Key': ['cr{}x'.format(x) for x in range(
+                self.placements)],
+            'Ad': ['ad_{}'.format(x) for x in range(self.placements)]})
+        df.to_csv(os.path.join(self.path, merge_file), index=False)
+
+    def add_vm_row(self, idx, file_name, full_place_cols, transform, params):
+        row = {vmc.vendorkey: self.vendor_key(idx), vmc.filename: file_name,
+               vmc.firstrow: 0, vmc.lastrow: 0,
+               vmc.fullplacename: '|'.join(full_place_cols),
+               vmc.placement: 'Campaign',
+               vmc.filenamedict: 'benchmark_dictionary_{}.csv'.format(idx),
+               vmc.filenameerror: 'benchmark_error_{}.csv'.format(idx),
+               vmc.dropcol: 'ALL', vmc.autodicplace: dctc.FPN,
+               vmc.autodicord: '|'.join([dctc.CAM, dctc.VEN, dctc.BM, dctc.BR,
+                                         dctc.CRE]),
+               vmc.transform: transform}
+        row.update({x: 'nan' for x in vmc.datacol})
+        row.update(params)
+        self.vm_rows.append(row)
+
+    def write_matrix(self):
+        rows = self.vm_rows + [{
+            vmc.vendorkey: vm.plan_key, vmc.filename: 'plan.csv',
+            vmc.firstrow: 0, vmc.lastrow: 0,
+            vmc.fullplacename: '|'.join([dctc.CAM, dctc.VEN]),
+            vmc.filenamedict: dctc.PFN,
+            vmc.filenameerror: 'plannet_error.csv', vmc.dropcol: 'ALL',
+            vmc.autodicplace: dctc.FPN,
+            vmc.autodicord: '|'.join([dctc.CAM, dctc.VEN])}]
+        df = pd.DataFrame(rows, columns=[vmc.vendorkey] + vmc.vmkeys)
+        rule = ['PRE::{}'.format(vmc.clicks), 'Campaign::Camp1', 2]
+        for col, value in zip(['RULE_1_METRIC', 'RULE_1_QUERY',
+                               'RULE_1_FACTOR'], rule):
+            df[col] = [value] + [np.nan] * (len(df) - 1)
+        df.to_csv(os.path.join(self.path, vm.csv_full_file), index=False)
+
+    def write_dictionaries(self):
+        fpn = ['Camp{}_Vendor{}'.format(x, y) for x in range(self.campaigns)
+               for y in range(self.vendors)]
+        df = pd.DataFrame({
+            dctc.FPN: fpn, dctc.PNC: (self.rng.random_sample(
+                len(fpn)) * 5000).round(2), dctc.UNC: np.nan},
+            columns=dctc.PCOLS)
+        df.to_csv(os.path.join(self.path, utl.dict_path, dctc.PFN),
+                  index=False)
+        df = pd.DataFrame({
+            dctc.CAM: ['Camp{}'.format(x) for x in range(self.campaigns)],
+            dctc.CLI: ['Client{}'.format(x % 3)
+                       for x in range(self.campaigns)],
+            dctc.PRD: ['Product{}'.format(x % 5)
+                       for x in range(self.campaigns)]})
+        df.to_csv(os.path.join(self.path, utl.dict_path, 'Relational',
+                               relational_file), index=False)
+
+    def write_configs(self):
+        config_path = os.path.join(self.path, utl.config_path)
+        pd.DataFrame({dctc.DICT_COL_NAME: [dctc.AGY],
+                      dctc.DICT_COL_VALUE: ['Benchmark Agency'],
+                      dctc.DICT_COL_DICTNAME: [np.nan]}).to_csv(
+            os.path.join(config_path, dctc.filename_con_config), index=False)
+        pd.DataFrame({dctc.RK: ['Campaign'], dctc.FN: [relational_file],
+                      dctc.KEY: [dctc.CAM],
+                      dctc.DEP: ['|'.join([dctc.CLI, dctc.PRD])],
+                      dctc.AUTO: [np.nan]}).to_csv(
+            os.path.join(config_path, dctc.filename_rel_config), index=False)
+        pd.DataFrame({dctc.DICT_COL_NAME: [dctc.CAM],
+                      dctc.DICT_COL_VALUE: ['Camp0'],
+                      dctc.DICT_COL_NVALUE: ['Campaign Zero'],
+                      dctc.DICT_COL_FNC: [np.nan],
+                      dctc.DICT_COL_SEL: [np.nan]}).to_csv(
+            os.path.join(self.path, utl.dict_path, 'Translational',
+                         dctc.filename_tran_config), index=False)
+        pd.DataFrame(translation, columns=[
+            exc.translation_df, exc.translation_db,
+            exc.translation_type]).to_csv(
+            os.path.join(config_path, translation_file), index=False)
+
+
+def get_commit():
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=path,
+            stderr=subprocess.DEVNULL).decode().strip()
+        dirty = bool(subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=path, stderr=subprocess.DEVNULL).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+class Benchmark(object):
+    def __init__(self, project, repeat=3, analyze=True, **loop_kwargs):
+        self.project = project
+        self.repeat = repeat
+        self.analyze = analyze
+        self.loop_kwargs = loop_kwargs
+
+    @staticmethod
+    def reset_state():
+        vm.placement_memo.clear()
+        utl.snapshots.clear()
+        utl.csv_memo.clear()
+        shutil.rmtree(utl.cache_path, ignore_errors=True)
+
+    def run_once(self, memory=False):
+        self.reset_state()
+        prf.start(memory=memory)
+        try:
+            matrix = vm.VendorMatrix()
+            with prf.stage('vm_loop'):
+                df = matrix.vm_loop(**self.loop_kwargs)
+            with prf.stage('calculate_cost'):
+                df = cal.calculate_cost(df)
+            with prf.stage('write_output'):
+                df.to_csv(output_file, index=False, encoding='utf-8')
+            with prf.stage('translation'):
+                exp.DFTranslation(translation_file, output_file)
+            if self.analyze:
+                aly = az.Analyze(df=utl.dense_columns(df),
+                                 file_name=output_file, matrix=matrix)
+                with prf.stage('analyze'):
+                    aly.do_all_analysis()
+            report = prf.get_report()
+        finally:
+            prf.stop()
+        report['output_rows'] = len(df)
+        return report
+
+    def get_stage_rows(self, key):
+        vendor_keys = [self.project.vendor_key(x)
+                       for x in range(self.project.vendors)]
+        if key in vendor_keys:
+            return self.project.rows
+        return self.project.rows * self.project.vendors
+
+    def combine(self, timed, memory):
+        stages = {}
+        for report in timed:
+            for x in report['stages']:
+                stage = stages.setdefault((x['stage'], x['key']), {
+                    'stage': x['stage'], 'key': x['key'], 'calls': x['calls'],
+                    'wall': x['wall'], 'cpu': x['cpu'], 'peak_memory': 0})
+                stage['wall'] = min(stage['wall'], x['wall'])
+                stage['cpu'] = min(stage['cpu'], x['cpu'])
+        for x in memory['stages']:
+            if (x['stage'], x['key']) in stages:
+                stages[(x['stage'], x['key'])]['peak_memory'] = (
+                    x['peak_memory'])
+        for stage in stages.values():
+            stage['rows'] = self.get_stage_rows(stage['key'])
+            stage['rows_per_second'] = (round(stage['rows'] / stage['wall'], 1)
+                                        if stage['wall'] else None)
+            stage['wall'] = round(stage['wall'], 4)
+            stage['cpu'] = round(stage['cpu'], 4)
+        return sorted(stages.values(), key=lambda x: (x['stage'],
+                                                      str(x['key'])))
+
+    def run(self):
+        cur_path = os.getcwd()
+        self.project.create()
+        os.chdir(self.project.path)
+        log = logging.getLogger()
+        log_file = logging.FileHandler(log_file_name, mode='w')
+        log.addHandler(log_file)
+        try:
+            logging.info('Running benchmark warm up.')
+            self.run_once()
+            timed = []
+            for idx in range(self.repeat):
+                logging.info('Running benchmark {} of {}.'.format(
+                    idx + 1, self.repeat))
+                timed.append(self.run_once())
+            logging.info('Running benchmark with memory tracing.')
+            memory = self.run_once(memory=True)
+        finally:
+            log.removeHandler(log_file)
+            log_file.close()
+            os.chdir(cur_path)
+        commit, dirty = get_commit()
+        report = {
+            'commit': commit, 'dirty': dirty,
+            'date': dt.datetime.now().isoformat(),
+            'python': platform.python_version(), 'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'params': dict(self.project.get_params(), repeat=self.repeat,
+                           analyze=self.analyze, **self.loop_kwargs),
+            'rows': self.project.rows * self.project.vendors,
+            'output_rows': memory['output_rows'],
+            'wall': min(x['wall'] for x in timed) if timed else None,
+            'max_rss': memory['max_rss'],
+            'stages': self.combine(timed, memory)}
+        return report
+
+
+def log_report(report, top_n=prf.top_stages):
+    logging.info('Benchmark of {} rows at commit {}{}: {} seconds, {} max '
+                 'resident memory.'.format(
+                     report['rows'], report['commit'],
+                     ' (dirty)' if report['dirty'] else '', report['wall'],
+                     utl.bytes_to_size(report['max_rss'])))
+    stages = sorted(report['stages'], key=lambda x: -x['wall'])[:top_n]
+    for x in stages:
+        logging.info('{:>9.3f}s {:>12} rows/s {:>9} peak  {}{}'.format(
+            x['wall'], x['rows_per_second'],
+            utl.bytes_to_size(x['peak_memory']), x['stage'],
+            ' [{}]'.format(x['key']) if x['key'] is not None else ''))
+
+
+def compare(base, report, threshold=.1, min_wall=.01):
+    base_stages = {(x['stage'], x['key']): x for x in base['stages']}
+    regressions = []
+    for x in report['stages']:
+        old = base_stages.get((x['stage'], x['key']))
+        if not old or max(old['wall'], x['wall']) < min_wall:
+            continue
+        change = (x['wall'] - old['wall']) / old['wall'] if old['wall'] else 0
+        if change > threshold:
+            regressions.append(dict(x, base_wall=old['wall'],
+                                    change=round(change, 3)))
+    if base['params'] != report['params']:
+        logging.warning('Benchmark parameters differ from the base run.')
+    logging.info('Compared against {} run at commit {}: {} of {} stages '
+                 'slower by more than {:.0%}.'.format(
+                     base['date'], base['commit'], len(regressions),
+                     len(report['stages']), threshold))
+    for x in sorted(regressions, key=lambda y: -y['change']):
+        logging.warning('{:>+8.1%} {:>9.3f}s -> {:>9.3f}s  {}{}'.format(
+            x['change'], x['base_wall'], x['wall'], x['stage'],
+            ' [{}]'.format(x['key']) if x['key'] is not None else ''))
+    return regressions
+
+
+def get_args(arguments=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vendors', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--placements', type=int, default=200)
+    parser.add_argument('--campaigns', type=int, default=10)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--noanalyze', action='store_true')
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--chunksize', type=int, default=None)
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--sparse', action='store_true')
+    parser.add_argument('--path')
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    parser.add_argument('--threshold', type=float, default=.1)
+    if arguments is not None:
+        return parser.parse_args(arguments.split())
+    return parser.parse_args()
+
+
+def main(arguments=None):
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s [%(module)14s]'
+                               '[%(levelname)8s] %(message)s')
+    args = get_args(arguments)
+    path = args.path
+    if not path:
+        path = tempfile.mkdtemp(prefix='processor_benchmark_')
+    project = SyntheticProject(path, args.vendors, args.rows, args.placements,
+                               args.campaigns, args.days, args.seed)
+    benchmark = Benchmark(project, args.repeat, not args.noanalyze,
+                          processes=args.processes, chunksize=args.chunksize,
+                          compact=args.compact, sparse=args.sparse)
+    try:
+        report = benchmark.run()
+    finally:
+        if not args.path:
+            shutil.rmtree(path)
+    output = args.output
+    if not output:
+        output = 'benchmark_{}.json'.format((report['commit'] or 'local')[:10])
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logging.info('Benchmark written to {}'.format(output))
+    log_report(report)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            base = json.load(f)
+        if compare(base, report, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import os
+import json
+import hashlib
+import logging
+import datetime as dt
+import pandas as pd
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+
+cache_version = 1
+vendor_path = os.path.join(utl.cache_path, 'vendors/')
+index_file = 'index.json'
+
+
+def file_hash(file_name):
+    md5 = hashlib.md5()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def file_stat(file_name):
+    if not os.path.isfile(file_name):
+        return None
+    stat = os.stat(file_name)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def file_content(file_name):
+    if not os.path.isfile(file_name):
+        return None
+    return file_hash(file_name)
+
+
+def dir_content(dir_name):
+    if not os.path.isdir(dir_name):
+        return None
+    return {x: file_content(os.path.join(dir_name, x))
+            for x in sorted(os.listdir(dir_name))}
+
+
+def transform_files(transform):
+    if str(transform) == 'nan':
+        return []
+    files = []
+    for t in transform.split(':::'):
+        t = t.split('::')
+        if t[0] == 'Merge':
+            files.append(t[1])
+    return files
+
+
+class VendorCache(object):
+    def __init__(self, path=vendor_path):
+        self.path = path
+        utl.dir_check(self.path)
+        self.index_file = os.path.join(self.path, index_file)
+        self.index = self.read()
+        self.hits = []
+        self.added = []
+
+    def read(self):
+        if not os.path.isfile(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except ValueError:
+            logging.warning('{} unreadable.  Vendor cache ignored.'.format(
+                self.index_file))
+            return {}
+        if index.get('version') != cache_version:
+            return {}
+        return index.get('vendors', {})
+
+    def write(self):
+        tmp_file = '{}.tmp'.format(self.index_file)
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': cache_version, 'vendors': self.index}, f)
+        os.replace(tmp_file, self.index_file)
+
+    @staticmethod
+    def fingerprint(vk, params, vm_rules):
+        dict_path = utl.dict_path
+        tran_path = os.path.join(dict_path, 'Translational/')
+        inputs = {
+            'key': vk,
+            'today': dt.date.today().isoformat(),
+            'params': params,
+            'rules': vm_rules,
+            'raw': file_stat(params[vmc.filename]),
+            'dictionary': file_content(
+                os.path.join(dict_path, str(params[vmc.filenamedict]))),
+            'relational_config': file_content(
+                os.path.join(utl.config_path, dctc.filename_rel_config)),
+            'relational': dir_content(os.path.join(dict_path, 'Relational/')),
+            'constant_config': file_content(
+                os.path.join(utl.config_path, dctc.filename_con_config)),
+            'translation_config': file_content(
+                os.path.join(tran_path, dctc.filename_tran_config)),
+            'merge': {x: file_stat(x)
+                      for x in transform_files(params[vmc.transform])}}
+        inputs = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.md5(inputs.encode('utf-8')).hexdigest()
+
+    def file_name(self, vk):
+        name = hashlib.md5(vk.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, '{}.pkl'.format(name))
+
+    def check(self, vk, fingerprint):
+        if vk not in self.index:
+            return False
+        if self.index[vk]['fingerprint'] != fingerprint:
+            return False
+        return os.path.isfile(self.file_name(vk))
+
+    def has(self, vk):
+        return vk in self.index and os.path.isfile(self.file_name(vk))
+
+    def get(self, vk):
+        logging.info('Loading {} from vendor cache.'.format(vk))
+        self.hits.append(vk)
+        return pd.read_pickle(self.file_name(vk))
+
+    def add(self, vk, df):
+        if df is None:
+            return None
+        file_name = self.file_name(vk)
+        tmp_file = '{}.tmp'.format(file_name)
+        df.to_pickle(tmp_file)
+        os.replace(tmp_file, file_name)
+        self.added.append(vk)
+
+    def prune(self, vendor_keys):
+        stale_keys = [x for x in self.index if x not in vendor_keys]
+        for vk in stale_keys:
+            del self.index[vk]
+            file_name = self.file_name(vk)
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+        if stale_keys:
+            logging.info('Removed {} from vendor cache.'.format(
+                ', '.join(stale_keys)))
+
+    def update_index(self, matrix):
+        for vk in self.added:
+            fingerprint = self.fingerprint(vk, matrix.vendor_set(vk),
+                                           matrix.vm_rules_dict)
+            self.index[vk] = {'fingerprint': fingerprint,
+                              'updated': dt.datetime.now().isoformat()}
+        self.added = []
+        self.prune(matrix.vm_df[vmc.vendorkey].tolist())
+        self.write()
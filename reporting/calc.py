@@ -1,7 +1,10 @@
+import os
 import logging
+import tempfile
 import numpy as np
 import pandas as pd
 import reporting.utils as utl
+import reporting.profiler as prf
 import reporting.vmcolumns as vmc
 import reporting.dictcolumns as dctc
 
@@ -55,12 +58,25 @@ NC_CUM_SUM_MIN_DATE = 'NC_CUMSUMMINDATE'
 NC_CUM_SUM_COL = [vmc.date, NC_CUM_SUM]
 NC_SUM_DATE_COL = [vmc.date, NC_SUM_DATE]
 
+DENSE_COLS = [vmc.impressions, vmc.clicks, vmc.cost, vmc.views, vmc.views100,
+              vmc.landingpage, vmc.view_imps, vmc.engagements, vmc.conv1,
+              vmc.newuser, vmc.signup, vmc.dcm_service_fee] + vmc.ad_rep_cols
+
 DROP_COL = ([CLI_PD, NC_CUM_SUM, NC_SUM_DATE, PLACE_DATE,
              NC_CUM_SUM_MIN_DATE] + DIF_COL)
 
+SPILL_ROW = 'Spill Row'
+CALC_COLS = ([dctc.FPN, dctc.PFPN, dctc.PN, dctc.BM, dctc.BR, dctc.BR2,
+              dctc.BR3, dctc.BR4, dctc.BR5, dctc.PD, dctc.PD2, dctc.PD3,
+              dctc.PD4, dctc.PD5, dctc.UNC, dctc.PNC, dctc.AGF,
+              vmc.vendorkey] + vmc.datacol + vmc.ad_rep_cols)
+
 
 def clicks_by_place_date(df):
-    df[dctc.PN] = df[dctc.PN].replace(np.nan, 'None')
+    if pd.api.types.is_categorical_dtype(df[dctc.PN]):
+        df[dctc.PN] = utl.fill_category(df[dctc.PN], 'None')
+    else:
+        df[dctc.PN] = df[dctc.PN].replace(np.nan, 'None')
     df[PLACE_DATE] = (df[vmc.date].astype('U') + df[dctc.PN].astype('U'))
     df_cpd = df.loc[df[dctc.BM].isin([BM_FLAT, BM_FLAT2, BM_FLATIMP])]
     if not df_cpd.empty:
@@ -172,7 +188,7 @@ def net_plan_comp(df, p_col=dctc.PFPN, n_cost=vmc.cost, p_cost=dctc.PNC):
     df = utl.data_to_type(df, float_col=[p_cost])
     df[p_cost] = df[p_cost].fillna(0)
     nc_pnc = df[df[dctc.UNC] != True]
-    nc_pnc = nc_pnc.groupby(p_col)[p_cost, n_cost].sum()
+    nc_pnc = nc_pnc.groupby(p_col, observed=True)[p_cost, n_cost].sum()
     nc_pnc = nc_pnc[nc_pnc[p_cost] > 0]
     if p_cost not in nc_pnc.columns:
         nc_pnc[p_cost] = 0
@@ -184,7 +200,7 @@ def net_plan_comp(df, p_col=dctc.PFPN, n_cost=vmc.cost, p_cost=dctc.PNC):
 
 
 def net_cum_sum(df, p_col=dctc.PFPN, n_cost=vmc.cost):
-    nc_cum_sum = (df.groupby([p_col, vmc.date])[n_cost].sum()
+    nc_cum_sum = (df.groupby([p_col, vmc.date], observed=True)[n_cost].sum()
                   .groupby(level=[0]).cumsum()).reset_index()
     nc_cum_sum.columns = [p_col] + NC_CUM_SUM_COL
     df = df.merge(nc_cum_sum, on=[p_col, vmc.date], how='left')
@@ -192,14 +208,15 @@ def net_cum_sum(df, p_col=dctc.PFPN, n_cost=vmc.cost):
 
 
 def net_sum_date(df, p_col=dctc.PFPN, n_cost=vmc.cost):
-    nc_sum_date = df.groupby([p_col, vmc.date])[n_cost].sum().reset_index()
+    nc_sum_date = (df.groupby([p_col, vmc.date], observed=True)[n_cost]
+                   .sum().reset_index())
     nc_sum_date.columns = [p_col] + NC_SUM_DATE_COL
     df = df.merge(nc_sum_date, on=[p_col, vmc.date], how='left')
     return df
 
 
 def net_cost_final(df, p_col=dctc.PFPN, n_cost=vmc.cost):
-    tdf = (df[df[NC_CUM_SUM] > df[DIF_PNC]].groupby([p_col]).
+    tdf = (df[df[NC_CUM_SUM] > df[DIF_PNC]].groupby([p_col], observed=True).
            min().reset_index())
     if not tdf.empty:
         tdf = tdf[[vmc.date, p_col]]
@@ -298,18 +315,75 @@ class MetricCap(object):
 
     def apply_all_caps(self, df):
         if self.config:
+            df = utl.dense_columns(df)
             for cfg in self.config:
                 c = self.config[cfg]
                 df = self.apply_cap(df, c)
         return df
 
 
+class ColumnSpill(object):
+    def __init__(self):
+        self.file_name = None
+        self.columns = []
+
+    @staticmethod
+    def get_spill_columns(df):
+        cap = MetricCap()
+        cap_cols = [c[x] for c in cap.config.values()
+                    for x in [cap.proc_dim, cap.proc_metric]]
+        return [x for x in df.columns if df[x].dtype == object
+                and x not in CALC_COLS + cap_cols]
+
+    def check(self, df, stage):
+        if self.file_name or not utl.memory_check(stage):
+            return df
+        spill_cols = self.get_spill_columns(df)
+        if not spill_cols:
+            return df
+        self.columns = df.columns.tolist()
+        handle, self.file_name = tempfile.mkstemp(prefix='processor_spill_',
+                                                  suffix='.pkl')
+        os.close(handle)
+        sdf = df[spill_cols]
+        sdf.index = np.arange(len(df))
+        sdf.to_pickle(self.file_name)
+        df = df.drop(spill_cols, axis=1)
+        df[SPILL_ROW] = np.arange(len(df))
+        logging.info('Spilled {} columns with {} rows ({}) to {} before '
+                     '{}.'.format(len(spill_cols), len(sdf), utl.bytes_to_size(
+                         os.path.getsize(self.file_name)), self.file_name,
+                                  stage))
+        return df
+
+    def restore(self, df):
+        if not self.file_name:
+            return df
+        sdf = pd.read_pickle(self.file_name)
+        os.remove(self.file_name)
+        self.file_name = None
+        logging.info('Restoring {} spilled columns.'.format(len(sdf.columns)))
+        sdf = sdf.loc[df[SPILL_ROW].astype(int).values].reset_index(drop=True)
+        df = df.drop(SPILL_ROW, axis=1).reset_index(drop=True)
+        df = pd.concat([df, sdf], axis=1)
+        cols = [x for x in self.columns if x in df.columns]
+        cols += [x for x in df.columns if x not in cols]
+        return df[cols]
+
+
 def calculate_cost(df):
     if vmc.cost not in df.columns:
         df[vmc.cost] = 0
-    df = net_cost_calculation(df)
-    df = MetricCap().apply_all_caps(df)
-    df = net_cost_final_calculation(df)
-    df = agency_fees_calculation(df)
-    df = total_cost_calculation(df)
+    df = utl.dense_columns(df, DENSE_COLS)
+    spill = ColumnSpill()
+    for stage, calc_fnc in [('net cost', net_cost_calculation),
+                            ('metric cap', MetricCap().apply_all_caps),
+                            ('net cost final', net_cost_final_calculation),
+                            ('agency fees', agency_fees_calculation),
+                            ('total cost', total_cost_calculation)]:
+        df = spill.check(df, stage)
+        with prf.stage(stage):
+            df = calc_fnc(df)
+    df = spill.restore(df)
+    utl.log_conversions()
     return df
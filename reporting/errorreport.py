@@ -9,7 +9,8 @@ csvpath = utl.error_path
 
 
 class ErrorReport(object):
-    def __init__(self, df, dic, pn, filename, merge_col=dctc.FPN):
+    def __init__(self, df, dic, pn, filename, merge_col=dctc.FPN,
+                 write=True):
         utl.dir_check(csvpath)
         if str(filename) == 'nan':
             logging.error('No error report file provided.  Aborting.')
@@ -19,6 +20,7 @@ class ErrorReport(object):
         self.pn = pn
         self.filename = filename
         self.merge_col = merge_col
+        self.write_file = write
         self.merge_df = None
         self.data_err = None
         self.dictionary = None
@@ -30,7 +32,8 @@ class ErrorReport(object):
         else:
             self.dictionary = self.dic.get()
         self.data_err = self.create()
-        self.write(self.filename)
+        if self.write_file:
+            self.write(self.filename)
 
     def create(self):
         if isinstance(self.merge_col, list):
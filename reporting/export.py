@@ -11,6 +11,7 @@ import datetime as dt
 import sqlalchemy as sqa
 import reporting.ftp as ftp
 import reporting.utils as utl
+import reporting.profiler as prf
 import reporting.models as mdl
 import reporting.awss3 as awss3
 import reporting.expcolumns as exc
@@ -35,7 +36,8 @@ class ExportHandler(object):
     def export_loop(self, args):
         self.args = args
         for exp_key in self.export_list:
-            self.export_item_check_type(exp_key)
+            with prf.stage('export', exp_key):
+                self.export_item_check_type(exp_key)
 
     def export_item_check_type(self, exp_key):
         if (self.config[exc.export_type][exp_key] == 'DB' and
@@ -538,6 +540,7 @@ class DFTranslation(object):
         self.upload_id = None
         self.load_translation(self.full_config_file)
         self.load_df(self.data_file)
+        prf.count('export_rows', len(self.df))
 
     def load_translation(self, config_file):
         df = pd.read_csv(config_file)
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import logging
+import pandas as pd
+import datetime as dt
+import reporting.utils as utl
+
+history_file = os.path.join(utl.config_path, 'run_history.db')
+history_runs = 30
+top_vendors = 10
+connector_prefix = 'connector '
+
+FINISHED = 'finished'
+FAILED = 'failed'
+
+
+class RunHistory(object):
+    def __init__(self, file_name=history_file):
+        self.file_name = file_name
+        if os.path.dirname(self.file_name):
+            utl.dir_check(os.path.dirname(self.file_name))
+        self.create()
+
+    def connect(self):
+        con = sqlite3.connect(self.file_name, timeout=60)
+        return con
+
+    def create(self):
+        con = self.connect()
+        with con:
+            con.execute("""CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start TEXT, wall REAL, max_rss INTEGER, arguments TEXT,
+                status TEXT)""")
+            con.execute("""CREATE TABLE IF NOT EXISTS vendors (
+                run INTEGER, vendor_key TEXT, rows_read INTEGER,
+                rows_output INTEGER, file_size INTEGER, wall REAL)""")
+            con.execute("""CREATE TABLE IF NOT EXISTS stages (
+                run INTEGER, stage TEXT, key TEXT, calls INTEGER, wall REAL,
+                self_wall REAL, cpu REAL, peak_memory INTEGER)""")
+            con.execute("""CREATE TABLE IF NOT EXISTS connectors (
+                run INTEGER, connector TEXT, vendor_key TEXT,
+                invocations INTEGER, wall REAL, rows INTEGER)""")
+            con.execute("""CREATE TABLE IF NOT EXISTS exports (
+                run INTEGER, export_key TEXT, rows INTEGER, wall REAL)""")
+        con.close()
+
+    @staticmethod
+    def get_counter(report, name):
+        return {x['key']: x['value'] for x in report['counters']
+                if x['name'] == name}
+
+    @staticmethod
+    def get_keyed_stages(report, match):
+        stages = {}
+        for x in report['stages']:
+            name = x['stage'].split('/')[-1]
+            if x['key'] is None or not match(name):
+                continue
+            stage = stages.setdefault((name, x['key']), {'calls': 0,
+                                                         'wall': 0.})
+            stage['calls'] += x['calls']
+            stage['wall'] += x['wall']
+        return stages
+
+    def get_vendor_rows(self, report):
+        rows_read = self.get_counter(report, 'rows_read')
+        rows_output = self.get_counter(report, 'rows_output')
+        file_size = self.get_counter(report, 'file_size')
+        walls = self.get_keyed_stages(report, lambda x: x == 'vendor')
+        keys = set(rows_output) | set(rows_read) | set(x[1] for x in walls)
+        return [(key, rows_read.get(key), rows_output.get(key),
+                 file_size.get(key), walls.get(('vendor', key), {}).get(
+                     'wall')) for key in sorted(keys)]
+
+    def get_connector_rows(self, report):
+        import_rows = self.get_counter(report, 'import_rows')
+        stages = self.get_keyed_stages(
+            report, lambda x: x.startswith(connector_prefix))
+        return [(name[len(connector_prefix):], key, x['calls'], x['wall'],
+                 import_rows.get(key)) for (name, key), x in stages.items()]
+
+    def get_export_rows(self, report):
+        export_rows = self.get_counter(report, 'export_rows')
+        stages = self.get_keyed_stages(report, lambda x: x == 'export')
+        return [(key, export_rows.get(key), x['wall'])
+                for (name, key), x in stages.items()]
+
+    def add_run(self, report, arguments=None, status=FINISHED):
+        con = self.connect()
+        with con:
+            cur = con.execute(
+                'INSERT INTO runs (start, wall, max_rss, arguments, status) '
+                'VALUES (?, ?, ?, ?, ?)', (report['start'], report['wall'],
+                                           report['max_rss'], arguments,
+                                           status))
+            run_id = cur.lastrowid
+            con.executemany(
+                'INSERT INTO vendors VALUES (?, ?, ?, ?, ?, ?)',
+                [(run_id,) + x for x in self.get_vendor_rows(report)])
+            con.executemany(
+                'INSERT INTO stages VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(run_id, x['stage'], x['key'], x['calls'], x['wall'],
+                  x['self_wall'], x['cpu'], x['peak_memory'])
+                 for x in report['stages']])
+            con.executemany(
+                'INSERT INTO connectors VALUES (?, ?, ?, ?, ?, ?)',
+                [(run_id,) + x for x in self.get_connector_rows(report)])
+            con.executemany(
+                'INSERT INTO exports VALUES (?, ?, ?, ?)',
+                [(run_id,) + x for x in self.get_export_rows(report)])
+        con.close()
+        logging.info('Run {} ({}) added to {}'.format(run_id, status,
+                                                      self.file_name))
+        return run_id
+
+    def read_table(self, table, runs=history_runs):
+        con = self.connect()
+        df = pd.read_sql(
+            'SELECT runs.start, t.* FROM {} t JOIN runs ON t.run = runs.id '
+            'WHERE t.run > (SELECT MAX(id) FROM runs) - ? '
+            'ORDER BY t.run'.format(table), con, params=[runs])
+        con.close()
+        df['start'] = pd.to_datetime(df['start'])
+        return df
+
+    def get_failed_runs(self, runs=history_runs):
+        con = self.connect()
+        df = pd.read_sql(
+            'SELECT id, start, wall, arguments FROM runs '
+            'WHERE status = ? AND id > (SELECT MAX(id) FROM runs) - ? '
+            'ORDER BY id', con, params=[FAILED, runs])
+        con.close()
+        return df
+
+    @staticmethod
+    def get_growth(df, key_col, value_col):
+        df = df.dropna(subset=[value_col])
+        df = df.groupby(key_col).agg({'start': ['first', 'last'],
+                                      value_col: ['first', 'last', 'count']})
+        df.columns = ['first_run', 'last_run', 'first', 'last', 'runs']
+        days = (df['last_run'] - df['first_run']) / dt.timedelta(days=1)
+        df['growth'] = (df['last'] / df['first'].where(df['first'] > 0)) - 1
+        df['per_day'] = (df['last'] - df['first']) / days.where(days > 0)
+        df = df.drop(['first_run', 'last_run'], axis=1)
+        return df.sort_values('growth', ascending=False)
+
+    def get_slowest_vendors(self, df, top_n=top_vendors):
+        df = df.dropna(subset=['wall'])
+        sdf = df.groupby('vendor_key').agg(
+            {'wall': ['mean', 'max', 'last'], 'rows_output': 'last'})
+        sdf.columns = ['mean_wall', 'max_wall', 'last_wall', 'rows_output']
+        sdf['rows_per_second'] = sdf['rows_output'] / sdf['last_wall']
+        sdf = sdf.join(self.get_growth(df, 'vendor_key', 'wall')[['growth']])
+        return sdf.sort_values('mean_wall', ascending=False).head(top_n)
+
+    @staticmethod
+    def get_slowest_connectors(df, top_n=top_vendors):
+        df = df.groupby(['connector', 'vendor_key']).agg(
+            {'invocations': 'sum', 'wall': ['sum', 'last'], 'rows': 'last'})
+        df.columns = ['invocations', 'wall', 'last_wall', 'rows']
+        df['latency'] = df['wall'] / df['invocations']
+        return df.sort_values('latency', ascending=False).head(top_n)
+
+    def query(self, runs=history_runs, top_n=top_vendors):
+        vdf = self.read_table('vendors', runs)
+        if vdf.empty:
+            logging.warning('No runs recorded in {}'.format(self.file_name))
+            return None
+        logging.info('Slowest vendors over the last {} runs:\n{}'.format(
+            runs, self.get_slowest_vendors(vdf, top_n).to_string()))
+        for col in ['rows_read', 'file_size']:
+            gdf = self.get_growth(vdf, 'vendor_key', col).head(top_n)
+            logging.info('Fastest growing vendors by {}:\n{}'.format(
+                col, gdf.to_string()))
+        cdf = self.read_table('connectors', runs)
+        if not cdf.empty:
+            logging.info('Slowest connectors by wall per invocation:\n'
+                         '{}'.format(self.get_slowest_connectors(
+                             cdf, top_n).to_string()))
+        fdf = self.get_failed_runs(runs)
+        if not fdf.empty:
+            logging.warning('{} of the last {} runs failed:\n{}'.format(
+                len(fdf), runs, fdf.to_string(index=False)))
+        edf = self.read_table('exports', runs)
+        if not edf.empty:
+            gdf = self.get_growth(edf, 'export_key', 'rows').head(top_n)
+            logging.info('Fastest growing exports by rows:\n{}'.format(
+                gdf.to_string()))
+
+
+def add_run(report, arguments=None, status=FINISHED, file_name=history_file):
+    try:
+        return RunHistory(file_name).add_run(report, arguments, status)
+    except sqlite3.Error as e:
+        logging.warning('Could not add run to {} with error: {}'.format(
+            file_name, e))
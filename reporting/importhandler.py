@@ -1,5 +1,6 @@
 import os
 import time
+import functools
 import logging
 import pandas as pd
 import datetime as dt
@@ -34,6 +35,7 @@ import reporting.afapi as afapi
 import reporting.export as export
 import reporting.vmcolumns as vmc
 import reporting.utils as utl
+import reporting.profiler as prf
 
 
 class ImportHandler(object):
@@ -51,6 +53,7 @@ class ImportHandler(object):
             full_file = filename
         else:
             full_file = os.path.join(utl.raw_path, filename)
+        prf.count('import_rows', len(api_df))
         self.write_df(api_df, full_file)
 
     def write_df(self, api_df, full_file, attempt=0):
@@ -118,30 +121,34 @@ class ImportHandler(object):
                 sd = ed - dt.timedelta(days=max_date)
         return sd
 
-    def api_calls(self, key_list, api_class):
+    def api_call(self, vk, api_class):
+        params = self.matrix.vendor_set(vk)
+        api_class.input_config(params[vmc.apifile])
+        start_check = self.date_check(params[vmc.startdate])
+        end_check = self.date_check(params[vmc.enddate])
+        if params[vmc.apifields] == ['nan']:
+            params[vmc.apifields] = None
+        if start_check:
+            params[vmc.startdate] = None
+        if end_check:
+            params[vmc.enddate] = None
+        params[vmc.startdate] = self.set_start(params[vmc.startdate],
+                                               params[vmc.enddate],
+                                               params[vmc.apimerge])
+        df = api_class.get_data(sd=params[vmc.startdate],
+                                ed=params[vmc.enddate],
+                                fields=params[vmc.apifields])
+        self.output(df, params[vmc.filename], params[vmc.apimerge],
+                    params[vmc.firstrow], params[vmc.lastrow],
+                    params[vmc.date], params[vmc.startdate],
+                    params[vmc.enddate])
+
+    def api_calls(self, key_list, api_class, name='api'):
         for vk in key_list:
-            params = self.matrix.vendor_set(vk)
-            api_class.input_config(params[vmc.apifile])
-            start_check = self.date_check(params[vmc.startdate])
-            end_check = self.date_check(params[vmc.enddate])
-            if params[vmc.apifields] == ['nan']:
-                params[vmc.apifields] = None
-            if start_check:
-                params[vmc.startdate] = None
-            if end_check:
-                params[vmc.enddate] = None
-            params[vmc.startdate] = self.set_start(params[vmc.startdate],
-                                                   params[vmc.enddate],
-                                                   params[vmc.apimerge])
-            df = api_class.get_data(sd=params[vmc.startdate],
-                                    ed=params[vmc.enddate],
-                                    fields=params[vmc.apifields])
-            self.output(df, params[vmc.filename], params[vmc.apimerge],
-                        params[vmc.firstrow], params[vmc.lastrow],
-                        params[vmc.date], params[vmc.startdate],
-                        params[vmc.enddate])
+            with prf.stage('connector {}'.format(name), vk):
+                self.api_call(vk, api_class)
 
-    def api_loop(self):
+    def get_apis(self):
         apis = [('fb', self.matrix.api_fb_key, fbapi.FbApi),
                 ('aw', self.matrix.api_aw_key, awapi.AwApi),
                 ('tw', self.matrix.api_tw_key, twapi.TwApi),
@@ -168,56 +175,100 @@ class ImportHandler(object):
                 ('sam', self.matrix.api_sam_key, samapi.SamApi),
                 ('gs', self.matrix.api_gs_key, gsapi.GsApi),
                 ('qt', self.matrix.api_qt_key, qtapi.QtApi)]
-        for api in apis:
+        return apis
+
+    def api_loop(self):
+        for api in self.get_apis():
             if self.arg_check(api[0]) and api[1]:
-                self.api_calls(api[1], api[2]())
+                with prf.stage('api_calls', api[0]):
+                    self.api_calls(api[1], api[2](), api[0])
+
+    def api_tasks(self):
+        return [(api[0], self.make_tasks(api[1], self.api_call, api[2]()))
+                for api in self.get_apis()
+                if self.arg_check(api[0]) and api[1]]
+
+    @staticmethod
+    def make_tasks(key_list, call, import_class):
+        return [(vk, functools.partial(call, vk, import_class))
+                for vk in key_list]
+
+    def ftp_call(self, vk, ftp_class):
+        params = self.matrix.vendor_set(vk)
+        ftp_class.input_config(params[vmc.apifile])
+        ftp_class.header = params[vmc.firstrow]
+        df = ftp_class.get_data()
+        self.output(df, params[vmc.filename], params[vmc.apimerge],
+                    params[vmc.firstrow], params[vmc.lastrow],
+                    params[vmc.date], params[vmc.startdate],
+                    params[vmc.enddate])
 
     def ftp_load(self, ftp_key, ftp_class):
         for vk in ftp_key:
-            params = self.matrix.vendor_set(vk)
-            ftp_class.input_config(params[vmc.apifile])
-            ftp_class.header = params[vmc.firstrow]
-            df = ftp_class.get_data()
-            self.output(df, params[vmc.filename], params[vmc.apimerge],
-                        params[vmc.firstrow], params[vmc.lastrow],
-                        params[vmc.date], params[vmc.startdate],
-                        params[vmc.enddate])
+            with prf.stage('connector sz', vk):
+                self.ftp_call(vk, ftp_class)
 
     def ftp_loop(self):
         if self.arg_check('sz'):
             self.ftp_load(self.matrix.ftp_sz_key, ftp.FTP())
 
+    def ftp_tasks(self):
+        if self.arg_check('sz') and self.matrix.ftp_sz_key:
+            return [('sz', self.make_tasks(self.matrix.ftp_sz_key,
+                                           self.ftp_call, ftp.FTP()))]
+        return []
+
+    def db_call(self, vk, db_class):
+        params = self.matrix.vendor_set(vk)
+        db_class.input_config(params[vmc.apifile])
+        df = db_class.get_data(filename=params[vmc.apifields][0])
+        self.output(df, params[vmc.filename], params[vmc.apimerge],
+                    params[vmc.firstrow], params[vmc.lastrow],
+                    params[vmc.date], params[vmc.startdate],
+                    params[vmc.enddate])
+
     def db_load(self, db_key, db_class):
         for vk in db_key:
-            params = self.matrix.vendor_set(vk)
-            db_class.input_config(params[vmc.apifile])
-            df = db_class.get_data(filename=params[vmc.apifields][0])
-            self.output(df, params[vmc.filename], params[vmc.apimerge],
-                        params[vmc.firstrow], params[vmc.lastrow],
-                        params[vmc.date], params[vmc.startdate],
-                        params[vmc.enddate])
+            with prf.stage('connector dbi', vk):
+                self.db_call(vk, db_class)
 
     def db_loop(self):
         if self.arg_check('dna'):
             self.db_load(self.matrix.db_dna_key, export.DB())
 
+    def db_tasks(self):
+        if self.arg_check('dna') and self.matrix.db_dna_key:
+            return [('dbi', self.make_tasks(self.matrix.db_dna_key,
+                                            self.db_call, export.DB()))]
+        return []
+
+    def s3_call(self, vk, s3_class):
+        params = self.matrix.vendor_set(vk)
+        s3_class.input_config(params[vmc.apifile])
+        start_check = self.date_check(params[vmc.startdate])
+        end_check = self.date_check(params[vmc.enddate])
+        if start_check:
+            params[vmc.startdate] = None
+        if end_check:
+            params[vmc.enddate] = None
+        df = s3_class.get_data(sd=params[vmc.startdate],
+                               ed=params[vmc.enddate])
+        self.output(df, params[vmc.filename], params[vmc.apimerge],
+                    params[vmc.firstrow], params[vmc.lastrow],
+                    params[vmc.date], params[vmc.startdate],
+                    params[vmc.enddate])
+
     def s3_load(self, s3_key, s3_class):
         for vk in s3_key:
-            params = self.matrix.vendor_set(vk)
-            s3_class.input_config(params[vmc.apifile])
-            start_check = self.date_check(params[vmc.startdate])
-            end_check = self.date_check(params[vmc.enddate])
-            if start_check:
-                params[vmc.startdate] = None
-            if end_check:
-                params[vmc.enddate] = None
-            df = s3_class.get_data(sd=params[vmc.startdate],
-                                   ed=params[vmc.enddate])
-            self.output(df, params[vmc.filename], params[vmc.apimerge],
-                        params[vmc.firstrow], params[vmc.lastrow],
-                        params[vmc.date], params[vmc.startdate],
-                        params[vmc.enddate])
+            with prf.stage('connector s3', vk):
+                self.s3_call(vk, s3_class)
 
     def s3_loop(self):
         if self.arg_check('dna'):
             self.s3_load(self.matrix.s3_dna_key, awss3.S3())
+
+    def s3_tasks(self):
+        if self.arg_check('dna') and self.matrix.s3_dna_key:
+            return [('s3', self.make_tasks(self.matrix.s3_dna_key,
+                                           self.s3_call, awss3.S3()))]
+        return []
@@ -0,0 +1,119 @@
+import os
+import sys
+import queue
+import logging
+import threading
+import multiprocessing as mp
+import reporting.cache as vc
+import reporting.profiler as prf
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+import reporting.importhandler as ih
+
+
+class Pipeline(object):
+    def __init__(self, args, matrix):
+        self.args = args
+        self.matrix = matrix
+        self.done = queue.Queue()
+        self.vendor_cache = None
+        if self.args.cache:
+            self.vendor_cache = vc.VendorCache()
+
+    def get_import_tasks(self):
+        tasks = []
+        for arg, get_tasks in [(self.args.api, 'api_tasks'),
+                               (self.args.ftp, 'ftp_tasks'),
+                               (self.args.dbi, 'db_tasks'),
+                               (self.args.s3, 's3_tasks')]:
+            if arg:
+                import_handler = ih.ImportHandler(arg, self.matrix)
+                tasks.extend(getattr(import_handler, get_tasks)())
+        return tasks
+
+    def run_imports(self, name, tasks):
+        for vk, task in tasks:
+            logging.info('Importing {} on {} connector.'.format(vk, name))
+            try:
+                with prf.stage('connector {}'.format(name), vk):
+                    task()
+            except (Exception, SystemExit) as e:
+                logging.exception('Import of {} failed with error: {}  '
+                                  'Processing existing raw data.'.format(
+                                      vk, e))
+            finally:
+                self.done.put(vk)
+
+    def get_vendor_keys(self):
+        vendor_keys = [x for x in self.matrix.vm_df[vmc.vendorkey]
+                       if x not in self.matrix.process_omit_list
+                       and x != vm.plan_key]
+        if self.args.vendor:
+            vendor_keys = self.matrix.get_vendor_keys(self.args.vendor,
+                                                      vendor_keys)
+        return vendor_keys
+
+    def process_check(self, vk):
+        if not os.path.isfile(self.matrix.vendor_param(vk, vmc.filename)):
+            return False
+        if self.vendor_cache:
+            fingerprint = self.vendor_cache.fingerprint(
+                vk, self.matrix.vendor_set(vk), self.matrix.vm_rules_dict)
+            if self.vendor_cache.check(vk, fingerprint):
+                return False
+        return True
+
+    def submit_ready(self, pool, groups, pending, jobs):
+        waiting = []
+        for group in groups:
+            if set(group) & pending:
+                waiting.append(group)
+                continue
+            group = [x for x in group if self.process_check(x)]
+            if not group:
+                continue
+            logging.info('Processing {}'.format(', '.join(group)))
+            sources = [(vk, self.matrix.vm_rules_dict,
+                        self.matrix.vendor_set(vk), self.args.chunksize)
+                       for vk in group]
+            jobs.append(pool.apply_async(vm.import_data_sources, (sources,)))
+        return waiting
+
+    def run(self):
+        logging.info('Initializing Pipeline')
+        tasks = self.get_import_tasks()
+        pending = set(vk for name, x in tasks for vk, task in x)
+        groups = self.matrix.group_shared_files(self.get_vendor_keys())
+        pool = mp.Pool(processes=max(self.args.processes, 1),
+                       initializer=vm.init_worker,
+                       initargs=(mp.Lock(), prf.get_state()))
+        threads = [threading.Thread(target=self.run_imports, args=x,
+                                    name=x[0]) for x in tasks]
+        jobs = []
+        tdfs = {}
+        try:
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            while True:
+                groups = self.submit_ready(pool, groups, pending, jobs)
+                if not pending:
+                    break
+                pending.discard(self.done.get())
+            for thread in threads:
+                thread.join()
+            for job in jobs:
+                for vk, tdf in job.get():
+                    if isinstance(tdf, SystemExit):
+                        sys.exit(tdf.code)
+                    tdfs[vk] = tdf
+        finally:
+            pool.close()
+            pool.join()
+        logging.info('All imports and vendor processing finished.')
+        return self.matrix.vm_loop(stream=self.args.stream,
+                                   cache=self.args.cache,
+                                   chunksize=self.args.chunksize,
+                                   vendors=self.args.vendor, tdfs=tdfs,
+                                   compact=self.args.compact,
+                                   sparse=self.args.sparse)
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import tracemalloc
+import contextlib
+import datetime as dt
+import reporting.utils as utl
+
+profile_file = 'profile.json'
+top_stages = 20
+enabled = False
+trace_memory = False
+spool_dir = None
+owner_pid = None
+started = None
+records = {}
+counters = {}
+record_lock = threading.Lock()
+stage_stack = threading.local()
+cpu_time = getattr(time, 'thread_time', time.process_time)
+
+
+def start(memory=True):
+    global enabled, trace_memory, spool_dir, owner_pid, started
+    records.clear()
+    counters.clear()
+    enabled = True
+    trace_memory = memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    spool_dir = tempfile.mkdtemp(prefix='processor_profile_')
+    owner_pid = os.getpid()
+    started = time.time()
+    if trace_memory:
+        logging.info('Profiling stages with memory tracing.')
+
+
+def stop():
+    global enabled
+    enabled = False
+    if trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    if spool_dir and os.path.isdir(spool_dir):
+        shutil.rmtree(spool_dir)
+
+
+def get_state():
+    return enabled, trace_memory, spool_dir, owner_pid
+
+
+def set_state(state):
+    global enabled, trace_memory, spool_dir, owner_pid
+    if not state:
+        return None
+    enabled, trace_memory, spool_dir, owner_pid = state
+    if enabled and trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def get_stack():
+    if not hasattr(stage_stack, 'frames'):
+        stage_stack.frames = []
+    return stage_stack.frames
+
+
+def reset_peak():
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+def add_record(path, key, values):
+    with record_lock:
+        record = records.setdefault((path, key), {
+            'calls': 0, 'wall': 0., 'self_wall': 0., 'cpu': 0.,
+            'peak_memory': 0, 'rss': 0, 'rss_delta': 0})
+        record['calls'] += values.get('calls', 1)
+        for col in ['wall', 'self_wall', 'cpu', 'rss_delta']:
+            record[col] += values[col]
+        for col in ['peak_memory', 'rss']:
+            record[col] = max(record[col], values[col])
+
+
+def count(name, value=1, key=None):
+    if not enabled:
+        return None
+    stack = get_stack()
+    if key is None and stack:
+        key = stack[-1]['key']
+    with record_lock:
+        counters[(name, key)] = counters.get((name, key), 0) + value
+
+
+@contextlib.contextmanager
+def stage(name, key=None):
+    if not enabled:
+        yield
+        return
+    stack = get_stack()
+    parent = stack[-1] if stack else None
+    if parent:
+        name = '{}/{}'.format(parent['path'], name)
+        if key is None:
+            key = parent['key']
+    frame = {'path': name, 'key': key, 'child_wall': 0., 'peak': 0,
+             'memory': 0}
+    if trace_memory:
+        if parent:
+            parent['peak'] = max(parent['peak'],
+                                 tracemalloc.get_traced_memory()[1])
+        reset_peak()
+        frame['memory'] = tracemalloc.get_traced_memory()[0]
+    rss = utl.get_rss()
+    wall = time.perf_counter()
+    cpu = cpu_time()
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        wall = time.perf_counter() - wall
+        cpu = cpu_time() - cpu
+        peak = 0
+        if trace_memory:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            if parent:
+                parent['peak'] = max(parent['peak'], peak)
+            peak = max(peak - frame['memory'], 0)
+        if parent:
+            parent['child_wall'] += wall
+        end_rss = utl.get_rss()
+        add_record(frame['path'], key, {
+            'wall': wall, 'self_wall': wall - frame['child_wall'],
+            'cpu': cpu, 'peak_memory': peak, 'rss': end_rss,
+            'rss_delta': end_rss - rss})
+
+
+def get_records():
+    return [dict(stage=path, key=key, **values)
+            for (path, key), values in records.items()]
+
+
+def get_counters():
+    return [{'name': name, 'key': key, 'value': value}
+            for (name, key), value in counters.items()]
+
+
+def spool_records():
+    if not enabled or os.getpid() == owner_pid or not (records or counters):
+        return None
+    file_name = os.path.join(spool_dir, '{}_{}.json'.format(
+        os.getpid(), time.time()))
+    with record_lock:
+        data = {'stages': get_records(), 'counters': get_counters()}
+        records.clear()
+        counters.clear()
+    with open('{}.tmp'.format(file_name), 'w') as f:
+        json.dump(data, f)
+    os.replace('{}.tmp'.format(file_name), file_name)
+
+
+def load_spooled_records():
+    if not spool_dir or not os.path.isdir(spool_dir):
+        return 0
+    count = 0
+    for file_name in sorted(os.listdir(spool_dir)):
+        if not file_name.endswith('.json'):
+            continue
+        with open(os.path.join(spool_dir, file_name), 'r') as f:
+            data = json.load(f)
+        for record in data['stages']:
+            add_record(record.pop('stage'), record.pop('key'), record)
+            count += 1
+        for counter in data['counters']:
+            key = (counter['name'], counter['key'])
+            counters[key] = counters.get(key, 0) + counter['value']
+    return count
+
+
+def get_report():
+    workers = load_spooled_records()
+    stages = sorted(get_records(), key=lambda x: (x['stage'], str(x['key'])))
+    report_counters = sorted(get_counters(),
+                             key=lambda x: (x['name'], str(x['key'])))
+    report = {'start': dt.datetime.fromtimestamp(started).isoformat(),
+              'wall': round(time.time() - started, 3),
+              'memory_traced': trace_memory,
+              'worker_records': workers,
+              'max_rss': max([x['rss'] for x in stages] + [utl.get_rss()]),
+              'stages': stages, 'counters': report_counters}
+    return report
+
+
+def log_summary(report, top_n=top_stages):
+    stages = sorted(report['stages'], key=lambda x: -x['self_wall'])[:top_n]
+    logging.info('Run took {} seconds.  Top {} stages by self time:'.format(
+        report['wall'], len(stages)))
+    for x in stages:
+        logging.info('{:>9.2f}s self {:>9.2f}s total {:>9.2f}s cpu {:>9} '
+                     'peak {:>6} calls  {}{}'.format(
+                         x['self_wall'], x['wall'], x['cpu'],
+                         utl.bytes_to_size(x['peak_memory']), x['calls'],
+                         x['stage'], ' [{}]'.format(x['key'])
+                         if x['key'] is not None else ''))
+
+
+def write_report(report, file_name=profile_file):
+    try:
+        with open(file_name, 'w') as f:
+            json.dump(report, f, indent=2)
+        logging.info('Profile written to {}'.format(file_name))
+    except IOError as e:
+        logging.warning('Could not write profile with error: {}'.format(e))
+    log_summary(report)
+    return report
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import logging
+import multiprocessing as mp
+import datetime as dt
+import pandas as pd
+import reporting.utils as utl
+import reporting.cache as vc
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+shard_path = os.path.join(utl.cache_path, 'shards/')
+queue_file = 'queue.db'
+lock_file = 'files.lock'
+claim_timeout = 3600
+poll_interval = 1
+
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+
+class ShardQueue(object):
+    def __init__(self, path=shard_path):
+        self.path = path
+        utl.dir_check(self.path)
+        self.queue_file = os.path.join(self.path, queue_file)
+        self.create()
+
+    def connect(self):
+        con = sqlite3.connect(self.queue_file, timeout=60,
+                              isolation_level=None)
+        return con
+
+    def create(self):
+        con = self.connect()
+        con.execute("""CREATE TABLE IF NOT EXISTS shards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run TEXT, keys TEXT, chunksize INTEGER, status TEXT,
+            worker TEXT, claimed REAL, finished REAL, error TEXT)""")
+        con.close()
+
+    def publish(self, run_id, shards, chunksize=None):
+        con = self.connect()
+        con.execute('BEGIN IMMEDIATE')
+        for keys in shards:
+            con.execute('INSERT INTO shards (run, keys, chunksize, status) '
+                        'VALUES (?, ?, ?, ?)',
+                        (run_id, json.dumps(keys), chunksize, PENDING))
+        con.execute('COMMIT')
+        con.close()
+        logging.info('Published {} shards for run {}'.format(
+            len(shards), run_id))
+
+    def claim(self, worker, run_id=None):
+        con = self.connect()
+        con.execute('BEGIN IMMEDIATE')
+        query = 'SELECT id, run, keys, chunksize FROM shards WHERE status = ?'
+        params = [PENDING]
+        if run_id:
+            query += ' AND run = ?'
+            params.append(run_id)
+        row = con.execute(query + ' ORDER BY id LIMIT 1', params).fetchone()
+        if row:
+            con.execute('UPDATE shards SET status = ?, worker = ?, '
+                        'claimed = ? WHERE id = ?',
+                        (RUNNING, worker, time.time(), row[0]))
+        con.execute('COMMIT')
+        con.close()
+        if not row:
+            return None
+        return {'id': row[0], 'run': row[1], 'keys': json.loads(row[2]),
+                'chunksize': row[3]}
+
+    def set_status(self, shard_id, status, error=None):
+        con = self.connect()
+        con.execute('UPDATE shards SET status = ?, finished = ?, error = ? '
+                    'WHERE id = ?', (status, time.time(), error, shard_id))
+        con.close()
+
+    def requeue_stale(self, run_id, timeout=claim_timeout):
+        con = self.connect()
+        cur = con.execute('UPDATE shards SET status = ?, worker = NULL '
+                          'WHERE run = ? AND status = ? AND claimed < ?',
+                          (PENDING, run_id, RUNNING, time.time() - timeout))
+        con.close()
+        if cur.rowcount:
+            logging.warning('Requeued {} shards claimed more than {} seconds '
+                            'ago.'.format(cur.rowcount, timeout))
+
+    def get_run(self, run_id):
+        con = self.connect()
+        rows = con.execute('SELECT id, keys, status, worker, error '
+                           'FROM shards WHERE run = ? ORDER BY id',
+                           (run_id,)).fetchall()
+        con.close()
+        return [{'id': x[0], 'keys': json.loads(x[1]), 'status': x[2],
+                 'worker': x[3], 'error': x[4]} for x in rows]
+
+
+class FileLock(object):
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.file_name, 'a+')
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            return self
+        self.file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                return self
+            except OSError:
+                time.sleep(poll_interval)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+def set_file_lock(path=shard_path):
+    utl.dir_check(path)
+    vm.set_shared_file_lock(FileLock(os.path.join(path, lock_file)))
+
+
+def shard_output_file(run_id, shard_id, path=shard_path):
+    return os.path.join(path, run_id, '{}.pkl'.format(shard_id))
+
+
+class ShardWorker(object):
+    def __init__(self, path=shard_path, run_id=None):
+        self.path = path
+        self.run_id = run_id
+        self.queue = ShardQueue(self.path)
+        self.name = '{}-{}'.format(socket.gethostname(), os.getpid())
+        set_file_lock(self.path)
+
+    def run_shard(self, shard):
+        logging.info('{} processing shard {}: {}'.format(
+            self.name, shard['id'], ', '.join(shard['keys'])))
+        matrix = vm.VendorMatrix()
+        sources = [(vk, matrix.vm_rules_dict, matrix.vendor_set(vk),
+                    shard['chunksize']) for vk in shard['keys']]
+        tdfs = vm.import_data_sources(sources)
+        errors = [vk for vk, tdf in tdfs if isinstance(tdf, SystemExit)]
+        if errors:
+            self.queue.set_status(shard['id'], FAILED,
+                                  'Exited on {}'.format(', '.join(errors)))
+            return False
+        file_name = shard_output_file(shard['run'], shard['id'], self.path)
+        utl.dir_check(os.path.dirname(file_name))
+        pd.to_pickle(tdfs, '{}.tmp'.format(file_name))
+        os.replace('{}.tmp'.format(file_name), file_name)
+        self.queue.set_status(shard['id'], FINISHED)
+        return True
+
+    def run(self, exit_when_empty=True):
+        logging.debug('Shard worker {} checking for shards.'.format(self.name))
+        while True:
+            shard = self.queue.claim(self.name, self.run_id)
+            if not shard:
+                if exit_when_empty:
+                    return None
+                time.sleep(poll_interval)
+                continue
+            try:
+                self.run_shard(shard)
+            except Exception as e:
+                logging.exception('Shard {} failed: {}'.format(shard['id'], e))
+                self.queue.set_status(shard['id'], FAILED, str(e))
+
+
+def run_local_worker(run_id, path=shard_path):
+    ShardWorker(path, run_id).run()
+
+
+class ShardCoordinator(object):
+    def __init__(self, matrix, path=shard_path):
+        self.matrix = matrix
+        self.path = path
+        self.queue = ShardQueue(self.path)
+        set_file_lock(self.path)
+        self.run_id = '{}_{}'.format(
+            dt.datetime.now().strftime('%Y%m%d%H%M%S%f'), os.getpid())
+
+    def get_shards(self, shards, vendor_keys):
+        groups = self.matrix.group_shared_files(vendor_keys)
+        sizes = {vk: os.path.getsize(
+            self.matrix.vendor_param(vk, vmc.filename)) for vk in vendor_keys}
+        groups = sorted(groups, key=lambda x: -sum(sizes[y] for y in x))
+        bins = [([], 0) for _ in range(min(shards, len(groups)))]
+        for group in groups:
+            idx = min(range(len(bins)), key=lambda x: bins[x][1])
+            bins[idx] = (bins[idx][0] + group,
+                         bins[idx][1] + sum(sizes[x] for x in group))
+        return [sorted(x[0], key=vendor_keys.index) for x in bins if x[0]]
+
+    def wait(self):
+        worker = ShardWorker(self.path, self.run_id)
+        while True:
+            worker.run()
+            shards = self.queue.get_run(self.run_id)
+            if all(x['status'] in [FINISHED, FAILED] for x in shards):
+                return shards
+            time.sleep(poll_interval)
+            self.queue.requeue_stale(self.run_id)
+
+    def run(self, shards, vendor_keys, workers=0, chunksize=None):
+        if not vendor_keys:
+            return {}
+        self.queue.publish(self.run_id, self.get_shards(shards, vendor_keys),
+                           chunksize)
+        processes = [mp.Process(target=run_local_worker,
+                                args=(self.run_id, self.path))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        shards = self.wait()
+        for process in processes:
+            process.join()
+        return self.merge(shards, chunksize)
+
+    def merge(self, shards, chunksize=None):
+        tdfs = {}
+        for shard in shards:
+            if shard['status'] == FAILED:
+                logging.warning('Shard {} failed on {} with error: {}  '
+                                'Processing it locally.'.format(
+                                    shard['id'], shard['worker'],
+                                    shard['error']))
+                for vk in shard['keys']:
+                    tdfs[vk] = self.matrix.vendor_get(vk, chunksize)
+                continue
+            file_name = shard_output_file(self.run_id, shard['id'], self.path)
+            for vk, tdf in pd.read_pickle(file_name):
+                tdfs[vk] = tdf
+        run_path = os.path.join(self.path, self.run_id)
+        if os.path.isdir(run_path):
+            shutil.rmtree(run_path)
+        logging.info('Merged {} vendor keys from {} shards.'.format(
+            len(tdfs), len(shards)))
+        return tdfs
+
+
+def vm_loop_sharded(matrix, shards, workers=0, **kwargs):
+    vendor_keys = [x for x in matrix.vl if x != vm.plan_key]
+    if kwargs.get('vendors'):
+        vendor_keys = matrix.get_vendor_keys(kwargs['vendors'])
+    elif kwargs.get('cache'):
+        cached_keys = matrix.get_cached_keys(vc.VendorCache())
+        vendor_keys = [x for x in vendor_keys if x not in cached_keys]
+    coordinator = ShardCoordinator(matrix)
+    tdfs = coordinator.run(shards, vendor_keys, workers,
+                           kwargs.get('chunksize'))
+    return matrix.vm_loop(tdfs=tdfs, **kwargs)
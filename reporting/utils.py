@@ -1,6 +1,11 @@
 import os
 import sys
+import copy
+import json
+import pickle
+import hashlib
 import logging
+import numpy as np
 import pandas as pd
 import datetime as dt
 import reporting.vmcolumns as vmc
@@ -11,6 +16,7 @@ raw_path = 'raw_data/'
 error_path = 'ERROR_REPORTS/'
 dict_path = 'dictionaries/'
 backup_path = 'backup/'
+cache_path = 'cache/'
 
 RULE_METRIC = 'METRIC'
 RULE_QUERY = 'QUERY'
@@ -19,45 +25,328 @@ RULE_CONST = [RULE_METRIC, RULE_QUERY, RULE_FACTOR]
 PRE = 'PRE'
 POST = 'POST'
 
+csv_memo = {}
+csv_memo_paths = []
+snapshots = {}
+conversions = {}
+compact_sizes = {}
+sparse_density = .1
+spill_memory = None
+csv_cache = False
+output_chunksize = 100000
+size_units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
 na_values = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN',
              'null', '-nan', '1.#IND', '1.#QNAN', 'N/A', 'NULL', 'NaN', 'n/a',
              'nan']
 
 
+class UniqueMessageFilter(logging.Filter):
+    def __init__(self):
+        super(UniqueMessageFilter, self).__init__()
+        self.messages = set()
+
+    def filter(self, record):
+        message = record.getMessage()
+        if message in self.messages:
+            return False
+        self.messages.add(message)
+        return True
+
+
+def size_to_bytes(size):
+    size = str(size).strip().upper().rstrip('B')
+    if size and size[-1] in size_units:
+        return int(float(size[:-1]) * size_units[size[-1]])
+    return int(float(size))
+
+
+def bytes_to_size(num_bytes):
+    for unit in ['', 'K', 'M', 'G']:
+        if abs(num_bytes) < 1024:
+            return '{:.1f}{}B'.format(num_bytes, unit)
+        num_bytes /= 1024.
+    return '{:.1f}TB'.format(num_bytes)
+
+
+def set_spill_memory(size):
+    global spill_memory
+    spill_memory = size_to_bytes(size) if size else None
+    if spill_memory:
+        logging.info('Spilling to disk above {} resident memory.  Merging '
+                     'vendors and later stages are not limited.'.format(
+                         bytes_to_size(spill_memory)))
+
+
+def get_rss():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss
+    return rss * 1024
+
+
+def memory_check(stage):
+    if not spill_memory:
+        return False
+    rss = get_rss()
+    logging.debug('Resident memory before {}: {}'.format(
+        stage, bytes_to_size(rss)))
+    if rss > spill_memory:
+        logging.info('Resident memory {} is over the {} spill threshold '
+                     'before {}.'.format(bytes_to_size(rss),
+                                         bytes_to_size(spill_memory), stage))
+        return True
+    return False
+
+
 def dir_check(directory):
     if not os.path.isdir(directory):
-        os.makedirs(directory)
+        os.makedirs(directory, exist_ok=True)
+
+
+def csv_sidecar_name(filename, usecols=None):
+    name = os.path.abspath(filename)
+    if usecols is not None:
+        name = '{}{}'.format(name, sorted(usecols))
+    name = hashlib.md5(name.encode('utf-8')).hexdigest()
+    return os.path.join(cache_path, 'raw', name)
+
+
+def csv_sidecar_meta(filename, error_bad, usecols=None):
+    stat = os.stat(filename)
+    meta = {'file': os.path.abspath(filename), 'size': stat.st_size,
+            'mtime': stat.st_mtime_ns, 'error_bad': error_bad,
+            'pandas': pd.__version__}
+    if usecols is not None:
+        meta['usecols'] = sorted(usecols)
+    return meta
+
+
+def read_csv_sidecar(filename, meta, usecols=None):
+    sidecar = csv_sidecar_name(filename, usecols)
+    if not os.path.isfile('{}.json'.format(sidecar)):
+        return None
+    try:
+        with open('{}.json'.format(sidecar), 'r') as f:
+            if json.load(f) != meta:
+                return None
+        df = pd.read_pickle('{}.pkl'.format(sidecar))
+    except (IOError, ValueError, EOFError, pickle.UnpicklingError) as e:
+        logging.warning('Could not read cache for {} with error: {}  '
+                        'Reparsing.'.format(filename, e))
+        return None
+    logging.debug('Read {} from cache.'.format(filename))
+    return df
+
+
+def write_csv_sidecar(filename, meta, df, usecols=None):
+    sidecar = csv_sidecar_name(filename, usecols)
+    dir_check(os.path.dirname(sidecar))
+    try:
+        df.to_pickle('{}.pkl.tmp'.format(sidecar), compression=None)
+        os.replace('{}.pkl.tmp'.format(sidecar), '{}.pkl'.format(sidecar))
+        with open('{}.json.tmp'.format(sidecar), 'w') as f:
+            json.dump(meta, f)
+        os.replace('{}.json.tmp'.format(sidecar), '{}.json'.format(sidecar))
+    except IOError as e:
+        logging.warning('Could not write cache for {} with error: '
+                        '{}'.format(filename, e))
+
+
+def set_csv_cache(enabled):
+    global csv_cache
+    csv_cache = bool(enabled)
+    if csv_cache:
+        prune_csv_sidecars()
+
+
+def csv_sidecar_stale(meta):
+    try:
+        stat = os.stat(meta['file'])
+        return (stat.st_size != meta['size'] or
+                stat.st_mtime_ns != meta['mtime'] or
+                meta['pandas'] != pd.__version__)
+    except (OSError, KeyError, TypeError):
+        return True
+
+
+def prune_csv_sidecars():
+    path = os.path.join(cache_path, 'raw')
+    if not os.path.isdir(path):
+        return 0
+    removed = []
+    for name in os.listdir(path):
+        if not os.path.isfile(os.path.join(path, name)):
+            continue
+        sidecar, ext = os.path.splitext(os.path.join(path, name))
+        if ext == '.json':
+            try:
+                with open('{}.json'.format(sidecar), 'r') as f:
+                    stale = csv_sidecar_stale(json.load(f))
+            except (IOError, ValueError):
+                stale = True
+        else:
+            stale = (ext == '.tmp' or not os.path.isfile(
+                '{}.json'.format(sidecar)))
+        if not stale:
+            continue
+        for file_name in ['{}.json'.format(sidecar), '{}.pkl'.format(sidecar),
+                          os.path.join(path, name)]:
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+        removed.append(name)
+    if removed:
+        logging.info('Removed {} stale raw file caches.'.format(len(removed)))
+    return len(removed)
+
+
+def set_csv_memo(paths):
+    csv_memo.clear()
+    csv_memo_paths[:] = [os.path.abspath(x) for x in paths]
+
+
+def csv_memo_check(filename, nrows=None, usecols=None):
+    if not csv_memo_paths or nrows is not None or usecols is not None:
+        return False
+    if not os.path.isfile(filename):
+        return False
+    file_dir = os.path.dirname(os.path.abspath(filename))
+    return any(file_dir == x or file_dir.startswith(x + os.sep)
+               for x in csv_memo_paths)
+
+
+def read_csv_memo(filename, error_bad, empty_df):
+    key = (os.path.abspath(filename), error_bad, empty_df)
+    stat = os.stat(filename)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    if key not in csv_memo or csv_memo[key][0] != stamp:
+        df = import_read_csv(filename, error_bad=error_bad, empty_df=empty_df,
+                             memo=False)
+        csv_memo[key] = (stamp, df)
+    else:
+        logging.debug('Read {} from memory.'.format(filename))
+    df = csv_memo[key][1]
+    if df is not None:
+        df = df.copy()
+    return df
+
+
+def file_stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def file_size(filename):
+    stamp = file_stamp(filename)
+    return stamp[0] if stamp else 0
+
+
+def get_snapshot(name, filename, load_fnc, version=None):
+    key = (name, os.path.abspath(filename))
+    stamp = file_stamp(filename)
+    if (key in snapshots and stamp and
+            snapshots[key][0] == (stamp, version)):
+        logging.debug('Using {} snapshot of {}.'.format(name, filename))
+        return copy.deepcopy(snapshots[key][1])
+    value = load_fnc()
+    new_stamp = file_stamp(filename)
+    if new_stamp and stamp in [None, new_stamp]:
+        snapshots[key] = ((new_stamp, version), value)
+        value = copy.deepcopy(value)
+    return value
+
+
+def drop_snapshot(filename):
+    filename = os.path.abspath(filename)
+    for key in [x for x in snapshots if x[1] == filename]:
+        del snapshots[key]
 
 
 def import_read_csv(filename, path=None, file_check=True, error_bad=True,
-                    empty_df=False, nrows=None):
+                    empty_df=False, nrows=None, cache=False, usecols=None,
+                    memo=True):
     if path:
         filename = os.path.join(path, filename)
     if file_check:
         if not os.path.isfile(filename):
             logging.warning('{} not found.  Continuing.'.format(filename))
             return pd.DataFrame()
+    if memo and csv_memo_check(filename, nrows, usecols):
+        return read_csv_memo(filename, error_bad, empty_df)
+    cache = cache and csv_cache and nrows is None
+    if cache:
+        meta = csv_sidecar_meta(filename, error_bad, usecols)
+        df = read_csv_sidecar(filename, meta, usecols)
+        if df is not None:
+            return df
+    use_cols = None
+    if usecols is not None:
+        use_cols = lambda x: x in usecols
     try:
         df = pd.read_csv(filename, parse_dates=True, encoding='utf-8',
                          keep_default_na=False, na_values=na_values,
-                         error_bad_lines=error_bad, nrows=nrows)
+                         error_bad_lines=error_bad, nrows=nrows,
+                         usecols=use_cols)
     except pd.io.common.CParserError:
         df = pd.read_csv(filename, parse_dates=True, sep=None, engine='python',
                          keep_default_na=False, na_values=na_values,
-                         nrows=nrows)
+                         nrows=nrows, usecols=use_cols)
     except UnicodeDecodeError:
         df = pd.read_csv(filename, parse_dates=True, encoding='iso-8859-1',
                          keep_default_na=False, na_values=na_values,
-                         nrows=nrows)
+                         nrows=nrows, usecols=use_cols)
     except pd.io.common.EmptyDataError:
         logging.warning('Raw Data {} empty.  Continuing.'.format(filename))
         if empty_df:
             df = pd.DataFrame()
         else:
             df = None
+    if cache and df is not None and not df.empty:
+        write_csv_sidecar(filename, meta, df, usecols)
     return df
 
 
+def import_read_csv_chunks(filename, chunksize, usecols=None, dtype=None,
+                           skiprows=None):
+    if not os.path.isfile(filename):
+        logging.warning('{} not found.  Continuing.'.format(filename))
+        return
+    use_cols = None
+    if usecols is not None:
+        use_cols = lambda x: x in usecols
+    try:
+        reader = pd.read_csv(filename, parse_dates=True, encoding='utf-8',
+                             keep_default_na=False, na_values=na_values,
+                             chunksize=chunksize, usecols=use_cols,
+                             dtype=dtype, skiprows=skiprows)
+    except pd.io.common.EmptyDataError:
+        logging.warning('Raw Data {} empty.  Continuing.'.format(filename))
+        return
+    for df in reader:
+        yield df
+
+
+def write_csv_chunks(df, filename, chunksize=output_chunksize):
+    tmp_file = '{}.tmp'.format(filename)
+    with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+        for idx in range(0, max(len(df), 1), chunksize):
+            tdf = dense_columns(df.iloc[idx:idx + chunksize].copy())
+            tdf.to_csv(f, index=False, header=idx == 0)
+    os.replace(tmp_file, filename)
+
+
 def exceldate_to_datetime(excel_date):
     epoch = dt.datetime(1899, 12, 30)
     delta = dt.timedelta(hours=round(excel_date * 24))
@@ -100,6 +389,124 @@ def string_to_date(my_string):
         return my_string
 
 
+def count_conversion(col_type, skipped):
+    key = (col_type, 'skipped' if skipped else 'converted')
+    conversions[key] = conversions.get(key, 0) + 1
+    return skipped
+
+
+def log_conversions():
+    if not conversions:
+        return None
+    logging.info('Type conversions: {}'.format(', '.join(
+        '{} {} {}'.format(v, k[0], k[1]) for k, v in sorted(
+            conversions.items()))))
+    conversions.clear()
+
+
+def float_convert_skip(df, col):
+    if pd.api.types.is_float_dtype(df[col]):
+        if df[col].isnull().values.any():
+            df[col] = df[col].fillna(0)
+    elif pd.api.types.is_integer_dtype(df[col]):
+        df[col] = df[col].astype(float)
+    else:
+        return count_conversion('float', False)
+    return count_conversion('float', True)
+
+
+def date_convert_skip(df, col):
+    if not pd.api.types.is_datetime64_dtype(df[col]):
+        return count_conversion('date', False)
+    df[col] = df[col].fillna(dt.datetime.today()).dt.normalize()
+    return count_conversion('date', True)
+
+
+def str_convert_skip(df, col):
+    skip = (df[col].dtype == object and
+            pd.api.types.infer_dtype(df[col], skipna=False) == 'string')
+    return count_conversion('str', skip)
+
+
+def int_convert_skip(df, col):
+    skip = df[col].dtype == np.dtype(int)
+    return count_conversion('int', skip)
+
+
+def compact_columns(df, cols):
+    for col in cols:
+        if col not in df or df[col].dtype != object:
+            continue
+        ser = df[col].astype('category')
+        if len(ser.cat.categories) * 2 > len(ser):
+            continue
+        for name, x in [('object', df[col]), ('category', ser)]:
+            compact_sizes[name] = (compact_sizes.get(name, 0) +
+                                   x.memory_usage(deep=True, index=False))
+        df[col] = ser
+    return df
+
+
+def expand_columns(df, cols):
+    for col in cols:
+        if col in df and pd.api.types.is_categorical_dtype(df[col]):
+            df[col] = df[col].astype(object)
+    return df
+
+
+def fill_category(ser, value):
+    if (pd.api.types.is_categorical_dtype(ser) and
+            value not in ser.cat.categories):
+        ser = ser.cat.add_categories([value])
+    return ser.fillna(value)
+
+
+def get_empty_columns(df, cols):
+    return [x for x in cols if x in df and
+            (df[x].isnull().all() or (pd.api.types.is_numeric_dtype(df[x])
+                                      and not df[x].fillna(0).any()))]
+
+
+def sparse_columns(df, cols):
+    for col in cols:
+        if (col not in df or not len(df) or
+                not pd.api.types.is_float_dtype(df[col]) or
+                pd.api.types.is_sparse(df[col])):
+            continue
+        if (df[col] != 0).mean() > sparse_density:
+            continue
+        ser = df[col].astype(pd.SparseDtype(float, 0.0))
+        for name, x in [('dense', df[col]), ('sparse', ser)]:
+            compact_sizes[name] = (compact_sizes.get(name, 0) +
+                                   x.memory_usage(deep=True, index=False))
+        df[col] = ser
+    return df
+
+
+def dense_columns(df, cols=None):
+    if cols is None:
+        cols = df.columns
+    for col in cols:
+        if col in df and pd.api.types.is_sparse(df[col]):
+            df[col] = np.asarray(df[col], dtype=float)
+    return df
+
+
+def log_compact(df):
+    if not compact_sizes:
+        return None
+    for name, old_name, cols in [('category', 'object', 'dictionary'),
+                                 ('sparse', 'dense', 'metric')]:
+        if name in compact_sizes:
+            logging.info('{} {} columns use {} instead of {}.'.format(
+                name.capitalize(), cols,
+                bytes_to_size(compact_sizes[name]),
+                bytes_to_size(compact_sizes[old_name])))
+    logging.info('Output frame uses {}.'.format(
+        bytes_to_size(df.memory_usage(deep=True).sum())))
+    compact_sizes.clear()
+
+
 def data_to_type(df, float_col=None, date_col=None, str_col=None, int_col=None):
     if float_col is None:
         float_col = []
@@ -110,7 +517,7 @@ def data_to_type(df, float_col=None, date_col=None, str_col=None, int_col=None):
     if int_col is None:
         int_col = []
     for col in float_col:
-        if col not in df:
+        if col not in df or float_convert_skip(df, col):
             continue
         df[col] = df[col].astype('U')
         df[col] = df[col].apply(lambda x: x.replace('$', ''))
@@ -122,16 +529,18 @@ def data_to_type(df, float_col=None, date_col=None, str_col=None, int_col=None):
         if col not in df:
             continue
         df[col] = df[col].replace(['1/0/1900', '1/1/1970'], '0')
+        if date_convert_skip(df, col):
+            continue
         df[col] = df[col].fillna(dt.datetime.today())
         df[col] = df[col].astype('U')
         df[col] = df[col].apply(lambda x: string_to_date(x))
         df[col] = pd.to_datetime(df[col], errors='coerce').dt.normalize()
     for col in str_col:
-        if col not in df:
+        if col not in df or str_convert_skip(df, col):
             continue
         df[col] = df[col].astype('U')
     for col in int_col:
-        if col not in df:
+        if col not in df or int_convert_skip(df, col):
             continue
         df[col] = df[col].astype(int)
     return df
@@ -1,18 +1,26 @@
 import os
 import sys
+import copy
 import json
 import yaml
+import hashlib
 import shutil
+import fnmatch
 import logging
+import contextlib
+import multiprocessing as mp
 import numpy as np
 import pandas as pd
 import datetime as dt
 import reporting.utils as utl
 import reporting.calc as cal
+import reporting.cache as vc
 import reporting.vmcolumns as vmc
 import reporting.dictionary as dct
 import reporting.errorreport as er
 import reporting.dictcolumns as dctc
+import reporting.accumulator as acm
+import reporting.profiler as prf
 
 log = logging.getLogger()
 
@@ -20,6 +28,77 @@ csv_path = utl.config_path
 csv_file = 'Vendormatrix.csv'
 csv_full_file = os.path.join(csv_path, csv_file)
 plan_key = 'Plan Net'
+shared_file_lock = None
+import_key_attrs = [
+    ('API', vmc.api_aw_key, 'api_aw_key'),
+    ('API', vmc.api_fb_key, 'api_fb_key'),
+    ('API', vmc.api_tw_key, 'api_tw_key'),
+    ('API', vmc.api_ttd_key, 'api_ttd_key'),
+    ('API', vmc.api_ga_key, 'api_ga_key'),
+    ('API', vmc.api_nb_key, 'api_nb_key'),
+    ('API', vmc.api_af_key, 'api_af_key'),
+    ('API', vmc.api_sc_key, 'api_sc_key'),
+    ('API', vmc.api_aj_key, 'api_aj_key'),
+    ('API', vmc.api_dc_key, 'api_dc_key'),
+    ('API', vmc.api_rs_key, 'api_rs_key'),
+    ('API', vmc.api_db_key, 'api_db_key'),
+    ('API', vmc.api_vk_key, 'api_vk_key'),
+    ('API', vmc.api_rc_key, 'api_rc_key'),
+    ('API', vmc.api_szk_key, 'api_szk_key'),
+    ('API', vmc.api_red_key, 'api_red_key'),
+    ('API', vmc.api_dv_key, 'api_dv_key'),
+    ('API', vmc.api_adk_key, 'api_adk_key'),
+    ('API', vmc.api_inn_key, 'api_inn_key'),
+    ('API', vmc.api_tik_key, 'api_tik_key'),
+    ('API', vmc.api_amz_key, 'api_amz_key'),
+    ('API', vmc.api_cri_key, 'api_cri_key'),
+    ('API', vmc.api_pm_key, 'api_pm_key'),
+    ('API', vmc.api_sam_key, 'api_sam_key'),
+    ('API', vmc.api_gs_key, 'api_gs_key'),
+    ('API', vmc.api_qt_key, 'api_qt_key'),
+    ('FTP', 'Sizmek', 'ftp_sz_key'),
+    ('DB', 'DNA', 'db_dna_key'),
+    ('S3', 'DNA', 's3_dna_key')]
+snapshot_attrs = ['vm', 'vm_df', 'vl', 'import_keys', 'vm_rules_dict',
+                  'plan_omit_list', 'process_omit_list']
+placement_memo = {}
+placement_memo_size = 64
+shared_raw_files = {}
+preview_rows = 1000
+preview_sample_rows = 10000
+preview_chunksize = 100000
+
+
+def copy_param(value):
+    if isinstance(value, (list, dict)):
+        return copy.deepcopy(value)
+    return value
+
+
+class VendorParams(object):
+    __slots__ = ('key', 'index', 'values')
+
+    def __init__(self, key, index, values):
+        object.__setattr__(self, 'key', key)
+        object.__setattr__(self, 'index', index)
+        object.__setattr__(self, 'values',
+                           tuple(copy_param(x) for x in values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Vendor parameters for {} are read only.'.format(
+            self.key))
+
+    def __reduce__(self):
+        return VendorParams, (self.key, self.index, self.values)
+
+    def __getitem__(self, col):
+        return copy_param(self.values[self.index[col]])
+
+    def __contains__(self, col):
+        return col in self.index
+
+    def to_dict(self):
+        return {col: copy_param(x) for col, x in zip(self.index, self.values)}
 
 
 class VendorMatrix(object):
@@ -59,16 +138,29 @@ class VendorMatrix(object):
         self.db_dna_key = []
         self.s3_dna_key = []
         self.vm_rules_dict = {}
+        self.import_keys = {}
+        self.records = {}
         self.ven_param = None
         self.plan_omit_list = None
         self.process_omit_list = None
         self.tdf = None
         self.df = None
+        self.vm_load()
+        self.sort_vendor_list()
+
+    def vm_load(self):
+        state = utl.get_snapshot('vm', csv_full_file, self.vm_compile,
+                                 dt.date.today())
+        for attr in snapshot_attrs:
+            setattr(self, attr, state[attr])
+        self.set_import_key_attrs()
+
+    def vm_compile(self):
         self.vm_parse()
         self.vm_import_keys()
         self.vm_rules()
         self.make_omit_lists()
-        self.sort_vendor_list()
+        return {x: getattr(self, x) for x in snapshot_attrs}
 
     @staticmethod
     def read():
@@ -81,7 +173,7 @@ class VendorMatrix(object):
 
     def write(self):
         logging.info('Writing vendormatrix to {}.'.format(csv_full_file))
-        self.vm_df.to_csv(csv_full_file, index=False, encoding='utf-8')
+        write_vm(self.vm_df)
 
     def plan_net_check(self):
         if not self.vm['Vendor Key'].isin(['Plan Net']).any():
@@ -104,70 +196,18 @@ class VendorMatrix(object):
                             self.vm[col].items()})
 
     def vm_import_keys(self):
+        self.import_keys = {}
         for vk in self.vl:
-            vk_split = {vk: vk.split('_')}
-            if vk_split[vk][0] == 'API':
-                if vk_split[vk][1] == vmc.api_aw_key:
-                    self.api_aw_key.append(vk)
-                if vk_split[vk][1] == vmc.api_fb_key:
-                    self.api_fb_key.append(vk)
-                if vk_split[vk][1] == vmc.api_tw_key:
-                    self.api_tw_key.append(vk)
-                if vk_split[vk][1] == vmc.api_ttd_key:
-                    self.api_ttd_key.append(vk)
-                if vk_split[vk][1] == vmc.api_ga_key:
-                    self.api_ga_key.append(vk)
-                if vk_split[vk][1] == vmc.api_nb_key:
-                    self.api_nb_key.append(vk)
-                if vk_split[vk][1] == vmc.api_af_key:
-                    self.api_af_key.append(vk)
-                if vk_split[vk][1] == vmc.api_sc_key:
-                    self.api_sc_key.append(vk)
-                if vk_split[vk][1] == vmc.api_aj_key:
-                    self.api_aj_key.append(vk)
-                if vk_split[vk][1] == vmc.api_dc_key:
-                    self.api_dc_key.append(vk)
-                if vk_split[vk][1] == vmc.api_rs_key:
-                    self.api_rs_key.append(vk)
-                if vk_split[vk][1] == vmc.api_db_key:
-                    self.api_db_key.append(vk)
-                if vk_split[vk][1] == vmc.api_vk_key:
-                    self.api_vk_key.append(vk)
-                if vk_split[vk][1] == vmc.api_rc_key:
-                    self.api_rc_key.append(vk)
-                if vk_split[vk][1] == vmc.api_szk_key:
-                    self.api_szk_key.append(vk)
-                if vk_split[vk][1] == vmc.api_red_key:
-                    self.api_red_key.append(vk)
-                if vk_split[vk][1] == vmc.api_dv_key:
-                    self.api_dv_key.append(vk)
-                if vk_split[vk][1] == vmc.api_adk_key:
-                    self.api_adk_key.append(vk)
-                if vk_split[vk][1] == vmc.api_inn_key:
-                    self.api_inn_key.append(vk)
-                if vk_split[vk][1] == vmc.api_tik_key:
-                    self.api_tik_key.append(vk)
-                if vk_split[vk][1] == vmc.api_amz_key:
-                    self.api_amz_key.append(vk)
-                if vk_split[vk][1] == vmc.api_cri_key:
-                    self.api_cri_key.append(vk)
-                if vk_split[vk][1] == vmc.api_pm_key:
-                    self.api_pm_key.append(vk)
-                if vk_split[vk][1] == vmc.api_sam_key:
-                    self.api_sam_key.append(vk)
-                if vk_split[vk][1] == vmc.api_gs_key:
-                    self.api_gs_key.append(vk)
-                if vk_split[vk][1] == vmc.api_qt_key:
-                    self.api_qt_key.append(vk)
-            if vk_split[vk][0] == 'FTP':
-                if vk_split[vk][1] == 'Sizmek':
-                    self.ftp_sz_key.append(vk)
-            if vk_split[vk][0] == 'DB':
-                if vk_split[vk][1] == 'DNA':
-                    self.db_dna_key.append(vk)
-            if vk_split[vk][0] == 'S3':
-                if vk_split[vk][1] == 'DNA':
-                    self.s3_dna_key.append(vk)
+            vk_split = vk.split('_')
+            if len(vk_split) > 1:
+                import_key = (vk_split[0], vk_split[1])
+                self.import_keys.setdefault(import_key, []).append(vk)
+        self.set_import_key_attrs()
+
+    def set_import_key_attrs(self):
+        for import_type, platform, attr in import_key_attrs:
+            setattr(self, attr, self.import_keys.get((import_type, platform),
+                                                     []))
 
     def vm_rules(self):
         for key in self.vm:
@@ -185,10 +225,20 @@ class VendorMatrix(object):
         self.process_omit_list = [k for k, v in self.vm[vmc.omit_plan].items()
                                   if str(v) == 'ALL']
 
+    def compile_records(self):
+        columns = list(self.vm)
+        index = {col: idx for idx, col in enumerate(columns)}
+        self.records = {vk: VendorParams(vk, index,
+                                         [self.vm[col][vk] for col in columns])
+                        for vk in self.vm[vmc.filename]}
+
     def vendor_set(self, vk):
-        ven_param = {x: self.vm[x][vk] for x in self.vm}
+        ven_param = self.records[vk].to_dict()
         return ven_param
 
+    def vendor_param(self, vk, col):
+        return self.records[vk][col]
+
     def vm_change(self, index, col, new_value):
         self.vm_df.loc[index, col] = new_value
 
@@ -201,19 +251,26 @@ class VendorMatrix(object):
         return data_sources
 
     def set_data_sources(self, data_sources):
+        indexes = {}
+        for index, vk in zip(self.vm_df.index, self.vm_df[vmc.vendorkey]):
+            indexes.setdefault(vk, index)
+        changes = {}
         for source in data_sources:
             vendor_key = source['original_vendor_key']
             logging.info('Setting datasource for {}.'.format(vendor_key))
-            index = self.vm_df[self.vm_df[vmc.vendorkey] == vendor_key].index[0]
+            index = indexes[vendor_key]
             for col in [vmc.autodicplace, vmc.placement, vmc.vendorkey]:
-                self.vm_change(index, col, source[col])
+                changes.setdefault(col, {})[index] = source[col]
             for col in [vmc.autodicord, vmc.fullplacename]:
                 new_value = '|'.join(str(x) for x in source[col].split('\r\n'))
-                self.vm_change(index, col, new_value)
+                changes.setdefault(col, {})[index] = new_value
             for col in list(source['active_metrics'].keys()):
                 new_value = '|'.join(str(x)
                                      for x in source['active_metrics'][col])
-                self.vm_change(index, col, new_value)
+                changes.setdefault(col, {})[index] = new_value
+        for col, values in changes.items():
+            values = pd.Series(values)
+            self.vm_df.loc[values.index, col] = values
         self.write()
 
     def get_import_data_sources(self, import_type='API_', default_param=None):
@@ -224,7 +281,8 @@ class VendorMatrix(object):
                        for x in current_imports]
         data_sources = [self.get_data_source(vk) for vk in vendor_keys]
         for ds in data_sources:
-            ds.add_import_config_params(import_type, self, ic)
+            ds.add_import_config_params(import_type, self, ic,
+                                        current_imports)
         return data_sources
 
     def get_data_sources(self):
@@ -239,49 +297,312 @@ class VendorMatrix(object):
         ds = DataSource(vk, self.vm_rules_dict, **self.ven_param)
         return ds
 
-    def vendor_get(self, vk):
+    def vendor_get(self, vk, chunksize=None, ds=None):
         self.ven_param = self.vendor_set(vk)
         logging.info('Initializing {}'.format(vk))
         if vk == plan_key:
-            self.tdf = import_plan_data(vk, self.df, self.plan_omit_list,
-                                        **self.ven_param)
+            with prf.stage('import_plan_data'):
+                self.tdf = import_plan_data(vk, self.df, self.plan_omit_list,
+                                            **self.ven_param)
         else:
-            ds = DataSource(vk, self.vm_rules_dict, **self.ven_param)
-            self.tdf = ds.import_data()
+            if ds is None:
+                ds = DataSource(vk, self.vm_rules_dict, **self.ven_param)
+            self.tdf = ds.import_data(chunksize)
         return self.tdf
 
+    def vendor_get_chunks(self, vk, chunksize):
+        self.ven_param = self.vendor_set(vk)
+        logging.info('Initializing {} in chunks of {} rows'.format(
+            vk, chunksize))
+        ds = DataSource(vk, self.vm_rules_dict, **self.ven_param)
+        return ds.import_data_chunks(chunksize)
+
     def set_full_filename(self):
         self.vm[vmc.filename] = {x: self.vm[vmc.filename][x]
                                  if '/' in self.vm[vmc.filename][x]
                                  else os.path.join(utl.raw_path,
                                                    self.vm[vmc.filename][x])
                                  for x in self.vm[vmc.filename]}
+        self.compile_records()
 
     def sort_vendor_list(self):
         self.set_full_filename()
         self.vl = self.vm_df[vmc.vendorkey].to_list()
         self.vl = sorted((x for x in self.vl if x not in self.process_omit_list
-                          and os.path.isfile(self.vm[vmc.filename][x])),
-                         key=lambda x: os.stat(self.vm[vmc.filename][x]))
+                          and os.path.isfile(self.vendor_param(
+                              x, vmc.filename))),
+                         key=lambda x: os.stat(self.vendor_param(
+                             x, vmc.filename)))
         self.vl.append(plan_key)
 
-    def vm_loop(self):
+    def group_shared_files(self, vendor_keys):
+        groups = []
+        for vk in vendor_keys:
+            files = {self.vendor_param(vk, vmc.filename),
+                     self.vendor_param(vk, vmc.filenamedict),
+                     self.vendor_param(vk, vmc.filenameerror)}
+            shared = [x for x in groups if x[1] & files]
+            group = ([vk], files)
+            for x in shared:
+                group[0].extend(x[0])
+                group[1].update(x[1])
+                groups.remove(x)
+            groups.append(group)
+        groups = [sorted(x[0], key=vendor_keys.index) for x in groups]
+        return sorted(groups, key=lambda x: vendor_keys.index(x[0]))
+
+    def vendor_get_parallel(self, processes, vendor_keys, chunksize=None):
+        groups = self.group_shared_files(vendor_keys)
+        logging.info('Importing {} vendor keys in {} groups across {} '
+                     'processes'.format(len(vendor_keys), len(groups),
+                                        processes))
+        sources = [[(vk, self.vm_rules_dict, self.vendor_set(vk), chunksize)
+                    for vk in group] for group in groups]
+        pool = mp.Pool(processes=processes, initializer=init_worker,
+                       initargs=(mp.Lock(), prf.get_state()))
+        try:
+            results = pool.map(import_data_sources, sources, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        tdfs = {}
+        for result in results:
+            for vk, tdf in result:
+                if isinstance(tdf, SystemExit):
+                    sys.exit(tdf.code)
+                tdfs[vk] = tdf
+        return tdfs
+
+    def get_cached_keys(self, vendor_cache):
+        cached_keys = []
+        for vk in self.vl:
+            if vk == plan_key:
+                continue
+            fingerprint = vendor_cache.fingerprint(
+                vk, self.vendor_set(vk), self.vm_rules_dict)
+            if vendor_cache.check(vk, fingerprint):
+                cached_keys.append(vk)
+        logging.info('{} of {} vendor keys unchanged since last run.'.format(
+            len(cached_keys), len(self.vl) - 1))
+        return cached_keys
+
+    def get_vendor_keys(self, vendors, vendor_list=None):
+        if isinstance(vendors, str):
+            vendors = vendors.split(',')
+        if vendor_list is None:
+            vendor_list = self.vl
+        vendor_keys = []
+        for vendor in vendors:
+            keys = [x for x in vendor_list if x != plan_key and
+                    fnmatch.fnmatchcase(x, vendor.strip())]
+            if not keys:
+                logging.warning('{} did not match any vendor key.'.format(
+                    vendor))
+            vendor_keys.extend(x for x in keys if x not in vendor_keys)
+        return vendor_keys
+
+    def get_stored_keys(self, vendor_cache, vendors):
+        vendor_keys = self.get_vendor_keys(vendors)
+        stored_keys = [x for x in self.vl if x != plan_key and
+                       x not in vendor_keys and vendor_cache.has(x)]
+        logging.info('Processing {} and loading {} of {} other vendor keys '
+                     'from previous run.'.format(
+                         ', '.join(vendor_keys), len(stored_keys),
+                         len(self.vl) - 1 - len(vendor_keys)))
+        return stored_keys
+
+    def vm_loop(self, processes=1, stream=False, cache=False,
+                chunksize=None, vendors=None, tdfs=None, compact=False,
+                sparse=False):
         logging.info('Initializing Vendor Matrix Loop')
-        self.df = pd.DataFrame(columns=[vmc.date, dctc.FPN, dctc.PN, dctc.BM])
+        plan_names = self.vendor_param(plan_key, vmc.fullplacename)
+        acc = acm.FrameAccumulator(
+            columns=[vmc.date, dctc.FPN, dctc.PN, dctc.BM], stream=stream,
+            key_cols=plan_names + [vmc.vendorkey])
         self.sort_vendor_list()
-        for vk in self.vl:
-            self.tdf = self.vendor_get(vk)
-            self.df = self.df.append(self.tdf, ignore_index=True, sort=True)
-        self.df = full_placement_creation(self.df, plan_key, dctc.PFPN,
-                                          self.vm[vmc.fullplacename][plan_key])
+        vendor_cache = None
+        cached_keys = []
+        if cache or vendors:
+            vendor_cache = vc.VendorCache()
+            if vendors:
+                cached_keys = self.get_stored_keys(vendor_cache, vendors)
+            else:
+                cached_keys = self.get_cached_keys(vendor_cache)
+        tdfs = dict(tdfs) if tdfs else {}
+        cached_keys = [x for x in cached_keys if x not in tdfs]
+        if processes > 1:
+            vendor_keys = [x for x in self.vl if x != plan_key and
+                           x not in cached_keys and x not in tdfs]
+            with prf.stage('vendor_get_parallel'):
+                tdfs.update(self.vendor_get_parallel(processes, vendor_keys,
+                                                     chunksize))
+        data_sources = {}
+        if not chunksize:
+            data_sources = {x: self.get_data_source(x) for x in self.vl
+                            if x != plan_key and x not in cached_keys
+                            and x not in tdfs}
+            set_shared_raw_files(data_sources.values())
+        try:
+            for vk in self.vl:
+                with prf.stage('vendor', vk):
+                    self.vm_loop_vendor(vk, acc, cached_keys, vendor_cache,
+                                        tdfs, chunksize, compact, sparse,
+                                        data_sources.pop(vk, None))
+                release_shared_raw_file(vk)
+        finally:
+            shared_raw_files.clear()
+        with prf.stage('merge_vendors'):
+            self.df = acc.get()
+        if vendor_cache:
+            vendor_cache.update_index(self)
+        with prf.stage('full_placement_creation', plan_key):
+            self.df = full_placement_creation(self.df, plan_key, dctc.PFPN,
+                                              plan_names)
         if not os.listdir(er.csvpath):
             if os.path.isdir(er.csvpath):
                 logging.info('All placements defined.  Deleting Error report'
                              ' directory.')
                 os.rmdir(er.csvpath)
-        self.df = utl.data_to_type(self.df, vmc.datafloatcol, vmc.datadatecol)
+        with prf.stage('data_to_type'):
+            self.df = utl.data_to_type(self.df, vmc.datafloatcol,
+                                       vmc.datadatecol)
+        utl.log_conversions()
+        if sparse:
+            self.df = utl.sparse_columns(self.df, vmc.datafloatcol)
+        if compact or sparse:
+            utl.log_compact(self.df)
         return self.df
 
+    def vm_loop_vendor(self, vk, acc, cached_keys, vendor_cache, tdfs,
+                       chunksize=None, compact=False, sparse=False, ds=None):
+        if vk == plan_key:
+            self.df = acc.get_keys()
+        if vk in cached_keys:
+            self.tdf = vendor_cache.get(vk)
+        elif vk in tdfs:
+            self.tdf = tdfs.pop(vk)
+        elif chunksize and not vendor_cache and vk != plan_key:
+            for tdf in self.vendor_get_chunks(vk, chunksize):
+                tdf = self.compact_vendor_df(tdf, acc, compact, sparse)
+                if tdf is not None:
+                    prf.count('rows_output', len(tdf), vk)
+                acc.add(vk, tdf)
+            return None
+        else:
+            self.tdf = self.vendor_get(vk, chunksize, ds)
+        if vendor_cache and vk != plan_key and vk not in cached_keys:
+            vendor_cache.add(vk, self.tdf)
+        self.tdf = self.compact_vendor_df(self.tdf, acc, compact, sparse)
+        if self.tdf is not None:
+            prf.count('rows_output', len(self.tdf), vk)
+        acc.add(vk, self.tdf)
+
+    @staticmethod
+    def compact_vendor_df(df, acc, compact=False, sparse=False):
+        if df is None:
+            return df
+        if compact:
+            df = utl.compact_columns(df, dctc.COLS)
+        if sparse:
+            empty_cols = utl.get_empty_columns(df, vmc.datafloatcol)
+            acc.add_columns(empty_cols)
+            df = df.drop(empty_cols, axis=1)
+        return df
+
+
+def write_vm(df, file_name=csv_full_file):
+    tmp_file = '{}.tmp'.format(file_name)
+    df.to_csv(tmp_file, index=False, encoding='utf-8')
+    os.replace(tmp_file, file_name)
+    utl.drop_snapshot(file_name)
+
+
+def set_shared_file_lock(lock):
+    global shared_file_lock
+    shared_file_lock = lock
+
+
+def init_worker(lock, profile_state=None):
+    set_shared_file_lock(lock)
+    prf.set_state(profile_state)
+
+
+@contextlib.contextmanager
+def shared_file_access():
+    if shared_file_lock is None:
+        yield
+    else:
+        with shared_file_lock:
+            yield
+
+
+def import_data_sources(sources):
+    tdfs = []
+    data_sources = [(DataSource(vk, vm_rules, **ven_param), chunksize)
+                    for vk, vm_rules, ven_param, chunksize in sources]
+    set_shared_raw_files([ds for ds, chunksize in data_sources
+                          if not chunksize])
+    try:
+        for ds, chunksize in data_sources:
+            logging.info('Initializing {}'.format(ds.key))
+            try:
+                with prf.stage('vendor', ds.key):
+                    tdfs.append((ds.key, ds.import_data(chunksize)))
+            except SystemExit as e:
+                tdfs.append((ds.key, e))
+                break
+            release_shared_raw_file(ds.key)
+    finally:
+        shared_raw_files.clear()
+    prf.spool_records()
+    return tdfs
+
+
+def set_shared_raw_files(data_sources):
+    shared_raw_files.clear()
+    projections = {}
+    for ds in data_sources:
+        projections.setdefault(ds.p[vmc.filename], {})[ds.key] = (
+            ds.get_projection())
+    for file_name, usecols in projections.items():
+        if len(usecols) < 2:
+            continue
+        keys = set(usecols)
+        if any(x is None for x in usecols.values()):
+            usecols = None
+        else:
+            usecols = set().union(*usecols.values())
+        shared_raw_files[file_name] = {'usecols': usecols, 'keys': keys,
+                                       'df': None}
+    if shared_raw_files:
+        logging.info('Reading {} raw files shared by multiple vendor keys '
+                     'once.'.format(len(shared_raw_files)))
+
+
+def release_shared_raw_file(key):
+    for file_name, shared in list(shared_raw_files.items()):
+        shared['keys'].discard(key)
+        if not shared['keys']:
+            del shared_raw_files[file_name]
+
+
+def read_raw_file(file_name, usecols=None, key=None):
+    shared = shared_raw_files.get(file_name)
+    if not shared or key not in shared['keys']:
+        return utl.import_read_csv(file_name, cache=True, usecols=usecols)
+    if shared['df'] is None:
+        shared['df'] = utl.import_read_csv(file_name, cache=True,
+                                           usecols=shared['usecols'])
+    df = shared['df']
+    release_shared_raw_file(key)
+    if df is None:
+        return df
+    if usecols is not None:
+        return df.drop([x for x in df.columns if x not in usecols], axis=1)
+    if file_name not in shared_raw_files:
+        return df
+    return df.copy()
+
 
 class ImportConfig(object):
     key = 'Key'
@@ -297,20 +618,28 @@ class ImportConfig(object):
         self.matrix = None
         self.df = None
         self.matrix_df = None
+        self.new_rows = []
+        self.new_configs = {}
         self.base_path = base_path
         self.default_param_ic = default_param_ic
         if matrix:
-            self.import_vm()
+            self.import_vm(matrix)
         if not self.default_param_ic:
             self.default_param_ic = self
 
-    def import_vm(self):
-        self.matrix = VendorMatrix()
-        self.matrix_df = self.matrix.read()
+    def import_vm(self, matrix=None):
+        if isinstance(matrix, VendorMatrix):
+            self.matrix = matrix
+        elif not self.matrix:
+            self.matrix = VendorMatrix()
+        self.matrix_df = utl.get_snapshot('vm_df', csv_full_file,
+                                          VendorMatrix.read)
         self.df = self.read()
 
     def read(self):
-        df = utl.import_read_csv(self.file_name, self.file_path)
+        file_name = os.path.join(self.file_path, self.file_name)
+        df = utl.get_snapshot('csv', file_name, lambda: utl.import_read_csv(
+            self.file_name, self.file_path))
         return df
 
     def get_default_params(self, import_key, default_param=False):
@@ -338,8 +667,14 @@ class ImportConfig(object):
             new_name = '{}.{}'.format(new_name, name_list[1])
         return new_name
 
+    def get_col_values(self, col):
+        values = set(self.matrix_df[col])
+        for df in self.new_rows:
+            values.update(df[col])
+        return values
+
     def get_new_name(self, search_col, search_val):
-        file_list = sorted([x for x in self.matrix_df[search_col].unique()
+        file_list = sorted([x for x in self.get_col_values(search_col)
                             if search_val in str(x)])
         if len(file_list) > 0:
             append_val = len(file_list)
@@ -375,6 +710,13 @@ class ImportConfig(object):
                     return None
             else:
                 return None
+        config_file = utl.get_snapshot(file_library.__name__, file_name,
+                                       lambda: self.read_file(file_name,
+                                                              file_library))
+        return config_file
+
+    @staticmethod
+    def read_file(file_name, file_library):
         with open(file_name, 'r') as f:
             config_file = file_library.load(f)
         return config_file
@@ -392,8 +734,25 @@ class ImportConfig(object):
                 config_file=config_file, name=params[self.filter],
                 new_val=import_filter, nest=params[self.account_id_parent])
         new_file = os.path.join(self.file_path, new_file)
-        with open(new_file, 'w') as f:
-            file_library.dump(config_file, f)
+        self.new_configs[new_file] = (config_file, file_library)
+
+    def write_configs(self):
+        for file_name, (config_file, file_library) in self.new_configs.items():
+            tmp_file = '{}.tmp'.format(file_name)
+            with open(tmp_file, 'w') as f:
+                file_library.dump(config_file, f)
+            os.replace(tmp_file, file_name)
+            utl.drop_snapshot(file_name)
+        logging.info('Wrote {} config files.'.format(len(self.new_configs)))
+        self.new_configs = {}
+
+    def write(self):
+        self.write_configs()
+        if self.new_rows:
+            self.matrix_df = pd.concat([self.matrix_df] + self.new_rows,
+                                       ignore_index=True, sort=False)
+            self.new_rows = []
+        write_vm(self.matrix_df)
 
     @staticmethod
     def set_config_file_lib(file_name):
@@ -440,8 +799,7 @@ class ImportConfig(object):
         df[vmc.startdate] = start_date
         if api_fields:
             df[vmc.apifields] = api_fields
-        self.matrix_df = self.matrix_df.append(df, ignore_index=True,
-                                               sort=False)
+        self.new_rows.append(df)
         return df[vmc.vendorkey][0]
 
     def add_import_to_vm(self, import_key, account_id, import_filter=None,
@@ -459,30 +817,34 @@ class ImportConfig(object):
 
     def add_and_remove_from_vm(self, import_dicts, matrix=None):
         current_imports = self.get_current_imports(matrix=matrix)
+        import_vks = {x[vmc.vendorkey]: x for x in reversed(import_dicts)
+                      if vmc.vendorkey in x}
+        kept_imports = []
+        drop_keys = []
         for cur_import in current_imports:
-            if cur_import not in import_dicts:
-                if (vmc.vendorkey in cur_import and (
-                        cur_import[vmc.vendorkey] in
-                        [x[vmc.vendorkey] for x in import_dicts])):
-                    import_dict = [x for x in import_dicts if x[vmc.vendorkey]
-                                   == cur_import[vmc.vendorkey]][0]
-                    self.update_import(import_dict, cur_import)
-                else:
-                    key_name = 'API_{}_{}'.format(cur_import[self.key],
-                                                  cur_import['name'])
-                    drop_idx = self.matrix_df[self.matrix_df[vmc.vendorkey] ==
-                                              key_name].copy()
-                    drop_idx = drop_idx.index.values[0]
-                    self.matrix_df = self.matrix_df.drop(drop_idx)
-                    self.matrix_df.reset_index()
-        self.add_imports_to_vm(import_dicts)
-
-    def add_imports_to_vm(self, import_dicts):
+            if cur_import in import_dicts:
+                kept_imports.append(cur_import)
+            elif cur_import.get(vmc.vendorkey) in import_vks:
+                import_dict = import_vks[cur_import[vmc.vendorkey]]
+                self.update_import(import_dict, cur_import)
+                kept_imports.append(import_dict)
+            else:
+                drop_keys.append(cur_import[vmc.vendorkey])
+        if drop_keys:
+            logging.info('Removing {} imports.'.format(len(drop_keys)))
+            self.matrix_df = self.matrix_df[
+                ~self.matrix_df[vmc.vendorkey].isin(drop_keys)]
+        self.add_imports_to_vm(import_dicts, kept_imports)
+
+    def add_imports_to_vm(self, import_dicts, current_imports=None):
+        if current_imports is None:
+            current_imports = self.get_current_imports()
+        current_imports = list(current_imports)
         vks = []
         for import_dict in import_dicts:
-            current_imports = self.get_current_imports()
             if import_dict in current_imports:
                 continue
+            current_imports.append(import_dict)
             import_key = import_dict[self.key]
             account_id = import_dict[self.account_id]
             import_filter = import_dict[self.filter]
@@ -492,7 +854,8 @@ class ImportConfig(object):
             vk = self.add_import_to_vm(import_key, account_id, import_filter,
                                        start_date, api_fields, key_name)
             vks.append(vk)
-        self.matrix_df.to_csv(csv_full_file, index=False, encoding='utf-8')
+        logging.info('Adding {} imports.'.format(len(vks)))
+        self.write()
         return vks
 
     def update_import(self, import_dict, old_import_dict):
@@ -569,7 +932,7 @@ class ImportConfig(object):
 
     def get_current_imports(self, import_type='API_', matrix=None):
         if matrix:
-            self.import_vm()
+            self.import_vm(matrix)
         import_dicts = []
         api_keys = [x for x in self.matrix_df[vmc.vendorkey]
                     if x[:4] == import_type]
@@ -588,21 +951,14 @@ class ImportConfig(object):
         return import_dicts
 
 
-def full_placement_creation(df, key, full_col, full_place_cols):
-    logging.debug('Creating Full Placement Name')
+def full_placement_names(df, full_col, full_place_cols):
     df[full_col] = ''
-    df = utl.data_to_type(df, str_col=[x[2:] if x[:2] == '::' else x
-                                       for x in full_place_cols])
     for idx, col in enumerate(full_place_cols):
         if col[:2] == '::':
             col = col[2:]
             if col in df.columns:
                 df[col] = df[col].str.replace('_', '', regex=True)
         if col not in df:
-            logging.warning('{} was not in {}.  It was not included in '
-                            'Full Placement Name.  For reference column names'
-                            ' are as follows: \n {}'
-                            .format(col, key, df.columns.values.tolist()))
             continue
         if idx == 0:
             df[full_col] = df[col]
@@ -611,6 +967,55 @@ def full_placement_creation(df, key, full_col, full_place_cols):
     return df
 
 
+def get_placement_memo_key(udf, full_col, full_place_cols):
+    hashes = pd.util.hash_pandas_object(udf, index=False).values
+    if full_col not in udf.columns:
+        full_col = None
+    return (full_col, tuple(full_place_cols), tuple(udf.columns), len(udf),
+            hashlib.md5(hashes.tobytes()).hexdigest())
+
+
+def full_placement_creation(df, key, full_col, full_place_cols):
+    logging.debug('Creating Full Placement Name')
+    str_cols = [x[2:] if x[:2] == '::' else x for x in full_place_cols]
+    df = utl.data_to_type(df, str_col=str_cols)
+    for col in str_cols:
+        if col not in df:
+            logging.warning('{} was not in {}.  It was not included in '
+                            'Full Placement Name.  For reference column names'
+                            ' are as follows: \n {}'
+                            .format(col, key, df.columns.values.tolist()))
+    str_cols = [x for x in dict.fromkeys(str_cols) if x in df.columns]
+    if df.empty or not str_cols:
+        return full_placement_names(df, full_col, full_place_cols)
+    codes = np.zeros(len(df), dtype=np.int64)
+    for col in str_cols:
+        col_codes, col_uniques = pd.factorize(df[col])
+        codes = pd.factorize(codes * len(col_uniques) + col_codes)[0]
+    first = pd.Series(codes).drop_duplicates().index
+    udf = pd.DataFrame({x: df[x].values[first] for x in str_cols},
+                       columns=str_cols)
+    memo_key = get_placement_memo_key(udf, full_col, full_place_cols)
+    if memo_key in placement_memo:
+        logging.debug('Using stored {} for {} unique rows.'.format(
+            full_col, len(udf)))
+        full_names, names = placement_memo[memo_key]
+    else:
+        logging.debug('Creating {} from {} unique rows.'.format(
+            full_col, len(udf)))
+        udf = full_placement_names(udf, full_col, full_place_cols)
+        full_names = udf[full_col].values
+        names = {x[2:]: udf[x[2:]].values for x in full_place_cols
+                 if x[:2] == '::' and x[2:] in udf.columns}
+        if len(placement_memo) >= placement_memo_size:
+            del placement_memo[next(iter(placement_memo))]
+        placement_memo[memo_key] = (full_names, names)
+    df[full_col] = full_names[codes]
+    for col in names:
+        df[col] = names[col][codes]
+    return df
+
+
 def combining_data(df, key, columns, **kwargs):
     logging.debug('Combining Data.')
     combine_cols = [x for x in columns if kwargs[x] != ['nan']]
@@ -688,44 +1093,227 @@ class DataSource(object):
             self.set_in_vendormatrix(vm_rule[col], new_rule[col], matrix)
         return matrix
 
-    def get_raw_df(self):
-        df = utl.import_read_csv(self.p[vmc.filename])
-        if df is None or df.empty:
-            return df
+    def get_rule_columns(self):
+        cols = []
+        for rule in self.vm_rules.values():
+            metrics = str(self.params.get(rule.get(utl.RULE_METRIC)))
+            queries = str(self.params.get(rule.get(utl.RULE_QUERY)))
+            if metrics != 'nan':
+                metrics = metrics.split('::')[1:]
+                cols.extend(metrics[-1:])
+                cols.extend(x for y in metrics[:1] for x in y.split('|'))
+            if queries != 'nan':
+                cols.extend(x.split('::')[0] for x in queries.split('|'))
+        return cols
+
+    def get_transform_columns(self):
+        cols = []
+        if str(self.p[vmc.transform]) == 'nan':
+            return cols
+        for transform in self.p[vmc.transform].split(':::'):
+            transform = transform.split('::')
+            if transform[0] not in projection_transforms:
+                return None
+            cols.extend(transform[1:][projection_transforms[transform[0]]])
+        return cols
+
+    def get_projection(self):
+        if (int(self.p[vmc.firstrow]) > 0 or str(self.p[vmc.header]) != 'nan'
+                or 'ALL' not in self.p[vmc.dropcol]):
+            return None
+        transform_cols = self.get_transform_columns()
+        if transform_cols is None:
+            return None
+        cols = [x[2:] if x[:2] == '::' else x
+                for x in self.p[vmc.fullplacename]]
+        cols += [self.p[vmc.placement], self.p[vmc.autodicplace]]
+        cols += [x for y in self.get_active_metrics().values() for x in y]
+        cols += self.get_rule_columns() + transform_cols
+        cols += dctc.COLS + vmc.datacol + vmc.ad_rep_cols
+        return set(str(x) for x in cols)
+
+    def sample_check(self):
+        return (int(self.p[vmc.firstrow]) == 0 and
+                str(self.p[vmc.header]) == 'nan')
+
+    def get_raw_sample(self, usecols=None):
+        rng = np.random.RandomState(0)
+        sample = None
+        sample_keys = None
+        rows = 0
+        for df in utl.import_read_csv_chunks(
+                self.p[vmc.filename], preview_chunksize, usecols=usecols):
+            df.index = pd.RangeIndex(rows, rows + len(df))
+            rows += len(df)
+            keys = pd.Series(rng.random_sample(len(df)), index=df.index)
+            if sample is not None:
+                df = pd.concat([sample, df], sort=False)
+                keys = pd.concat([sample_keys, keys])
+            sample_keys = keys.nsmallest(preview_sample_rows)
+            sample = df.loc[sample_keys.index]
+        if sample is None:
+            return sample
+        sample = sample[sample.index < rows - int(self.p[vmc.lastrow])]
+        return sample.sort_index().reset_index(drop=True)
+
+    def read_raw_df(self, usecols=None, preview=False, sample=False):
+        file_name = self.p[vmc.filename]
+        if not preview:
+            return read_raw_file(file_name, usecols, self.key)
+        if sample and self.sample_check():
+            try:
+                return self.get_raw_sample(usecols)
+            except (pd.io.common.CParserError, UnicodeDecodeError) as e:
+                logging.warning('{} could not be sampled with error: {}  '
+                                'Reading the first rows.'.format(self.key, e))
+        first_row = int(self.p[vmc.firstrow])
+        last_row = int(self.p[vmc.lastrow])
+        nrows = first_row + preview_rows + last_row
+        df = utl.import_read_csv(file_name, nrows=nrows, usecols=usecols)
+        if df is not None and last_row > 0:
+            df = df.iloc[:max(first_row, len(df) - last_row)]
+        return df
+
+    def adjust_raw_df(self, df, preview=False):
+        last_row = 0 if preview else self.p[vmc.lastrow]
         df = utl.add_header(df, self.p[vmc.header], self.p[vmc.firstrow])
-        df = utl.first_last_adj(df, self.p[vmc.firstrow], self.p[vmc.lastrow])
+        df = utl.first_last_adj(df, self.p[vmc.firstrow], last_row)
         df = df_transform(df, self.p[vmc.transform])
+        return df
+
+    def get_raw_df(self, preview=False, sample=False, project=False):
+        usecols = self.get_projection() if project else None
+        df = self.read_raw_df(usecols, preview, sample)
+        if usecols is not None and df is not None and df.columns.empty:
+            if preview:
+                df = self.read_raw_df(preview=preview, sample=sample)
+            else:
+                df = utl.import_read_csv(self.p[vmc.filename], cache=True)
+        if df is None or df.empty:
+            return df
+        df = self.adjust_raw_df(df, preview)
         df = full_placement_creation(df, self.key, dctc.FPN,
                                      self.p[vmc.fullplacename])
         return df
 
-    def get_raw_columns(self):
-        if self.df.columns.empty:
-            self.df = self.get_raw_df()
+    def get_raw_preview(self):
+        sample = not self.row_transform_check()
+        df = self.read_raw_df(preview=True, sample=sample)
+        if df is None or df.empty:
+            return df
+        return self.adjust_raw_df(df, preview=True)
+
+    def get_raw_columns(self, exact=False):
+        if not self.df.columns.empty:
+            return self.df.columns
+        if not exact:
+            sample = not self.row_transform_check()
+            df = self.get_raw_df(preview=True, sample=sample)
+            return pd.Index([]) if df is None else df.columns
+        self.df = self.get_raw_df()
         return self.df.columns
 
-    def get_dict_order_df(self):
-        self.df = self.get_raw_df()
+    def get_placement_columns(self):
+        transform_cols = self.get_transform_columns()
+        if transform_cols is None:
+            return None
+        cols = [x[2:] if x[:2] == '::' else x
+                for x in self.p[vmc.fullplacename]]
+        cols += [self.p[vmc.placement]] + transform_cols
+        return set(str(x) for x in cols)
+
+    def get_placement_scan(self):
+        if not self.row_transform_check():
+            return self.get_raw_df()
+        try:
+            placement_df, usecols, dtype = self.get_chunk_placements(
+                preview_chunksize, self.get_placement_columns())
+        except (pd.io.common.CParserError, UnicodeDecodeError) as e:
+            logging.warning('{} could not be read in chunks with error: {}  '
+                            'Reading the full file.'.format(self.key, e))
+            return self.get_raw_df()
+        return placement_df
+
+    def get_dict_order_df(self, exact=False):
+        if exact:
+            self.df = self.get_raw_df()
+            df = self.df
+        else:
+            df = self.get_placement_scan()
         dic = dct.Dict()
-        err = er.ErrorReport(self.df, dic, self.p[vmc.placement],
-                             self.p[vmc.filenameerror])
+        err = er.ErrorReport(df, dic, self.p[vmc.placement],
+                             self.p[vmc.filenameerror], write=exact)
         error = dic.split_error_df(err, self.p[vmc.autodicord],
                                    self.p[vmc.autodicplace], include_index=True)
         return error
 
+    def get_placement_df(self, df):
+        cols = [dctc.FPN, self.p[vmc.placement]]
+        cols = [x for i, x in enumerate(cols) if x in df and x not in cols[:i]]
+        return df[cols].drop_duplicates()
+
+    def get_date_source(self, df):
+        date_map = self.p[vmc.date]
+        if date_map == ['nan']:
+            return pd.Series(0, index=df.index)
+        items = [x for x in date_map if x != vmc.date]
+        if [x for x in items if x not in df.columns]:
+            return None
+        if items:
+            return df[items[-1]]
+        if vmc.date in df.columns:
+            return df[vmc.date]
+        return None
+
+    def date_window_active(self):
+        today = dt.date.today()
+        return any(x.date() is not pd.NaT and x.date() != today
+                   for x in [self.p[vmc.startdate], self.p[vmc.enddate]])
+
+    def rule_sets_date(self):
+        for rule in self.vm_rules.values():
+            metrics = str(self.params.get(rule.get(utl.RULE_METRIC)))
+            metrics = metrics.split('::')
+            if metrics[0] == utl.PRE and vmc.date in metrics[1:]:
+                return True
+        return False
+
+    def date_window_removal(self, df):
+        if not self.date_window_active() or self.rule_sets_date():
+            return df
+        date_ser = self.get_date_source(df)
+        if date_ser is None:
+            return df
+        tdf = pd.DataFrame({vmc.date: date_ser.values})
+        tdf = utl.data_to_type(tdf, date_col=[vmc.date])
+        tdf = utl.date_removal(tdf, vmc.date, self.p[vmc.startdate],
+                               self.p[vmc.enddate])
+        logging.debug('Removed {} of {} rows outside of date window for '
+                      '{} before dictionary merge.'.format(
+                          len(df) - len(tdf), len(df), self.key))
+        df = df.iloc[tdf.index]
+        return df
+
+    def get_dictionary(self, placement_df):
+        with shared_file_access():
+            dic = dct.Dict(self.p[vmc.filenamedict])
+            err = er.ErrorReport(placement_df, dic, self.p[vmc.placement],
+                                 self.p[vmc.filenameerror])
+            dic.auto_functions(err=err, autodicord=self.p[vmc.autodicord],
+                               placement=self.p[vmc.autodicplace])
+        return dic
+
     def get_and_merge_dictionary(self, df):
-        dic = dct.Dict(self.p[vmc.filenamedict])
-        err = er.ErrorReport(df, dic, self.p[vmc.placement],
-                             self.p[vmc.filenameerror])
-        dic.auto_functions(err=err, autodicord=self.p[vmc.autodicord],
-                           placement=self.p[vmc.autodicplace])
+        dic = self.get_dictionary(self.get_placement_df(df))
+        df = self.date_window_removal(df)
         df = dic.merge(df, dctc.FPN)
         return df
 
     def combine_data(self, df):
         df = combining_data(df, self.key, vmc.datadatecol, **self.p)
         df = utl.data_to_type(df, date_col=vmc.datadatecol)
-        df = utl.apply_rules(df, self.vm_rules, utl.PRE, **self.p)
+        with prf.stage('apply_rules'):
+            df = utl.apply_rules(df, self.vm_rules, utl.PRE, **self.p)
         df = combining_data(df, self.key, vmc.datafloatcol, **self.p)
         df = utl.data_to_type(df, vmc.datafloatcol, vmc.datadatecol)
         return df
@@ -735,26 +1323,166 @@ class DataSource(object):
                               self.p[vmc.enddate])
         df = ad_cost_calculation(df)
         df = utl.col_removal(df, self.key, self.p[vmc.dropcol])
-        df = utl.apply_rules(df, self.vm_rules, utl.POST, **self.p)
+        with prf.stage('apply_rules'):
+            df = utl.apply_rules(df, self.vm_rules, utl.POST, **self.p)
         return df
 
-    def import_data(self):
-        self.df = self.get_raw_df()
+    def row_transform_check(self):
+        if str(self.p[vmc.transform]) == 'nan':
+            return True
+        return all(x.split('::')[0] in chunk_transforms
+                   for x in self.p[vmc.transform].split(':::'))
+
+    def chunk_check(self):
+        if int(self.p[vmc.firstrow]) > 0 or str(self.p[vmc.header]) != 'nan':
+            return False
+        return self.row_transform_check()
+
+    def get_header_value(self):
+        df = utl.import_read_csv(self.p[vmc.filename], nrows=0)
+        return df.columns[0]
+
+    def get_raw_chunks(self, chunksize, usecols=None, dtype=None, kinds=None):
+        first_row = int(self.p[vmc.firstrow])
+        last_row = int(self.p[vmc.lastrow])
+        header = self.p[vmc.header]
+        if first_row > 0:
+            dtype = str
+            if str(header) != 'nan':
+                header_value = self.get_header_value()
+        tail = None
+        for df in utl.import_read_csv_chunks(self.p[vmc.filename], chunksize,
+                                             usecols=usecols, dtype=dtype,
+                                             skiprows=first_row or None):
+            if kinds is not None:
+                for col, col_type in df.dtypes.items():
+                    kinds.setdefault(col, set()).add(col_type.kind)
+            if first_row > 0 and str(header) != 'nan':
+                df[header] = header_value
+            if last_row > 0:
+                if tail is not None:
+                    df = pd.concat([tail, df])
+                tail = df.iloc[-last_row:]
+                df = df.iloc[:-last_row]
+            if df.empty:
+                continue
+            df = df_transform(df, self.p[vmc.transform])
+            df = full_placement_creation(df, self.key, dctc.FPN,
+                                         self.p[vmc.fullplacename])
+            yield df
+
+    @staticmethod
+    def get_chunk_dtype(kinds):
+        return {col: float if kind <= set('iuf') else str
+                for col, kind in kinds.items() if len(kind) > 1}
+
+    def get_chunk_placement_df(self, chunksize, usecols=None, dtype=None,
+                               kinds=None):
+        pdfs = [self.get_placement_df(df) for df in
+                self.get_raw_chunks(chunksize, usecols, dtype, kinds)]
+        if not pdfs:
+            return None
+        return pd.concat(pdfs).drop_duplicates()
+
+    def get_chunk_placements(self, chunksize, usecols=None):
+        kinds = {}
+        log_filter = utl.UniqueMessageFilter()
+        logging.getLogger().addFilter(log_filter)
+        try:
+            placement_df = self.get_chunk_placement_df(chunksize, usecols,
+                                                       kinds=kinds)
+            if usecols is not None and placement_df is not None and not kinds:
+                usecols = None
+                placement_df = self.get_chunk_placement_df(chunksize,
+                                                           kinds=kinds)
+            dtype = self.get_chunk_dtype(kinds)
+            if dtype and placement_df is not None:
+                placement_df = self.get_chunk_placement_df(chunksize, usecols,
+                                                           dtype)
+        finally:
+            logging.getLogger().removeFilter(log_filter)
+        return placement_df, usecols, dtype
+
+    def import_data_chunks(self, chunksize):
+        if not self.chunk_check():
+            logging.info('{} cannot be processed in chunks.  Reading the '
+                         'full file.'.format(self.key))
+            yield self.import_data()
+            return
+        try:
+            placement_df, usecols, dtype = self.get_chunk_placements(
+                chunksize, self.get_projection())
+        except (pd.io.common.CParserError, UnicodeDecodeError) as e:
+            logging.warning('{} could not be read in chunks with error: {}  '
+                            'Reading the full file.'.format(self.key, e))
+            placement_df = False
+        if placement_df is False:
+            yield self.import_data()
+            return
+        if placement_df is None:
+            return
+        prf.count('file_size', utl.file_size(self.p[vmc.filename]))
+        with prf.stage('get_dictionary', self.key):
+            dic = self.get_dictionary(placement_df)
+        logging.info('Merging {} in chunks of {} rows'.format(
+            dic.filename, chunksize))
+        df = None
+        empty = True
+        log_filter = utl.UniqueMessageFilter()
+        logging.getLogger().addFilter(log_filter)
+        try:
+            for df in self.get_raw_chunks(chunksize, usecols, dtype):
+                prf.count('rows_read', len(df))
+                with prf.stage('get_and_merge_dictionary', self.key):
+                    df = self.date_window_removal(df)
+                    df = df.merge(dic.data_dict, on=dctc.FPN, how='left')
+                with prf.stage('combine_data', self.key):
+                    df = self.combine_data(df)
+                with prf.stage('remove_cols_and_make_calculations', self.key):
+                    df = self.remove_cols_and_make_calculations(df)
+                df[vmc.vendorkey] = self.key
+                if not df.empty:
+                    empty = False
+                    yield df
+        finally:
+            logging.getLogger().removeFilter(log_filter)
+        if empty and df is not None:
+            yield df
+
+    def import_data(self, chunksize=None):
+        if chunksize:
+            dfs = [x for x in self.import_data_chunks(chunksize)
+                   if x is not None]
+            if not dfs:
+                self.df = None
+            elif len(dfs) == 1:
+                self.df = dfs[0]
+            else:
+                self.df = pd.concat(dfs, ignore_index=True, sort=False)
+            return self.df
+        with prf.stage('get_raw_df', self.key):
+            self.df = self.get_raw_df(project=True)
+        prf.count('file_size', utl.file_size(self.p[vmc.filename]))
+        prf.count('rows_read', 0 if self.df is None else len(self.df))
         if self.df is None or self.df.empty:
             return self.df
-        self.df = self.get_and_merge_dictionary(self.df)
-        self.df = self.combine_data(self.df)
-        self.df = self.remove_cols_and_make_calculations(self.df)
+        with prf.stage('get_and_merge_dictionary', self.key):
+            self.df = self.get_and_merge_dictionary(self.df)
+        with prf.stage('combine_data', self.key):
+            self.df = self.combine_data(self.df)
+        with prf.stage('remove_cols_and_make_calculations', self.key):
+            self.df = self.remove_cols_and_make_calculations(self.df)
         self.df[vmc.vendorkey] = self.key
         return self.df
 
     def add_import_config_params(self, import_type='API_', matrix=None,
-                                 ic=None):
+                                 ic=None, current_imports=None):
         if not matrix:
             matrix = VendorMatrix()
         if not ic:
             ic = ImportConfig(matrix=matrix)
-        current_imports = ic.get_current_imports(matrix=True)
+        if current_imports is None:
+            current_imports = ic.get_current_imports(matrix=matrix)
         for x in current_imports:
             possible_keys = ['{}{}_{}'.format(import_type, x['Key'], x['name']),
                              '{}{}{}'.format(import_type, x['Key'], x['name'])]
@@ -789,6 +1517,15 @@ def import_plan_data(key, df, plan_omit_list, **kwargs):
     return dic.data_dict
 
 
+chunk_transforms = ['DateSplit', 'RawTranslate', 'AddColumn']
+
+projection_transforms = {
+    'MixedDateColumn': slice(0, 1),
+    'Merge': slice(1, 2),
+    'DateSplit': slice(0, 2),
+    'AddColumn': slice(0, 0)}
+
+
 def vm_update_rule_check(vm, vm_col):
     vm[vm_col] = vm[vm_col].astype('U')
     vm[vm_col] = np.where(
@@ -803,7 +1540,8 @@ def df_transform(df, transform):
         return df
     split_transform = transform.split(':::')
     for t in split_transform:
-        df = df_single_transform(df, t)
+        with prf.stage('transform {}'.format(t.split('::')[0])):
+            df = df_single_transform(df, t)
     return df
 
 
@@ -845,8 +1583,9 @@ def df_single_transform(df, transform):
             dfs[col][col] = dfs[col][col].astype('U')
             dfs[col][col] = dfs[col][col].str.strip('.0')
         filename = 'Merge-{}-{}.csv'.format(left_merge, right_merge)
-        err = er.ErrorReport(df, merge_df, None, filename,
-                             merge_col=[left_merge, right_merge])
+        with shared_file_access():
+            err = er.ErrorReport(df, merge_df, None, filename,
+                                 merge_col=[left_merge, right_merge])
         df = err.merge_df
         df = df.drop('_merge', axis=1)
     if transform_type == 'DateSplit':
@@ -921,4 +1660,4 @@ def vm_update(old_path=utl.config_path, old_file='OldVendorMatrix.csv'):
         vm = vm_update_rule_check(vm, col)
     vm = vm.fillna('')
     vm = vm.replace('nan', '')
-    vm.to_csv(csv_full_file, index=False, encoding='utf-8')
+    write_vm(vm)
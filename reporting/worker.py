@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+import datetime as dt
+import reporting.utils as utl
+
+worker_path = 'worker/'
+job_dir = 'jobs/'
+run_dir = 'running/'
+done_dir = 'done/'
+job_suffix = '.job'
+worker_flags = ['--worker', '--watch', '--submit']
+watch_paths = [utl.raw_path, utl.config_path]
+memo_paths = [utl.config_path, utl.dict_path]
+
+
+def strip_args(arguments, flags=None):
+    if flags is None:
+        flags = worker_flags
+    return ' '.join(x for x in arguments.split() if x not in flags)
+
+
+def submit_job(arguments, path=worker_path):
+    job_path = os.path.join(path, job_dir)
+    utl.dir_check(job_path)
+    name = '{}_{}'.format(dt.datetime.now().strftime('%Y%m%d%H%M%S%f'),
+                          os.getpid())
+    file_name = os.path.join(job_path, '{}{}'.format(name, job_suffix))
+    tmp_file = '{}.tmp'.format(file_name)
+    with open(tmp_file, 'w') as f:
+        f.write(strip_args(arguments))
+    os.replace(tmp_file, file_name)
+    logging.info('Submitted job {} with arguments: {}'.format(name, arguments))
+    return name
+
+
+class Worker(object):
+    def __init__(self, main_fnc, path=worker_path, poll=1, watch=None):
+        self.main_fnc = main_fnc
+        self.path = path
+        self.poll = poll
+        self.watch = watch
+        self.job_path = os.path.join(self.path, job_dir)
+        self.run_path = os.path.join(self.path, run_dir)
+        self.done_path = os.path.join(self.path, done_dir)
+        for path in [self.job_path, self.run_path, self.done_path]:
+            utl.dir_check(path)
+        self.watch_state = self.get_watch_state()
+
+    def get_jobs(self):
+        return sorted(x for x in os.listdir(self.job_path)
+                      if x.endswith(job_suffix))
+
+    def claim(self, job):
+        run_file = os.path.join(self.run_path, job)
+        try:
+            os.replace(os.path.join(self.job_path, job), run_file)
+        except OSError:
+            return None
+        return run_file
+
+    def run_job(self, name, arguments):
+        logging.info('Running job {} with arguments: {}'.format(
+            name, arguments))
+        start = time.time()
+        status = 'success'
+        try:
+            self.main_fnc(arguments)
+        except SystemExit as e:
+            status = 'exit {}'.format(e.code)
+        except Exception as e:
+            logging.exception('Job {} failed: {}'.format(name, e))
+            status = 'error {}'.format(e)
+        result = {'job': name, 'arguments': arguments, 'status': status,
+                  'start': dt.datetime.fromtimestamp(start).isoformat(),
+                  'seconds': round(time.time() - start, 3)}
+        file_name = os.path.join(self.done_path, '{}.json'.format(name))
+        with open(file_name, 'w') as f:
+            json.dump(result, f)
+        logging.info('Job {} finished with status {} in {} seconds.'.format(
+            name, status, result['seconds']))
+        return result
+
+    def run_queued_job(self, job):
+        run_file = self.claim(job)
+        if not run_file:
+            return None
+        with open(run_file, 'r') as f:
+            arguments = f.read().strip()
+        result = self.run_job(job[:-len(job_suffix)], arguments)
+        os.remove(run_file)
+        return result
+
+    @staticmethod
+    def get_watch_state():
+        state = {}
+        for path in watch_paths:
+            for root, dirs, files in os.walk(path):
+                for file_name in files:
+                    file_name = os.path.join(root, file_name)
+                    try:
+                        state[file_name] = os.stat(file_name).st_mtime_ns
+                    except OSError:
+                        continue
+        return state
+
+    def check_watch(self):
+        state = self.get_watch_state()
+        changed = [x for x in set(state) | set(self.watch_state)
+                   if state.get(x) != self.watch_state.get(x)]
+        self.watch_state = state
+        if changed:
+            logging.info('{} files changed under {}.'.format(
+                len(changed), ', '.join(watch_paths)))
+        return changed
+
+    def run(self, max_jobs=None):
+        utl.set_csv_memo(memo_paths)
+        logging.info('Worker waiting for jobs in {}'.format(self.job_path))
+        jobs_run = 0
+        while max_jobs is None or jobs_run < max_jobs:
+            jobs = self.get_jobs()
+            for job in jobs:
+                if self.run_queued_job(job):
+                    self.watch_state = self.get_watch_state()
+                    jobs_run += 1
+            if self.watch is not None and self.check_watch():
+                name = 'watch_{}'.format(
+                    dt.datetime.now().strftime('%Y%m%d%H%M%S%f'))
+                self.run_job(name, self.watch)
+                self.watch_state = self.get_watch_state()
+                jobs_run += 1
+            if not jobs:
+                time.sleep(self.poll)
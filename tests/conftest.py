@@ -0,0 +1,128 @@
+import os
+import shutil
+import pytest
+import numpy as np
+import pandas as pd
+import reporting.calc as cal
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.vendormatrix as vm
+
+buy_models = [(cal.BM_CPM, 4.0), (cal.BM_CPC, 0.5), (cal.BM_FLAT, 500.0)]
+
+
+def get_raw_df(rows=120, placements=8, days=10, seed=0):
+    rng = np.random.RandomState(seed)
+    place = rng.randint(placements, size=rows)
+    return pd.DataFrame({
+        'Day': (pd.Timestamp('2020-01-01') + pd.to_timedelta(
+            rng.randint(days, size=rows), unit='D')).strftime('%m/%d/%Y'),
+        'Campaign': ['Camp{}'.format(x % 3) for x in place],
+        'Vendor': ['Vendor{}'.format(x % 2) for x in place],
+        'Buy Model': [buy_models[x % len(buy_models)][0] for x in place],
+        'Buy Rate': [buy_models[x % len(buy_models)][1] for x in place],
+        'Ad': ['ad_{}'.format(x) for x in place],
+        'Imps': rng.randint(1000, size=rows),
+        'Clicks': rng.randint(50, size=rows),
+        'Spend': (rng.random_sample(rows) * 100).round(2)},
+        columns=['Day', 'Campaign', 'Vendor', 'Buy Model', 'Buy Rate', 'Ad',
+                 'Imps', 'Clicks', 'Spend'])
+
+
+def write_configs():
+    pd.DataFrame({dctc.DICT_COL_NAME: [dctc.AGY],
+                  dctc.DICT_COL_VALUE: ['Agency'],
+                  dctc.DICT_COL_DICTNAME: [np.nan]}).to_csv(
+        os.path.join(utl.config_path, dctc.filename_con_config), index=False)
+    pd.DataFrame(columns=[dctc.RK, dctc.FN, dctc.KEY, dctc.DEP,
+                          dctc.AUTO]).to_csv(
+        os.path.join(utl.config_path, dctc.filename_rel_config), index=False)
+    pd.DataFrame(columns=[dctc.DICT_COL_NAME, dctc.DICT_COL_VALUE,
+                          dctc.DICT_COL_NVALUE, dctc.DICT_COL_FNC,
+                          dctc.DICT_COL_SEL]).to_csv(
+        os.path.join(utl.dict_path, 'Translational',
+                     dctc.filename_tran_config), index=False)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    path = tmp_path / 'project'
+    for sub_path in [utl.config_path, utl.raw_path,
+                     os.path.join(utl.dict_path, 'Relational'),
+                     os.path.join(utl.dict_path, 'Translational')]:
+        os.makedirs(str(path / sub_path))
+    monkeypatch.chdir(path)
+    write_configs()
+    return path
+
+
+@pytest.fixture
+def raw_df():
+    return get_raw_df
+
+
+@pytest.fixture
+def raw_file(project):
+    def write_raw_file(file_name, df=None, **kwargs):
+        if df is None:
+            df = get_raw_df(**kwargs)
+        df.to_csv(os.path.join(utl.raw_path, file_name), index=False)
+        return df
+    return write_raw_file
+
+
+@pytest.fixture
+def vendor_row():
+    def get_vendor_row(key, file_name, **params):
+        row = {vmc.vendorkey: key, vmc.filename: file_name,
+               vmc.firstrow: 0, vmc.lastrow: 0,
+               vmc.fullplacename: 'Campaign|Vendor|Buy Model|Buy Rate|::Ad',
+               vmc.placement: 'Campaign',
+               vmc.filenamedict: '{}_dictionary.csv'.format(key),
+               vmc.filenameerror: '{}_error.csv'.format(key),
+               vmc.dropcol: 'ALL', vmc.autodicplace: dctc.FPN,
+               vmc.autodicord: '|'.join([dctc.CAM, dctc.VEN, dctc.BM,
+                                         dctc.BR, dctc.CRE]),
+               vmc.date: 'Day', vmc.impressions: 'Imps',
+               vmc.clicks: 'Clicks', vmc.cost: 'Spend'}
+        for col in vmc.datacol:
+            row.setdefault(col, 'nan')
+        row.update(params)
+        return row
+    return get_vendor_row
+
+
+@pytest.fixture
+def matrix_file(project):
+    def write_matrix(rows):
+        rows = rows + [{
+            vmc.vendorkey: vm.plan_key, vmc.filename: 'plan.csv',
+            vmc.firstrow: 0, vmc.lastrow: 0,
+            vmc.fullplacename: '|'.join([dctc.CAM, dctc.VEN]),
+            vmc.filenamedict: dctc.PFN,
+            vmc.filenameerror: 'plannet_error.csv', vmc.dropcol: 'ALL',
+            vmc.autodicplace: dctc.FPN,
+            vmc.autodicord: '|'.join([dctc.CAM, dctc.VEN])}]
+        columns = [vmc.vendorkey] + vmc.vmkeys
+        columns += [x for row in rows for x in row if x not in columns]
+        df = pd.DataFrame(rows, columns=columns)
+        df.to_csv(vm.csv_full_file, index=False)
+        return df
+    return write_matrix
+
+
+@pytest.fixture
+def run_vm_loop(project, monkeypatch):
+    runs = []
+
+    def run(calculate=False, **kwargs):
+        path = '{}_run{}'.format(project, len(runs))
+        shutil.copytree(str(project), path)
+        monkeypatch.chdir(path)
+        runs.append(path)
+        df = vm.VendorMatrix().vm_loop(**kwargs)
+        if calculate:
+            df = cal.calculate_cost(df)
+        return df
+    return run
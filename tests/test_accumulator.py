@@ -0,0 +1,94 @@
+import os
+import pytest
+import pandas as pd
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.accumulator as acm
+
+
+def get_frames():
+    return [('a', pd.DataFrame({'Ad': ['x', 'y'], 'Clicks': [1, 2]})),
+            ('b', None),
+            ('c', pd.DataFrame({'Clicks': [3.5], 'Campaign': ['z']})),
+            ('d', pd.DataFrame({'Ad': ['w'], 'Date': ['1/1/2020']}))]
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_accumulator_matches_append(tmp_path, stream):
+    acc = acm.FrameAccumulator(columns=['Date', 'Impressions'],
+                               stream=stream, path=str(tmp_path))
+    expected = pd.DataFrame(columns=['Date', 'Impressions'])
+    for key, df in get_frames():
+        acc.add(key, df)
+        if df is not None:
+            expected = pd.concat([expected, df], ignore_index=True,
+                                 sort=True)
+    if stream:
+        assert all(isinstance(x, str) and os.path.isfile(x)
+                   for x in acc.frames)
+    df = acc.get()
+    assert df.columns.tolist() == ['Ad', 'Campaign', 'Clicks', 'Date',
+                                   'Impressions']
+    assert len(df) == 4
+    assert df['Clicks'].iloc[:3].tolist() == [1, 2, 3.5]
+    assert df['Clicks'].isnull().tolist() == [False, False, False, True]
+    pd.testing.assert_frame_equal(df, expected)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_accumulator_empty():
+    acc = acm.FrameAccumulator()
+    acc.add('a', None)
+    assert acc.get().empty
+
+
+@pytest.fixture
+def vendors(raw_file, vendor_row, matrix_file):
+    raw_file('a.csv')
+    raw_file('b.csv', seed=1, rows=80)
+    raw_file('c.csv', df=pd.DataFrame(columns=['Day', 'Campaign']))
+    matrix_file([vendor_row('Rawfile_A', 'a.csv'),
+                 vendor_row('Rawfile_B', 'b.csv', **{vmc.clicks: 'nan'}),
+                 vendor_row('Rawfile_C', 'c.csv')])
+
+
+def test_stream_matches_memory(vendors, run_vm_loop):
+    df = run_vm_loop()
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_A': 120, 'Rawfile_B': 80}
+    assert df.loc[df[vmc.vendorkey] == 'Rawfile_B', vmc.clicks].eq(0).all()
+    pd.testing.assert_frame_equal(run_vm_loop(stream=True), df)
+
+
+@pytest.mark.parametrize('chunksize', [1, 7, 1000])
+def test_write_csv_chunks_matches_to_csv(tmp_path, chunksize):
+    df = pd.DataFrame({
+        'Ad': pd.Categorical(['x', None, 'y'] * 10),
+        'Clicks': pd.Series([0., 0., 2.5] * 10).astype(
+            pd.SparseDtype(float, 0)),
+        'Date': pd.to_datetime(['2020-01-01', None, '2020-01-03'] * 10),
+        'Campaign': ['a,b', 'c"d', None] * 10})
+    file_name = str(tmp_path / 'output.csv')
+    utl.write_csv_chunks(df, file_name, chunksize)
+    assert os.listdir(str(tmp_path)) == ['output.csv']
+    with open(file_name, 'rb') as f:
+        output = f.read()
+    expected = utl.dense_columns(df.copy()).to_csv(index=False)
+    assert output == expected.encode('utf-8')
+    assert len(pd.read_csv(file_name)) == 30
+    assert pd.api.types.is_sparse(df['Clicks'])
+
+
+def test_write_csv_chunks_empty(tmp_path):
+    file_name = str(tmp_path / 'output.csv')
+    utl.write_csv_chunks(pd.DataFrame(columns=['a', 'b']), file_name)
+    with open(file_name, 'r') as f:
+        assert f.read() == 'a,b\n'
+
+
+def test_stream_output_matches_memory(vendors, run_vm_loop):
+    df = run_vm_loop(calculate=True)
+    sdf = run_vm_loop(calculate=True, stream=True)
+    utl.write_csv_chunks(sdf, 'output.csv', chunksize=50)
+    with open('output.csv', 'r', encoding='utf-8') as f:
+        assert f.read() == df.to_csv(index=False)
@@ -0,0 +1,64 @@
+import os
+import json
+import pytest
+
+pytest.importorskip('seaborn')
+import reporting.utils as utl  # noqa: E402
+import reporting.benchmark as bm  # noqa: E402
+
+
+def get_report(walls, **params):
+    return {'date': '2020-01-01', 'commit': None,
+            'params': dict({'rows': 100}, **params),
+            'stages': [{'stage': name, 'key': None, 'wall': wall}
+                       for name, wall in walls.items()]}
+
+
+def test_compare():
+    base = get_report({'vm_loop': 1., 'calculate_cost': .5, 'tiny': .001})
+    report = get_report({'vm_loop': 1.05, 'calculate_cost': .8,
+                         'tiny': .005, 'new': 2.})
+    regressions = bm.compare(base, report, threshold=.1)
+    assert [(x['stage'], x['change']) for x in regressions] == [
+        ('calculate_cost', .6)]
+    assert not bm.compare(base, report, threshold=.7)
+
+
+def test_synthetic_project_is_seeded(tmpdir):
+    files = []
+    for name in ['a', 'b']:
+        path = str(tmpdir.join(name))
+        bm.SyntheticProject(path, vendors=2, rows=50, placements=5).create()
+        raw_path = os.path.join(path, utl.raw_path)
+        files.append({x: open(os.path.join(raw_path, x), 'rb').read()
+                      for x in sorted(os.listdir(raw_path))})
+    assert len(files[0]) == 3
+    assert files[0] == files[1]
+
+
+def test_benchmark_main(tmpdir):
+    output = str(tmpdir.join('benchmark.json'))
+    cur_path = os.getcwd()
+    assert bm.main('--vendors 2 --rows 60 --placements 5 --days 5 '
+                   '--repeat 1 --noanalyze --output {}'.format(output)) == 0
+    assert os.getcwd() == cur_path
+    with open(output, 'r') as f:
+        report = json.load(f)
+    assert report['rows'] == 120
+    assert report['output_rows'] > 0
+    stages = {x['stage']: x for x in report['stages']}
+    for stage in ['vm_loop', 'calculate_cost', 'write_output', 'translation']:
+        assert stages[stage]['rows'] == 120
+        assert stages[stage]['wall'] >= 0
+    assert stages['vm_loop']['peak_memory'] > 0
+    assert bm.main('--vendors 2 --rows 60 --placements 5 --days 5 '
+                   '--repeat 1 --noanalyze --output {} --compare {} '
+                   '--threshold -1'.format(output, output)) == 1
+
+
+def test_reset_state(project):
+    os.makedirs(os.path.join(utl.cache_path, 'raw'))
+    utl.csv_memo['file'] = None
+    bm.Benchmark.reset_state()
+    assert not os.path.exists(utl.cache_path)
+    assert not utl.csv_memo
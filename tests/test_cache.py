@@ -0,0 +1,96 @@
+import os
+import pytest
+import pandas as pd
+import reporting.cache as vc
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    rows = []
+    for idx in range(2):
+        file_name = 'vendor_{}.csv'.format(idx)
+        raw_file(file_name, seed=idx, rows=50 + idx)
+        rows.append(vendor_row('Rawfile_{}'.format(idx), file_name))
+    matrix_file(rows)
+    return rows
+
+
+@pytest.fixture
+def imports(monkeypatch):
+    imported = []
+    vendor_get = vm.VendorMatrix.vendor_get
+
+    def spy(self, vk, *args):
+        if vk != vm.plan_key:
+            imported.append(vk)
+        return vendor_get(self, vk, *args)
+    monkeypatch.setattr(vm.VendorMatrix, 'vendor_get', spy)
+    return imported
+
+
+def run_cached():
+    return vm.VendorMatrix().vm_loop(cache=True)
+
+
+def test_cache_reuses_unchanged_vendors(vendor_keys, imports):
+    df = run_cached()
+    assert imports == ['Rawfile_0', 'Rawfile_1']
+    assert sorted(vc.VendorCache().index) == ['Rawfile_0', 'Rawfile_1']
+    del imports[:]
+    cdf = run_cached()
+    assert imports == []
+    assert cdf[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_0': 50, 'Rawfile_1': 51}
+    pd.testing.assert_frame_equal(cdf, df)
+
+
+def test_cache_invalidated_by_raw_file(vendor_keys, imports, raw_file):
+    run_cached()
+    del imports[:]
+    raw_file('vendor_1.csv', seed=5, rows=70)
+    stat = os.stat(os.path.join('raw_data', 'vendor_1.csv'))
+    os.utime(os.path.join('raw_data', 'vendor_1.csv'),
+             ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    df = run_cached()
+    assert imports == ['Rawfile_1']
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_0': 50, 'Rawfile_1': 70}
+
+
+def test_cache_invalidated_by_matrix_params(vendor_keys, imports,
+                                            matrix_file):
+    run_cached()
+    del imports[:]
+    vendor_keys[0][vmc.placement] = 'Vendor'
+    matrix_file(vendor_keys)
+    run_cached()
+    assert imports == ['Rawfile_0']
+
+
+def test_fingerprint_changes_with_params(vendor_keys):
+    matrix = vm.VendorMatrix()
+    params = matrix.vendor_set('Rawfile_0')
+    fingerprint = vc.VendorCache.fingerprint(
+        'Rawfile_0', params, matrix.vm_rules_dict)
+    assert fingerprint == vc.VendorCache.fingerprint(
+        'Rawfile_0', matrix.vendor_set('Rawfile_0'), matrix.vm_rules_dict)
+    params[vmc.firstrow] = 1
+    assert fingerprint != vc.VendorCache.fingerprint(
+        'Rawfile_0', params, matrix.vm_rules_dict)
+
+
+def test_cache_prunes_removed_vendors(vendor_keys, imports, matrix_file):
+    run_cached()
+    cache = vc.VendorCache()
+    removed_file = cache.file_name('Rawfile_1')
+    assert os.path.isfile(removed_file)
+    matrix_file(vendor_keys[:1])
+    del imports[:]
+    df = run_cached()
+    assert imports == []
+    assert df[vmc.vendorkey].unique().tolist() == ['Rawfile_0']
+    assert sorted(vc.VendorCache().index) == ['Rawfile_0']
+    assert not os.path.isfile(removed_file)
+    assert os.path.isfile(cache.file_name('Rawfile_0'))
@@ -0,0 +1,97 @@
+import pytest
+import pandas as pd
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_df, raw_file, vendor_row, matrix_file):
+    raw_file('vendor_plain.csv', rows=130)
+    df = raw_df(rows=90, seed=1)
+    df = df.rename(columns={'Day': 'Start'})
+    df['End'] = (pd.to_datetime(df['Start']) + pd.to_timedelta(
+        df.index % 3, unit='D')).dt.strftime('%m/%d/%Y')
+    df['Clicks'] = ['{}.5'.format(x) if idx >= 60 else str(x)
+                    for idx, x in enumerate(df['Clicks'])]
+    df['Spend'] = ['${:,.2f}'.format(x * 20) if idx >= 60 else x
+                   for idx, x in enumerate(df['Spend'])]
+    raw_file('vendor_split.csv', df)
+    matrix_file([
+        vendor_row('Rawfile_Plain', 'vendor_plain.csv', **{vmc.lastrow: 3}),
+        vendor_row('Rawfile_Split', 'vendor_split.csv', **{
+            vmc.date: 'Start', vmc.transform: 'DateSplit::Start::End'})])
+    return int((df.index % 3 + 1).values.sum())
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    chunked = set()
+    import_data_chunks = vm.DataSource.import_data_chunks
+
+    def spy_chunks(self, chunksize):
+        chunked.add(self.key)
+        return import_data_chunks(self, chunksize)
+    monkeypatch.setattr(vm.DataSource, 'import_data_chunks', spy_chunks)
+    return chunked
+
+
+def test_chunked_matches_whole_file(vendor_keys, chunked, run_vm_loop):
+    df = run_vm_loop(calculate=True)
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_Plain': 127, 'Rawfile_Split': vendor_keys}
+    assert not chunked
+    cdf = run_vm_loop(calculate=True, chunksize=40)
+    assert chunked == {'Rawfile_Plain', 'Rawfile_Split'}
+    assert cdf.columns.tolist() == df.columns.tolist()
+    pd.testing.assert_frame_equal(cdf, df)
+
+
+def test_chunked_parallel_matches_whole_file(vendor_keys, run_vm_loop):
+    df = run_vm_loop(calculate=True)
+    pdf = run_vm_loop(calculate=True, processes=2, chunksize=40)
+    pd.testing.assert_frame_equal(pdf, df)
+
+
+def test_chunk_dtype(vendor_keys):
+    source = vm.VendorMatrix().get_data_source('Rawfile_Split')
+    kinds = {}
+    for df in source.get_raw_chunks(40, kinds=kinds):
+        pass
+    assert kinds['Clicks'] == {'i', 'f'}
+    assert kinds['Spend'] == {'f', 'O'}
+    assert kinds['Imps'] == {'i'}
+    assert source.get_chunk_dtype(kinds) == {'Clicks': float, 'Spend': str}
+
+
+def test_chunked_converts_formatted_costs(vendor_keys, run_vm_loop):
+    df = run_vm_loop(chunksize=40)
+    df = df[df[vmc.vendorkey] == 'Rawfile_Split']
+    assert df[vmc.cost].dtype == float
+    assert df[vmc.cost].max() > 1000
+    pd.testing.assert_frame_equal(
+        df, run_vm_loop()[lambda x: x[vmc.vendorkey] == 'Rawfile_Split'])
+
+
+def test_chunk_check(vendor_keys):
+    matrix = vm.VendorMatrix()
+    assert matrix.get_data_source('Rawfile_Split').chunk_check()
+    source = matrix.get_data_source('Rawfile_Plain')
+    assert source.chunk_check()
+    source.p[vmc.transform] = 'Pivot::Vendor::Imps'
+    assert not source.chunk_check()
+
+
+def test_melt_is_not_chunked(raw_file, vendor_row, matrix_file, run_vm_loop,
+                             chunked):
+    raw_file('vendor_melt.csv', rows=100)
+    matrix_file([vendor_row('Rawfile_Melt', 'vendor_melt.csv', **{
+        vmc.transform: 'Melt::Metric::Imps|Clicks',
+        vmc.impressions: 'Metric-value', vmc.clicks: 'nan'})])
+    source = vm.VendorMatrix().get_data_source('Rawfile_Melt')
+    assert not source.chunk_check()
+    df = run_vm_loop(calculate=True)
+    assert len(df) == 200
+    assert chunked == set()
+    cdf = run_vm_loop(calculate=True, chunksize=30)
+    assert chunked == {'Rawfile_Melt'}
+    pd.testing.assert_frame_equal(cdf, df)
@@ -0,0 +1,74 @@
+import pytest
+import pandas as pd
+import reporting.calc as cal
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.accumulator as acm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    raw_file('vendor_0.csv', rows=150)
+    raw_file('vendor_1.csv', rows=90, seed=1, placements=5)
+    matrix_file([vendor_row('Rawfile_0', 'vendor_0.csv'),
+                 vendor_row('Rawfile_1', 'vendor_1.csv')])
+
+
+def test_union_categories():
+    frames = [pd.DataFrame({'a': pd.Categorical(['x', 'y', 'x']),
+                            'b': pd.Categorical(['p', 'p', 'q'])}),
+              pd.DataFrame({'a': pd.Categorical(['w']), 'b': ['r']}),
+              pd.DataFrame({'c': [1, 2]})]
+    frames = acm.FrameAccumulator.union_categories(frames)
+    assert all(pd.api.types.is_categorical_dtype(x['a']) for x in frames)
+    assert frames[0]['a'].cat.categories.tolist() == ['w', 'x', 'y']
+    assert frames[2]['a'].isnull().all()
+    assert all(x['b'].dtype == object for x in frames if 'b' in x)
+
+
+def test_compact_matches_object_output(vendor_keys, run_vm_loop):
+    df = run_vm_loop()
+    cdf = run_vm_loop(compact=True)
+    for col in [dctc.FPN, dctc.PN, dctc.BM, dctc.CRE]:
+        assert pd.api.types.is_categorical_dtype(cdf[col]), col
+    assert sorted(cdf[dctc.BM].cat.categories) == [
+        cal.BM_CPC, cal.BM_CPM, cal.BM_FLAT]
+    assert len(cdf) == 240
+    df = cal.calculate_cost(df)
+    cdf = cal.calculate_cost(cdf)
+    assert cdf[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_0': 150, 'Rawfile_1': 90}
+    assert cdf.columns.tolist() == df.columns.tolist()
+    assert cdf.to_csv(index=False) == df.to_csv(index=False)
+
+
+def test_compact_analyze_groupbys(vendor_keys, run_vm_loop):
+    pytest.importorskip('seaborn')
+    import reporting.analyze as az
+    df = cal.calculate_cost(run_vm_loop())
+    cdf = cal.calculate_cost(run_vm_loop(compact=True))
+    group = [dctc.BM, dctc.CRE]
+    metrics = [vmc.impressions, vmc.clicks, vmc.cost]
+    table = az.Analyze(df=df).generate_df_table(group, metrics)
+    ctable = az.Analyze(df=cdf).generate_df_table(group, metrics)
+    assert len(ctable) == len(table) == 8
+    pd.testing.assert_frame_equal(
+        ctable.reset_index().astype({x: object for x in group}),
+        table.reset_index())
+    mean = az.Analyze.get_rolling_mean_df(df, vmc.cost, group)
+    cmean = az.Analyze.get_rolling_mean_df(cdf, vmc.cost, group)
+    pd.testing.assert_frame_equal(cmean, mean)
+
+
+def test_net_cum_sum_with_categories():
+    df = pd.DataFrame({
+        dctc.PFPN: ['b', 'a', 'b', 'a', 'b'],
+        vmc.date: pd.to_datetime(['2020-01-03', '2020-01-02', '2020-01-01',
+                                  '2020-01-01', '2020-01-02']),
+        vmc.cost: [1., 2., 4., 8., 16.]})
+    cdf = df.copy()
+    cdf[dctc.PFPN] = cdf[dctc.PFPN].astype('category')
+    cdf = cal.net_cum_sum(cdf)
+    df = cal.net_cum_sum(df)
+    assert df[cal.NC_CUM_SUM].tolist() == [21., 10., 4., 8., 20.]
+    assert cdf[cal.NC_CUM_SUM].tolist() == df[cal.NC_CUM_SUM].tolist()
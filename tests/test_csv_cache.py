@@ -0,0 +1,99 @@
+import os
+import pytest
+import pandas as pd
+import reporting.utils as utl
+
+
+@pytest.fixture
+def csv_file(raw_file):
+    raw_file('vendor.csv', rows=30)
+    return os.path.join(utl.raw_path, 'vendor.csv')
+
+
+@pytest.fixture
+def csv_cache(project):
+    utl.set_csv_cache(True)
+    yield
+    utl.set_csv_cache(False)
+
+
+@pytest.fixture
+def csv_reads(monkeypatch):
+    reads = []
+    read_csv = pd.read_csv
+
+    def spy(*args, **kwargs):
+        reads.append(args[0])
+        return read_csv(*args, **kwargs)
+    monkeypatch.setattr(pd, 'read_csv', spy)
+    return reads
+
+
+def test_csv_cache_writes_sidecar(csv_file, csv_cache, csv_reads):
+    df = utl.import_read_csv(csv_file, cache=True)
+    sidecar = utl.csv_sidecar_name(csv_file)
+    assert os.path.isfile('{}.pkl'.format(sidecar))
+    assert os.path.isfile('{}.json'.format(sidecar))
+    cdf = utl.import_read_csv(csv_file, cache=True)
+    assert csv_reads == [csv_file]
+    assert len(cdf) == 30
+    assert cdf.columns.tolist() == df.columns.tolist()
+    pd.testing.assert_frame_equal(cdf, df)
+
+
+def test_csv_cache_invalidated_by_change(csv_file, csv_cache, csv_reads,
+                                        raw_file):
+    utl.import_read_csv(csv_file, cache=True)
+    raw_file('vendor.csv', rows=40, seed=3)
+    stat = os.stat(csv_file)
+    os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    df = utl.import_read_csv(csv_file, cache=True)
+    assert csv_reads == [csv_file, csv_file]
+    assert len(df) == 40
+
+
+def test_csv_cache_skips_partial_reads(csv_file, csv_cache, csv_reads):
+    df = utl.import_read_csv(csv_file, cache=True, nrows=5)
+    assert len(df) == 5
+    assert not os.path.isfile(
+        '{}.json'.format(utl.csv_sidecar_name(csv_file)))
+    utl.import_read_csv(csv_file)
+    assert len(csv_reads) == 2
+
+
+def test_csv_cache_disabled(csv_file, csv_reads):
+    utl.import_read_csv(csv_file, cache=True)
+    utl.import_read_csv(csv_file, cache=True)
+    assert len(csv_reads) == 2
+    assert not os.path.isdir(os.path.join(utl.cache_path, 'raw'))
+
+
+def test_prune_csv_sidecars(csv_file, csv_cache, raw_file):
+    raw_file('other.csv', rows=10)
+    other_file = os.path.join(utl.raw_path, 'other.csv')
+    for file_name in [csv_file, other_file]:
+        utl.import_read_csv(file_name, cache=True)
+        utl.import_read_csv(file_name, cache=True, usecols=['Day', 'Imps'])
+    path = os.path.join(utl.cache_path, 'raw')
+    orphan = os.path.join(path, 'orphan.pkl')
+    open(orphan, 'w').close()
+    assert len(os.listdir(path)) == 9
+    assert utl.prune_csv_sidecars() == 1
+    os.remove(other_file)
+    stat = os.stat(csv_file)
+    os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    utl.import_read_csv(csv_file, cache=True)
+    utl.set_csv_cache(True)
+    sidecar = utl.csv_sidecar_name(csv_file)
+    assert sorted(os.listdir(path)) == sorted(
+        os.path.basename('{}.{}'.format(sidecar, x)) for x in ['json', 'pkl'])
+
+
+def test_analyze_output_is_not_cached(csv_cache, raw_file):
+    pytest.importorskip('seaborn')
+    import reporting.analyze as az
+    df = raw_file('output.csv', rows=20)
+    aly = az.Analyze(file_name=os.path.join(utl.raw_path, 'output.csv'))
+    assert len(aly.df) == 20
+    assert aly.df.columns.tolist() == df.columns.tolist()
+    assert not os.path.isdir(os.path.join(utl.cache_path, 'raw'))
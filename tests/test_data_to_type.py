@@ -0,0 +1,92 @@
+import pytest
+import numpy as np
+import pandas as pd
+import reporting.utils as utl
+
+skip_functions = ['float_convert_skip', 'date_convert_skip',
+                  'str_convert_skip', 'int_convert_skip']
+
+
+@pytest.fixture
+def disable_skips(monkeypatch):
+    utl.conversions.clear()
+
+    def disable():
+        for name in skip_functions:
+            monkeypatch.setattr(utl, name, lambda df, col: False)
+    yield disable
+    utl.conversions.clear()
+
+
+@pytest.fixture
+def typed_df():
+    return pd.DataFrame({
+        'float': [1.5, np.nan, 3.25, 0.0],
+        'float_int': [1, 2, 3, 4],
+        'float_str': ['$1,000.50', 'nan', '2', 'NA'],
+        'date': pd.to_datetime(['2020-01-01', None, '2020-02-29',
+                                '2019-12-31']),
+        'date_str': ['1/1/2020', '1/0/1900', '2/29/2020', '12/31/2019'],
+        'str': ['a', 'b', 'c', 'd'],
+        'str_mixed': ['a', 1, 2.5, 'd'],
+        'int': [1, 2, 3, 4]})
+
+
+def convert(df):
+    return utl.data_to_type(
+        df, float_col=['float', 'float_int', 'float_str', 'missing'],
+        date_col=['date', 'date_str', 'missing'],
+        str_col=['str', 'str_mixed', 'missing'], int_col=['int', 'missing'])
+
+
+def test_data_to_type_matches_conversion(typed_df, disable_skips):
+    df = convert(typed_df.copy())
+    assert utl.conversions == {
+        ('float', 'skipped'): 2, ('float', 'converted'): 1,
+        ('date', 'skipped'): 1, ('date', 'converted'): 1,
+        ('str', 'skipped'): 1, ('str', 'converted'): 1,
+        ('int', 'skipped'): 1}
+    assert df['float'].tolist() == [1.5, 0, 3.25, 0]
+    assert df['float_str'].tolist() == [1000.5, 0, 2, 0]
+    assert df['str_mixed'].tolist() == ['a', '1', '2.5', 'd']
+    disable_skips()
+    pd.testing.assert_frame_equal(df, convert(typed_df.copy()))
+
+
+def test_data_to_type_matches_conversion_when_typed(typed_df,
+                                                    disable_skips):
+    df = convert(typed_df)
+    utl.conversions.clear()
+    typed = convert(df.copy())
+    assert not utl.conversions.get(('float', 'converted'))
+    assert not utl.conversions.get(('date', 'converted'))
+    disable_skips()
+    pd.testing.assert_frame_equal(typed, convert(df.copy()))
+
+
+def test_vm_loop_matches_conversion(raw_file, vendor_row, matrix_file,
+                                    run_vm_loop, disable_skips):
+    raw_file('vendor.csv', rows=100)
+    matrix_file([vendor_row('Rawfile_A', 'vendor.csv')])
+    df = run_vm_loop(calculate=True)
+    disable_skips()
+    edf = run_vm_loop(calculate=True)
+    assert df.columns.tolist() == edf.columns.tolist()
+    assert len(df) == 100
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(edf[col]):
+            assert np.allclose(df[col], edf[col], rtol=1e-12, atol=0,
+                               equal_nan=True), col
+        else:
+            pd.testing.assert_series_equal(df[col], edf[col])
+
+
+@pytest.mark.parametrize('dtype', ['int32', 'uint8', 'Int64'])
+def test_int_conversion_of_other_int_dtypes(typed_df, disable_skips, dtype):
+    typed_df['int'] = typed_df['int'].astype(dtype)
+    df = convert(typed_df.copy())
+    assert df['int'].dtype == np.dtype(int)
+    assert utl.conversions[('int', 'converted')] == 1
+    assert not utl.conversions.get(('int', 'skipped'))
+    disable_skips()
+    pd.testing.assert_frame_equal(df, convert(typed_df.copy()))
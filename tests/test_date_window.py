@@ -0,0 +1,51 @@
+import os
+import pytest
+import pandas as pd
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_df, raw_file, vendor_row, matrix_file):
+    df = raw_df(rows=200)
+    df.loc[df['Day'] == '01/01/2020', 'Ad'] = 'adearly'
+    raw_file('vendor.csv', df)
+    matrix_file([
+        vendor_row('Rawfile_Window', 'vendor.csv', **{
+            vmc.startdate: '1/3/2020', vmc.enddate: '1/6/2020'}),
+        vendor_row('Rawfile_Open', 'vendor_open.csv')])
+    raw_file('vendor_open.csv', rows=50, seed=1)
+    dates = pd.to_datetime(df['Day'])
+    return ((dates >= '2020-01-03') & (dates <= '2020-01-06')).sum()
+
+
+@pytest.fixture
+def removed(monkeypatch):
+    removed = {}
+    date_window_removal = vm.DataSource.date_window_removal
+
+    def count_removal(self, df):
+        tdf = date_window_removal(self, df)
+        removed[self.key] = removed.get(self.key, 0) + len(df) - len(tdf)
+        return tdf
+    monkeypatch.setattr(vm.DataSource, 'date_window_removal', count_removal)
+    return removed
+
+
+def test_date_window_matches_late_removal(vendor_keys, removed, run_vm_loop,
+                                          monkeypatch):
+    df = run_vm_loop(calculate=True)
+    assert removed == {'Rawfile_Window': 200 - vendor_keys,
+                       'Rawfile_Open': 0}
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_Window': vendor_keys, 'Rawfile_Open': 50}
+    dict_file = os.path.join(utl.dict_path, 'Rawfile_Window_dictionary.csv')
+    dic = pd.read_csv(dict_file)
+    assert dic[dctc.FPN].str.contains('adearly').any()
+    assert not df[dctc.FPN].str.contains('adearly').any()
+    monkeypatch.setattr(vm.DataSource, 'date_window_removal',
+                        lambda self, tdf: tdf)
+    pd.testing.assert_frame_equal(run_vm_loop(calculate=True), df)
+    pd.testing.assert_frame_equal(pd.read_csv(dict_file), dic)
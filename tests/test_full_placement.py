@@ -0,0 +1,114 @@
+import pytest
+import numpy as np
+import pandas as pd
+import reporting.utils as utl
+import reporting.dictcolumns as dctc
+import reporting.vendormatrix as vm
+
+full_col = 'Full Placement Name'
+full_place_col_sets = [
+    ['Campaign', 'Vendor'],
+    ['Campaign', '::Vendor', 'Rate', '::Ad'],
+    ['::Ad', 'Campaign', 'Missing', 'Ad Copy'],
+    ['Missing', 'Vendor', 'Vendor'],
+    [full_col, 'Campaign'],
+    ['Missing']]
+
+
+@pytest.fixture
+def placement_memo():
+    vm.placement_memo.clear()
+    yield vm.placement_memo
+    vm.placement_memo.clear()
+
+
+def row_wise_creation(df, key, full_col, full_place_cols):
+    str_cols = [x[2:] if x[:2] == '::' else x for x in full_place_cols]
+    df = utl.data_to_type(df, str_col=str_cols)
+    return vm.full_placement_names(df, full_col, full_place_cols)
+
+
+def get_fuzz_df(seed, rows=500):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({
+        'Campaign': rng.choice(['Camp_1', 'Camp2', np.nan, ''], rows),
+        'Vendor': rng.choice(['Ven_a', 'Ven_b_c', 'Vend'], rows),
+        'Ad': rng.choice(['ad_1', 'ad__2', 'ad3', np.nan], rows),
+        'Rate': rng.choice([1, 2.5, np.nan], rows),
+        'Clicks': rng.randint(10, size=rows)})
+    df['Ad Copy'] = df['Ad']
+    return df
+
+
+@pytest.mark.parametrize('full_place_cols', full_place_col_sets)
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_factorized_matches_row_wise(full_place_cols, seed, placement_memo):
+    df = get_fuzz_df(seed)
+    if full_col in full_place_cols:
+        df[full_col] = df['Vendor']
+    expected = row_wise_creation(df.copy(), 'Test', full_col,
+                                 full_place_cols)
+    for _ in range(2):
+        result = vm.full_placement_creation(df.copy(), 'Test', full_col,
+                                            full_place_cols)
+        pd.testing.assert_frame_equal(result, expected)
+    assert len(placement_memo) == (full_place_cols != ['Missing'])
+
+
+def test_unique_combinations(placement_memo):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({
+        'a': rng.choice(['x', 'y', np.nan], 300),
+        'b': rng.randint(3, size=300),
+        'c': rng.choice(['p_q', 'r', 's_t'], 300)})
+    cols = ['a', 'b', '::c']
+    df = vm.full_placement_creation(df, 'Plan Net', dctc.PFPN, cols)
+    assert df.columns.tolist() == ['a', 'b', 'c', dctc.PFPN]
+    assert df[dctc.PFPN].nunique() == 27
+    assert sorted(df['c'].unique()) == ['pq', 'r', 'st']
+    assert len(placement_memo) == 1
+
+
+def test_memo_matches_row_wise_on_reordered_rows(placement_memo):
+    full_place_cols = ['Campaign', '::Vendor', '::Ad']
+    df = get_fuzz_df(3)
+    vm.full_placement_creation(df.copy(), 'Test', full_col, full_place_cols)
+    for seed in [4, 5]:
+        sdf = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+        result = vm.full_placement_creation(sdf.copy(), 'Test', full_col,
+                                            full_place_cols)
+        expected = row_wise_creation(sdf.copy(), 'Test', full_col,
+                                     full_place_cols)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_memo_is_bounded(placement_memo, monkeypatch):
+    monkeypatch.setattr(vm, 'placement_memo_size', 2)
+    for seed in range(4):
+        vm.full_placement_creation(get_fuzz_df(seed), 'Test', full_col,
+                                   ['Campaign', 'Vendor'])
+    assert len(placement_memo) == 2
+
+
+def test_empty_frame_matches_row_wise():
+    full_place_cols = ['Campaign', '::Vendor']
+    df = get_fuzz_df(0).iloc[:0]
+    result = vm.full_placement_creation(df.copy(), 'Test', full_col,
+                                        full_place_cols)
+    expected = row_wise_creation(df.copy(), 'Test', full_col,
+                                 full_place_cols)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_vm_loop_matches_row_wise(raw_file, vendor_row, matrix_file,
+                                  run_vm_loop, placement_memo, monkeypatch):
+    raw_file('vendor_0.csv', rows=150)
+    raw_file('vendor_1.csv', rows=90, seed=1)
+    matrix_file([vendor_row('Rawfile_0', 'vendor_0.csv'),
+                 vendor_row('Rawfile_1', 'vendor_1.csv')])
+    df = run_vm_loop(calculate=True)
+    assert len(df) == 240
+    assert df[dctc.FPN].notnull().all()
+    assert placement_memo
+    monkeypatch.setattr(vm, 'full_placement_creation', row_wise_creation)
+    pd.testing.assert_frame_equal(run_vm_loop(calculate=True), df)
@@ -0,0 +1,150 @@
+import os
+import logging
+import pytest
+import reporting.profiler as prf
+import reporting.history as hst
+
+
+@pytest.fixture
+def history(tmpdir):
+    return hst.RunHistory(str(tmpdir.join('run_history.db')))
+
+
+def get_report(day, rows, wall=1.):
+    return {
+        'start': '2020-01-{:02d}T00:00:00'.format(day), 'wall': wall,
+        'max_rss': 1000,
+        'stages': [
+            {'stage': 'vendor', 'key': 'Rawfile_A', 'calls': 1,
+             'wall': wall, 'self_wall': wall, 'cpu': wall,
+             'peak_memory': 0},
+            {'stage': 'api_loop/connector fb', 'key': 'API_Facebook',
+             'calls': 2, 'wall': 4., 'self_wall': 4., 'cpu': 1.,
+             'peak_memory': 0},
+            {'stage': 'export', 'key': 'DB', 'calls': 1, 'wall': .5,
+             'self_wall': .5, 'cpu': .5, 'peak_memory': 0}],
+        'counters': [
+            {'name': 'rows_read', 'key': 'Rawfile_A', 'value': rows},
+            {'name': 'rows_output', 'key': 'Rawfile_A', 'value': rows - 1},
+            {'name': 'file_size', 'key': 'Rawfile_A', 'value': rows * 10},
+            {'name': 'import_rows', 'key': 'API_Facebook', 'value': 7},
+            {'name': 'export_rows', 'key': 'DB', 'value': rows}]}
+
+
+def test_add_run(history):
+    assert history.add_run(get_report(1, 100), 'main.py --api all') == 1
+    assert history.add_run(get_report(3, 150, 2.)) == 2
+    vdf = history.read_table('vendors')
+    assert vdf['run'].tolist() == [1, 2]
+    assert vdf['rows_read'].tolist() == [100, 150]
+    assert vdf['rows_output'].tolist() == [99, 149]
+    assert vdf['file_size'].tolist() == [1000, 1500]
+    assert vdf['wall'].tolist() == [1., 2.]
+    cdf = history.read_table('connectors')
+    assert cdf[['connector', 'vendor_key', 'invocations', 'rows']
+               ].values.tolist() == [['fb', 'API_Facebook', 2, 7]] * 2
+    assert history.read_table('exports')['rows'].tolist() == [100, 150]
+    assert len(history.read_table('vendors', runs=1)) == 1
+
+
+def test_growth(history):
+    for day, rows in [(1, 100), (2, 120), (5, 200)]:
+        history.add_run(get_report(day, rows))
+    df = history.get_growth(history.read_table('vendors'), 'vendor_key',
+                            'rows_read')
+    assert df.loc['Rawfile_A', 'runs'] == 3
+    assert df.loc['Rawfile_A', 'growth'] == 1.
+    assert df.loc['Rawfile_A', 'per_day'] == 25.
+    df = history.get_slowest_connectors(history.read_table('connectors'))
+    assert df['latency'].tolist() == [2.]
+
+
+def test_query(history, caplog):
+    caplog.set_level(logging.INFO)
+    history.query()
+    assert 'No runs recorded' in caplog.text
+    history.add_run(get_report(1, 100))
+    history.add_run(get_report(2, 120))
+    caplog.clear()
+    history.query()
+    assert 'Slowest vendors' in caplog.text
+    assert 'Slowest connectors' in caplog.text
+    assert 'Fastest growing exports' in caplog.text
+    assert 'failed' not in caplog.text
+    history.add_run(get_report(3, 130), 'main.py --api all', hst.FAILED)
+    caplog.clear()
+    history.query()
+    assert '1 of the last 30 runs failed' in caplog.text
+
+
+def test_failed_runs(history):
+    history.add_run(get_report(1, 100), 'first')
+    history.add_run(get_report(2, 100), 'second', hst.FAILED)
+    history.add_run(get_report(3, 100), 'third', hst.FINISHED)
+    df = history.get_failed_runs()
+    assert df[['id', 'arguments']].values.tolist() == [[2, 'second']]
+    assert history.get_failed_runs(runs=1).empty
+
+
+def test_vm_loop_counters(raw_file, vendor_row, matrix_file, run_vm_loop,
+                          tmpdir):
+    raw_file('vendor_0.csv', rows=150)
+    raw_file('vendor_1.csv', rows=90, seed=1)
+    matrix_file([vendor_row('Rawfile_0', 'vendor_0.csv'),
+                 vendor_row('Rawfile_1', 'vendor_1.csv')])
+    for processes in [1, 2]:
+        prf.start(memory=False)
+        try:
+            run_vm_loop(processes=processes)
+            report = prf.get_report()
+        finally:
+            prf.stop()
+            prf.records.clear()
+            prf.counters.clear()
+        file_name = str(tmpdir.join('history_{}.db'.format(processes)))
+        hst.add_run(report, file_name=file_name)
+        vdf = hst.RunHistory(file_name).read_table('vendors')
+        vdf = vdf.set_index('vendor_key')
+        assert vdf.loc[['Rawfile_0', 'Rawfile_1'], 'rows_read'].tolist() == [
+            150, 90]
+        assert vdf.loc[['Rawfile_0', 'Rawfile_1'], 'rows_output'].tolist(
+            ) == [150, 90]
+        assert vdf.loc['Rawfile_0', 'file_size'] == os.path.getsize(
+            os.path.join('raw_data', 'vendor_0.csv'))
+        assert vdf.loc[['Rawfile_0', 'Rawfile_1'], 'wall'].notnull().all()
+
+
+def test_history_file_in_config(project):
+    history = hst.RunHistory()
+    assert os.path.isfile(os.path.join('config', 'run_history.db'))
+    assert history.file_name == hst.history_file
+
+
+@pytest.fixture
+def main_module(project, monkeypatch):
+    try:
+        import main
+    except ImportError as e:
+        pytest.skip('main could not be imported: {}'.format(e))
+    monkeypatch.setattr(main, 'set_log', lambda: None)
+    return main
+
+
+@pytest.mark.parametrize('error,status', [
+    (None, hst.FINISHED), (SystemExit(0), hst.FINISHED),
+    (SystemExit(1), hst.FAILED), (ValueError('boom'), hst.FAILED)])
+def test_main_records_status(main_module, monkeypatch, error, status):
+    def process(args):
+        if error:
+            raise error
+    monkeypatch.setattr(main_module, 'process', process)
+    if error:
+        with pytest.raises(type(error)):
+            main_module.main('--noprocess')
+    else:
+        main_module.main('--noprocess')
+    con = hst.RunHistory().connect()
+    runs = con.execute('SELECT arguments, status FROM runs').fetchall()
+    con.close()
+    assert runs == [('--noprocess', status)]
+    assert not prf.enabled
@@ -0,0 +1,34 @@
+import pytest
+import pandas as pd
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    rows = []
+    for idx in range(3):
+        file_name = 'vendor_{}.csv'.format(idx)
+        raw_file(file_name, seed=idx, rows=100 + idx)
+        rows.append(vendor_row('Rawfile_{}'.format(idx), file_name))
+    rows.append(vendor_row('Rawfile_Shared', 'vendor_0.csv', **{
+        vmc.filenamedict: rows[0][vmc.filenamedict]}))
+    matrix_file(rows)
+    return [x[vmc.vendorkey] for x in rows]
+
+
+def test_parallel_matches_serial(vendor_keys, run_vm_loop):
+    df = run_vm_loop()
+    pdf = run_vm_loop(processes=3)
+    rows = df[vmc.vendorkey].value_counts()
+    assert rows.to_dict() == {'Rawfile_0': 100, 'Rawfile_1': 101,
+                              'Rawfile_2': 102, 'Rawfile_Shared': 100}
+    assert pdf.columns.tolist() == df.columns.tolist()
+    pd.testing.assert_frame_equal(pdf, df)
+
+
+def test_parallel_groups_shared_dictionaries(vendor_keys):
+    matrix = vm.VendorMatrix()
+    groups = matrix.group_shared_files(vendor_keys)
+    assert ['Rawfile_0', 'Rawfile_Shared'] in groups
+    assert len(groups) == 3
@@ -0,0 +1,60 @@
+import argparse
+import pytest
+import pandas as pd
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    rows = []
+    for idx in range(3):
+        file_name = 'vendor_{}.csv'.format(idx)
+        raw_file(file_name, seed=idx, rows=30 + idx)
+        rows.append(vendor_row('Rawfile_{}'.format(idx), file_name))
+    rows.append(vendor_row('Rawfile_SameFile', 'vendor_2.csv'))
+    matrix_file(rows)
+    return [x[vmc.vendorkey] for x in rows]
+
+
+def get_args(**kwargs):
+    args = {'api': None, 'ftp': None, 'dbi': None, 's3': None,
+            'vendor': None, 'cache': False, 'stream': False,
+            'chunksize': None, 'processes': 2, 'compact': False,
+            'sparse': False}
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+
+def test_groups_keys_reading_same_file(vendor_keys):
+    groups = vm.VendorMatrix().group_shared_files(vendor_keys)
+    assert groups == [['Rawfile_0'], ['Rawfile_1'],
+                      ['Rawfile_2', 'Rawfile_SameFile']]
+
+
+def test_pipeline_processes_after_imports(vendor_keys, raw_file,
+                                          monkeypatch):
+    try:
+        import reporting.pipeline as pl
+    except ImportError as e:
+        pytest.skip('Connector dependencies missing: {}'.format(e))
+    imported = []
+
+    def import_vendor_2():
+        raw_file('vendor_2.csv', seed=9, rows=45)
+        imported.append('Rawfile_2')
+
+    def import_fails():
+        raise ValueError('connector down')
+    tasks = [('one', [('Rawfile_2', import_vendor_2)]),
+             ('two', [('Rawfile_1', import_fails)])]
+    monkeypatch.setattr(pl.Pipeline, 'get_import_tasks', lambda self: tasks)
+    matrix = vm.VendorMatrix()
+    df = pl.Pipeline(get_args(), matrix).run()
+    assert imported == ['Rawfile_2']
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_0': 30, 'Rawfile_1': 31, 'Rawfile_2': 45,
+        'Rawfile_SameFile': 45}
+    pd.testing.assert_frame_equal(
+        df.dropna(axis=1, how='all'),
+        vm.VendorMatrix().vm_loop().dropna(axis=1, how='all'))
@@ -0,0 +1,49 @@
+import pytest
+import pandas as pd
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.accumulator as acm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    raw_file('vendor_0.csv', rows=150)
+    raw_file('vendor_1.csv', rows=90, seed=1)
+    matrix_file([vendor_row('Rawfile_0', 'vendor_0.csv'),
+                 vendor_row('Rawfile_1', 'vendor_1.csv')])
+
+
+@pytest.fixture
+def key_sizes(monkeypatch):
+    sizes = []
+    get_keys = acm.FrameAccumulator.get_keys
+
+    def spy_keys(self):
+        df = get_keys(self)
+        sizes.append((len(df), sum(len(x) for x in self.frames)))
+        return df
+    monkeypatch.setattr(acm.FrameAccumulator, 'get_keys', spy_keys)
+    return sizes
+
+
+def test_plan_keys_match_full_frame(vendor_keys, key_sizes, run_vm_loop,
+                                    monkeypatch):
+    df = run_vm_loop(calculate=True)
+    assert len(key_sizes) == 1
+    assert key_sizes[0][1] == 240
+    assert key_sizes[0][0] <= 12
+    assert df[dctc.PFPN].nunique() == 6
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_0': 150, 'Rawfile_1': 90}
+    monkeypatch.setattr(acm.FrameAccumulator, 'get_keys',
+                        acm.FrameAccumulator.get)
+    pd.testing.assert_frame_equal(run_vm_loop(calculate=True), df)
+
+
+def test_plan_keys_match_full_frame_chunked(vendor_keys, run_vm_loop,
+                                            monkeypatch):
+    df = run_vm_loop(calculate=True, chunksize=40)
+    monkeypatch.setattr(acm.FrameAccumulator, 'get_keys',
+                        acm.FrameAccumulator.get)
+    pd.testing.assert_frame_equal(run_vm_loop(calculate=True, chunksize=40),
+                                  df)
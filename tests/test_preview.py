@@ -0,0 +1,105 @@
+import os
+import pytest
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.vendormatrix as vm
+import reporting.errorreport as er
+
+
+@pytest.fixture
+def vendor_keys(raw_df, raw_file, vendor_row, matrix_file):
+    df = raw_df(rows=300)
+    df['Row'] = df.index
+    df['Unmapped'] = 'x'
+    raw_file('plain.csv', df)
+    df = raw_df(rows=100, seed=1)
+    df = df.melt(id_vars=['Day', 'Campaign', 'Vendor', 'Buy Model',
+                          'Buy Rate', 'Ad'], var_name='Metric',
+                 value_name='Value')
+    raw_file('pivot.csv', df)
+    df = raw_df(rows=80, seed=2)
+    df.loc[len(df) - 1, 'Ad'] = 'ad_late'
+    lines = [','.join(['Report'] + [''] * 8),
+             ','.join(['Range'] + [''] * 8), df.to_csv(index=False).strip(),
+             ','.join(['Grand Total'] + [''] * 8)]
+    with open(os.path.join(utl.raw_path, 'report.csv'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    matrix_file([
+        vendor_row('Rawfile_Plain', 'plain.csv', **{vmc.lastrow: 5}),
+        vendor_row('Rawfile_Report', 'report.csv',
+                   **{vmc.firstrow: 2, vmc.lastrow: 1}),
+        vendor_row('Rawfile_Pivot', 'pivot.csv',
+                   **{vmc.transform: 'Pivot::Metric::Value',
+                      vmc.impressions: 'Value - Imps',
+                      vmc.clicks: 'Value - Clicks',
+                      vmc.cost: 'Value - Spend'})])
+
+
+def get_data_source(key):
+    return vm.VendorMatrix().get_data_source(key)
+
+
+def get_error_file(key):
+    return os.path.join(er.csvpath, '{}_error.csv'.format(key))
+
+
+@pytest.mark.parametrize('key', ['Rawfile_Plain', 'Rawfile_Pivot',
+                                 'Rawfile_Report'])
+def test_preview_columns_match_exact(vendor_keys, key, monkeypatch):
+    monkeypatch.setattr(vm, 'preview_rows', 20)
+    columns = get_data_source(key).get_raw_columns()
+    exact = get_data_source(key).get_raw_columns(exact=True)
+    assert columns.tolist() == exact.tolist()
+    if key == 'Rawfile_Pivot':
+        assert {'Value - Imps', 'Value - Clicks', 'Value - Spend'} <= set(
+            columns)
+
+
+@pytest.mark.parametrize('key', ['Rawfile_Plain', 'Rawfile_Pivot',
+                                 'Rawfile_Report'])
+def test_preview_dict_order_matches_exact(vendor_keys, key, monkeypatch):
+    monkeypatch.setattr(vm, 'preview_rows', 20)
+    monkeypatch.setattr(vm, 'preview_chunksize', 25)
+    error = get_data_source(key).get_dict_order_df()
+    assert not os.path.exists(get_error_file(key))
+    exact = get_data_source(key).get_dict_order_df(exact=True)
+    assert os.path.exists(get_error_file(key))
+    assert sorted(error[dctc.FPN]) == sorted(exact[dctc.FPN])
+    assert len(error) == (9 if key == 'Rawfile_Report' else 8)
+
+
+def test_head_preview_trims_footer(vendor_keys, monkeypatch):
+    source = get_data_source('Rawfile_Report')
+    df = source.get_raw_preview()
+    assert len(df) == 80
+    assert 'Grand Total' not in df['Day'].tolist()
+    assert df['Ad'].iloc[-1] == 'ad_late'
+    monkeypatch.setattr(vm, 'preview_rows', 20)
+    df = get_data_source('Rawfile_Report').get_raw_preview()
+    assert len(df) == 20
+    assert df.columns.tolist()[:2] == ['Day', 'Campaign']
+
+
+def test_raw_sample_is_bounded(vendor_keys, monkeypatch):
+    monkeypatch.setattr(vm, 'preview_sample_rows', 30)
+    monkeypatch.setattr(vm, 'preview_chunksize', 25)
+    source = get_data_source('Rawfile_Plain')
+    sample = source.get_raw_sample()
+    assert 0 < len(sample) <= 30
+    assert sample['Row'].is_monotonic_increasing
+    assert sample['Row'].max() < 295
+    df = utl.import_read_csv(source.p[vmc.filename]).set_index('Row')
+    assert (sample.set_index('Row') == df.loc[sample['Row']]).all().all()
+    assert sample.equals(source.get_raw_sample())
+
+
+def test_preview_columns_include_unmapped(vendor_keys, monkeypatch):
+    monkeypatch.setattr(vm, 'preview_rows', 20)
+    source = get_data_source('Rawfile_Plain')
+    assert 'Unmapped' not in source.get_projection()
+    columns = source.get_raw_columns().tolist()
+    assert columns[-3:] == ['Row', 'Unmapped', dctc.FPN]
+    assert get_data_source('Rawfile_Plain').get_raw_columns(
+        exact=True).tolist() == columns
+    assert 'Unmapped' in get_data_source('Rawfile_Plain').get_raw_preview()
@@ -0,0 +1,91 @@
+import json
+import time
+import pytest
+import pandas as pd
+import reporting.profiler as prf
+
+
+@pytest.fixture
+def profiler():
+    prf.start(memory=False)
+    yield prf
+    prf.stop()
+    prf.records.clear()
+    prf.counters.clear()
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    raw_file('vendor_0.csv', rows=150)
+    raw_file('vendor_1.csv', rows=90, seed=1)
+    matrix_file([vendor_row('Rawfile_0', 'vendor_0.csv'),
+                 vendor_row('Rawfile_1', 'vendor_1.csv')])
+
+
+def get_stages(report):
+    return {(x['stage'], x['key']): x for x in report['stages']}
+
+
+def test_disabled_stage_records_nothing():
+    prf.records.clear()
+    with prf.stage('outer'):
+        pass
+    assert prf.get_records() == []
+
+
+def test_nested_stages(profiler):
+    for _ in range(3):
+        with prf.stage('outer', 'Rawfile_A'):
+            with prf.stage('inner'):
+                time.sleep(.01)
+    with prf.stage('other'):
+        pass
+    stages = get_stages(prf.get_report())
+    assert sorted(stages) == [('other', None), ('outer', 'Rawfile_A'),
+                              ('outer/inner', 'Rawfile_A')]
+    outer = stages[('outer', 'Rawfile_A')]
+    inner = stages[('outer/inner', 'Rawfile_A')]
+    assert outer['calls'] == inner['calls'] == 3
+    assert inner['wall'] >= .03
+    assert outer['self_wall'] == pytest.approx(
+        outer['wall'] - inner['wall'])
+
+
+def test_memory_peak(profiler):
+    prf.stop()
+    prf.start(memory=True)
+    with prf.stage('outer'):
+        with prf.stage('inner'):
+            data = [0] * 10 ** 6
+            del data
+    stages = get_stages(prf.get_report())
+    assert stages[('outer/inner', None)]['peak_memory'] >= 8 * 10 ** 6
+    assert stages[('outer', None)]['peak_memory'] >= 8 * 10 ** 6
+
+
+def test_write_report(profiler, tmpdir):
+    with prf.stage('outer'):
+        pass
+    file_name = str(tmpdir.join('profile.json'))
+    prf.write_report(prf.get_report(), file_name)
+    with open(file_name, 'r') as f:
+        report = json.load(f)
+    assert [x['stage'] for x in report['stages']] == ['outer']
+    assert report['worker_records'] == 0
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_vm_loop_stages(vendor_keys, run_vm_loop, profiler, processes):
+    df = run_vm_loop(calculate=True, processes=processes)
+    stages = get_stages(prf.get_report())
+    prefix = 'vendor_get_parallel/' if processes > 1 else ''
+    for key in ['Rawfile_0', 'Rawfile_1']:
+        assert stages[(prefix + 'vendor', key)]['calls'] == 1
+        assert (prefix + 'vendor/get_raw_df', key) in stages
+        assert (prefix + 'vendor/combine_data', key) in stages
+    assert stages[('vendor/import_plan_data', 'Plan Net')]['calls'] == 1
+    assert ('merge_vendors', None) in stages
+    assert ('calculate_cost', None) not in stages
+    prf.stop()
+    pd.testing.assert_frame_equal(
+        run_vm_loop(calculate=True, processes=processes), df)
@@ -0,0 +1,54 @@
+import pytest
+import pandas as pd
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_df, raw_file, vendor_row, matrix_file):
+    df = raw_df(rows=60)
+    df['Junk'] = 'x'
+    df['Notes'] = range(len(df))
+    raw_file('vendor.csv', df)
+    matrix_file([vendor_row('Rawfile_Proj', 'vendor.csv'),
+                 vendor_row('Rawfile_Keep', 'vendor.csv',
+                            **{vmc.dropcol: 'Junk'})])
+    return ['Rawfile_Proj', 'Rawfile_Keep']
+
+
+def test_projection_columns(vendor_keys):
+    matrix = vm.VendorMatrix()
+    source = matrix.get_data_source('Rawfile_Proj')
+    projection = source.get_projection()
+    assert {'Day', 'Campaign', 'Vendor', 'Buy Model', 'Buy Rate', 'Ad',
+            'Imps', 'Clicks', 'Spend'} <= projection
+    assert not {'Junk', 'Notes'} & projection
+    df = source.get_raw_df(project=True)
+    assert len(df) == 60
+    assert df.columns.tolist() == [
+        'Day', 'Campaign', 'Vendor', 'Buy Model', 'Buy Rate', 'Ad', 'Imps',
+        'Clicks', 'Spend', dctc.FPN]
+    assert matrix.get_data_source('Rawfile_Keep').get_projection() is None
+
+
+def test_raw_columns_are_not_projected(vendor_keys):
+    matrix = vm.VendorMatrix()
+    source = matrix.get_data_source('Rawfile_Proj')
+    columns = ['Day', 'Campaign', 'Vendor', 'Buy Model', 'Buy Rate', 'Ad',
+               'Imps', 'Clicks', 'Spend', 'Junk', 'Notes', dctc.FPN]
+    assert source.get_raw_df().columns.tolist() == columns
+    assert source.get_raw_columns(exact=True).tolist() == columns
+    error = matrix.get_data_source('Rawfile_Proj').get_dict_order_df(
+        exact=True)
+    assert len(error) == 8
+
+
+def test_projection_matches_full_read(vendor_keys, run_vm_loop, monkeypatch):
+    df = run_vm_loop(calculate=True)
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_Proj': 60, 'Rawfile_Keep': 60}
+    assert 'Notes' in df.columns
+    assert df.loc[df[vmc.vendorkey] == 'Rawfile_Proj', 'Notes'].isnull().all()
+    monkeypatch.setattr(vm.DataSource, 'get_projection', lambda self: None)
+    pd.testing.assert_frame_equal(run_vm_loop(calculate=True), df)
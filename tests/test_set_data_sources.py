@@ -0,0 +1,54 @@
+import os
+import pytest
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    raw_file('vendor.csv', rows=10)
+    matrix_file([vendor_row('Rawfile_A', 'vendor.csv'),
+                 vendor_row('Rawfile_B', 'vendor.csv')])
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    written = []
+    write_vm = vm.write_vm
+
+    def spy(df, *args):
+        written.append(len(df))
+        return write_vm(df, *args)
+    monkeypatch.setattr(vm, 'write_vm', spy)
+    return written
+
+
+def get_source(vk, **kwargs):
+    source = {'original_vendor_key': vk, vmc.vendorkey: vk,
+              vmc.placement: 'Campaign', vmc.autodicplace: dctc.FPN,
+              vmc.autodicord: '\r\n'.join([dctc.CAM, dctc.VEN]),
+              vmc.fullplacename: 'Campaign\r\nVendor',
+              'active_metrics': {vmc.clicks: ['Clicks'],
+                                 vmc.impressions: ['Imps']}}
+    source.update(kwargs)
+    return source
+
+
+def test_set_data_sources(vendor_keys, writes):
+    matrix = vm.VendorMatrix()
+    matrix.set_data_sources([
+        get_source('Rawfile_A', **{vmc.vendorkey: 'Rawfile_Renamed',
+                                   vmc.placement: 'Vendor'}),
+        get_source('Rawfile_B', active_metrics={
+            vmc.clicks: ['Clicks', 'Clicks2']})])
+    assert writes == [3]
+    assert not os.path.isfile('{}.tmp'.format(vm.csv_full_file))
+    matrix = vm.VendorMatrix()
+    assert sorted(x for x in matrix.vm[vmc.placement].items()
+                  if x[0] != vm.plan_key) == [
+        ('Rawfile_B', 'Campaign'), ('Rawfile_Renamed', 'Vendor')]
+    assert matrix.vm[vmc.fullplacename]['Rawfile_B'] == [
+        'Campaign', 'Vendor']
+    assert matrix.vm[vmc.clicks]['Rawfile_B'] == ['Clicks', 'Clicks2']
+    assert matrix.vm[vmc.impressions]['Rawfile_Renamed'] == ['Imps']
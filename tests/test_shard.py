@@ -0,0 +1,115 @@
+import os
+import time
+import pytest
+import threading
+import pandas as pd
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+import reporting.shard as sh
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    rows = []
+    for idx in range(4):
+        file_name = 'vendor_{}.csv'.format(idx)
+        raw_file(file_name, seed=idx, rows=20 + 10 * idx)
+        rows.append(vendor_row('Rawfile_{}'.format(idx), file_name))
+    rows.append(vendor_row('Rawfile_Shared', 'vendor_4.csv', **{
+        vmc.filenamedict: rows[0][vmc.filenamedict]}))
+    raw_file('vendor_4.csv', seed=4, rows=15)
+    matrix_file(rows)
+    return [x[vmc.vendorkey] for x in rows]
+
+
+@pytest.fixture(autouse=True)
+def file_lock():
+    yield
+    vm.set_shared_file_lock(None)
+
+
+@pytest.fixture
+def queue(project):
+    return sh.ShardQueue(os.path.join(sh.shard_path, 'test'))
+
+
+def test_queue_claim_and_requeue(queue):
+    queue.publish('run_a', [['a', 'b'], ['c']], chunksize=10)
+    queue.publish('run_b', [['d']])
+    shard = queue.claim('worker_1', 'run_a')
+    assert shard == {'id': 1, 'run': 'run_a', 'keys': ['a', 'b'],
+                     'chunksize': 10}
+    assert queue.claim('worker_2', 'run_a')['keys'] == ['c']
+    assert queue.claim('worker_2', 'run_a') is None
+    queue.set_status(shard['id'], sh.FAILED, 'boom')
+    queue.requeue_stale('run_a', timeout=-1)
+    assert [(x['status'], x['worker']) for x in queue.get_run('run_a')] == [
+        (sh.FAILED, 'worker_1'), (sh.PENDING, None)]
+    assert queue.get_run('run_a')[0]['error'] == 'boom'
+    assert queue.claim('worker_3')['keys'] == ['c']
+    assert queue.claim('worker_3')['keys'] == ['d']
+
+
+def test_get_shards_keeps_groups_together(vendor_keys):
+    coordinator = sh.ShardCoordinator(vm.VendorMatrix())
+    shards = coordinator.get_shards(2, vendor_keys)
+    assert len(shards) == 2
+    assert sorted(x for y in shards for x in y) == sorted(vendor_keys)
+    assert any({'Rawfile_0', 'Rawfile_Shared'} <= set(x) for x in shards)
+
+
+def test_sharded_matches_vm_loop(vendor_keys):
+    matrix = vm.VendorMatrix()
+    matrix.sort_vendor_list()
+    df = sh.vm_loop_sharded(matrix, 3, workers=2)
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_0': 20, 'Rawfile_1': 30, 'Rawfile_2': 40, 'Rawfile_3': 50,
+        'Rawfile_Shared': 15}
+    assert sorted(os.listdir(sh.shard_path)) == [sh.lock_file, sh.queue_file]
+    pd.testing.assert_frame_equal(
+        df.dropna(axis=1, how='all'),
+        vm.VendorMatrix().vm_loop().dropna(axis=1, how='all'))
+
+
+def test_merge_processes_failed_shards_locally(vendor_keys, monkeypatch):
+    matrix = vm.VendorMatrix()
+    matrix.sort_vendor_list()
+    coordinator = sh.ShardCoordinator(matrix)
+    coordinator.queue.publish(coordinator.run_id,
+                              [['Rawfile_1'], ['Rawfile_2']])
+    shard = coordinator.queue.claim('lost_worker', coordinator.run_id)
+    coordinator.queue.set_status(shard['id'], sh.FAILED, 'node lost')
+    local = []
+    vendor_get = vm.VendorMatrix.vendor_get
+
+    def spy(self, vk, *args):
+        local.append(vk)
+        return vendor_get(self, vk, *args)
+    monkeypatch.setattr(vm.VendorMatrix, 'vendor_get', spy)
+    tdfs = coordinator.merge(coordinator.wait())
+    assert local == ['Rawfile_1']
+    assert sorted(tdfs) == ['Rawfile_1', 'Rawfile_2']
+    assert len(tdfs['Rawfile_1']) == 30
+    assert len(tdfs['Rawfile_2']) == 40
+    assert not os.path.isdir(os.path.join(sh.shard_path,
+                                          coordinator.run_id))
+
+
+def test_file_lock_serialises_holders(project):
+    sh.set_file_lock(sh.shard_path)
+    assert isinstance(vm.shared_file_lock, sh.FileLock)
+    events = []
+
+    def hold(name):
+        with sh.FileLock(os.path.join(sh.shard_path, sh.lock_file)):
+            events.append((name, 'start'))
+            time.sleep(.1)
+            events.append((name, 'end'))
+    with vm.shared_file_access():
+        thread = threading.Thread(target=hold, args=('thread',))
+        thread.start()
+        time.sleep(.1)
+        events.append(('main', 'end'))
+    thread.join()
+    assert events == [('main', 'end'), ('thread', 'start'),
+                      ('thread', 'end')]
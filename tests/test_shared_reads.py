@@ -0,0 +1,104 @@
+import os
+import pytest
+import pandas as pd
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+shared_keys = ['Rawfile_A', 'Rawfile_B', 'Rawfile_C']
+
+
+@pytest.fixture
+def vendor_keys(raw_df, raw_file, vendor_row, matrix_file):
+    df = raw_df(rows=100)
+    df['Junk'] = 'junk'
+    raw_file('shared.csv', df)
+    raw_file('single.csv', rows=60, seed=1)
+    matrix_file([vendor_row('Rawfile_A', 'shared.csv'),
+                 vendor_row('Rawfile_B', 'shared.csv',
+                            **{vmc.clicks: 'nan', vmc.lastrow: 10}),
+                 vendor_row('Rawfile_C', 'shared.csv',
+                            **{vmc.dropcol: 'Junk'}),
+                 vendor_row('Rawfile_D', 'single.csv')])
+
+
+@pytest.fixture
+def full_reads(monkeypatch):
+    reads = {}
+    import_read_csv = utl.import_read_csv
+
+    def spy_read(filename, *args, **kwargs):
+        if (kwargs.get('nrows') is None and
+                str(filename).startswith(utl.raw_path)):
+            name = os.path.basename(str(filename))
+            reads[name] = reads.get(name, 0) + 1
+        return import_read_csv(filename, *args, **kwargs)
+    monkeypatch.setattr(utl, 'import_read_csv', spy_read)
+    return reads
+
+
+def test_set_shared_raw_files(vendor_keys):
+    matrix = vm.VendorMatrix()
+    vm.set_shared_raw_files([matrix.get_data_source(x)
+                             for x in shared_keys[:2] + ['Rawfile_D']])
+    file_name = os.path.join(utl.raw_path, 'shared.csv')
+    assert list(vm.shared_raw_files) == [file_name]
+    shared = vm.shared_raw_files[file_name]
+    assert shared['keys'] == {'Rawfile_A', 'Rawfile_B'}
+    assert 'Junk' not in shared['usecols']
+    assert {'Day', 'Imps', 'Clicks', 'Spend'} <= shared['usecols']
+    vm.set_shared_raw_files([matrix.get_data_source(x)
+                             for x in shared_keys])
+    assert vm.shared_raw_files[file_name]['usecols'] is None
+    for key in shared_keys:
+        vm.release_shared_raw_file(key)
+    assert not vm.shared_raw_files
+
+
+def test_shared_reads_match_separate_reads(vendor_keys, run_vm_loop,
+                                           full_reads, monkeypatch):
+    df = run_vm_loop(calculate=True)
+    assert full_reads == {'shared.csv': 1, 'single.csv': 1}
+    assert not vm.shared_raw_files
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_A': 100, 'Rawfile_B': 90, 'Rawfile_C': 100, 'Rawfile_D': 60}
+    assert 'Junk' not in df
+    full_reads.clear()
+    monkeypatch.setattr(vm, 'set_shared_raw_files',
+                        lambda data_sources: vm.shared_raw_files.clear())
+    pd.testing.assert_frame_equal(run_vm_loop(calculate=True), df)
+    assert full_reads == {'shared.csv': 3, 'single.csv': 1}
+
+
+def test_shared_file_released_by_last_key(vendor_keys, run_vm_loop,
+                                          monkeypatch):
+    held = []
+    read_raw_file = vm.read_raw_file
+
+    def spy_read(file_name, usecols=None, key=None):
+        df = read_raw_file(file_name, usecols, key)
+        held.append((os.path.basename(file_name),
+                     file_name in vm.shared_raw_files))
+        return df
+    monkeypatch.setattr(vm, 'read_raw_file', spy_read)
+    run_vm_loop()
+    assert held == [('shared.csv', True), ('shared.csv', True),
+                    ('shared.csv', False), ('single.csv', False)]
+
+
+def test_shared_file_released_when_key_skips_read(vendor_keys, run_vm_loop,
+                                                  full_reads, monkeypatch):
+    import_data = vm.DataSource.import_data
+    held = []
+
+    def skip_import(self, chunksize=None):
+        held.append((self.key, bool(vm.shared_raw_files)))
+        if self.key == 'Rawfile_C':
+            return None
+        return import_data(self, chunksize)
+    monkeypatch.setattr(vm.DataSource, 'import_data', skip_import)
+    df = run_vm_loop()
+    assert [x[0] for x in held] == shared_keys + ['Rawfile_D']
+    assert [x[1] for x in held] == [True, True, True, False]
+    assert full_reads == {'shared.csv': 1, 'single.csv': 1}
+    assert 'Rawfile_C' not in df[vmc.vendorkey].unique()
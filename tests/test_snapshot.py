@@ -0,0 +1,84 @@
+import os
+import types
+import pytest
+import datetime as dt
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    compiled = []
+    vm_compile = vm.VendorMatrix.vm_compile
+
+    def spy(self):
+        compiled.append(vm.csv_full_file)
+        return vm_compile(self)
+    monkeypatch.setattr(vm.VendorMatrix, 'vm_compile', spy)
+    return compiled
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    raw_file('vendor.csv', rows=10)
+    rows = [vendor_row('Rawfile_A', 'vendor.csv')]
+    matrix_file(rows)
+    return rows
+
+
+def test_get_snapshot_reloads_on_change(project):
+    file_name = os.path.join(utl.config_path, 'snap.txt')
+    loads = []
+
+    def load():
+        loads.append(file_name)
+        with open(file_name, 'r') as f:
+            return {'text': f.read(), 'items': [1]}
+    with open(file_name, 'w') as f:
+        f.write('one')
+    value = utl.get_snapshot('test', file_name, load)
+    value['items'].append(2)
+    assert utl.get_snapshot('test', file_name, load) == {
+        'text': 'one', 'items': [1]}
+    assert len(loads) == 1
+    with open(file_name, 'w') as f:
+        f.write('two!')
+    assert utl.get_snapshot('test', file_name, load)['text'] == 'two!'
+    assert len(loads) == 2
+    utl.drop_snapshot(file_name)
+    utl.get_snapshot('test', file_name, load)
+    assert len(loads) == 3
+    utl.get_snapshot('test', file_name, load, version=1)
+    utl.get_snapshot('test', file_name, load, version=1)
+    assert len(loads) == 4
+
+
+def test_vendor_matrix_snapshot(vendor_keys, compiles, matrix_file,
+                                vendor_row):
+    matrix = vm.VendorMatrix()
+    matrix.vm[vmc.placement]['Rawfile_A'] = 'Changed'
+    matrix = vm.VendorMatrix()
+    assert len(compiles) == 1
+    assert matrix.vm[vmc.placement]['Rawfile_A'] == 'Campaign'
+    assert matrix.vl == ['Rawfile_A', vm.plan_key]
+    matrix_file(vendor_keys + [vendor_row('Rawfile_B', 'vendor.csv')])
+    matrix = vm.VendorMatrix()
+    assert len(compiles) == 2
+    assert matrix.vl == ['Rawfile_A', 'Rawfile_B', vm.plan_key]
+
+
+def test_vendor_matrix_snapshot_expires_daily(vendor_keys, compiles,
+                                              monkeypatch):
+    vm.VendorMatrix()
+    vm.VendorMatrix()
+    assert len(compiles) == 1
+
+    class Tomorrow(dt.date):
+        @classmethod
+        def today(cls):
+            return dt.date.today() + dt.timedelta(days=1)
+    monkeypatch.setattr(vm, 'dt', types.SimpleNamespace(date=Tomorrow))
+    vm.VendorMatrix()
+    vm.VendorMatrix()
+    assert len(compiles) == 2
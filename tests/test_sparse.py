@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+import pandas as pd
+import reporting.calc as cal
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+
+
+@pytest.fixture
+def vendor_keys(raw_df, raw_file, vendor_row, matrix_file):
+    df = raw_df(rows=200)
+    df['Clicks'] = np.where(df.index % 25 == 0, df['Clicks'], 0)
+    raw_file('vendor_0.csv', df)
+    raw_file('vendor_1.csv', rows=50, seed=1)
+    matrix_file([vendor_row('Rawfile_0', 'vendor_0.csv'),
+                 vendor_row('Rawfile_1', 'vendor_1.csv',
+                            **{vmc.clicks: 'nan'})])
+
+
+def test_sparse_columns():
+    df = pd.DataFrame({'a': [0., 0., 0., 1.5] * 5, 'b': [1., 2., 0., 3.] * 5,
+                       'c': ['x'] * 20})
+    df = utl.sparse_columns(df, ['a', 'b', 'c', 'missing'])
+    assert pd.api.types.is_float_dtype(df['b'])
+    assert df['c'].dtype == object
+    assert not pd.api.types.is_sparse(df['a'])
+    df['a'] = [0.] * 19 + [1.5]
+    df = utl.sparse_columns(df, ['a'])
+    assert pd.api.types.is_sparse(df['a'])
+    df = utl.dense_columns(df)
+    assert df['a'].dtype == float
+    assert df['a'].tolist() == [0.] * 19 + [1.5]
+
+
+def test_get_empty_columns():
+    df = pd.DataFrame({'a': [0, 0], 'b': [np.nan, np.nan], 'c': [0, 1],
+                       'd': ['', 'x']})
+    assert utl.get_empty_columns(df, ['a', 'b', 'c', 'd', 'e']) == ['a', 'b']
+
+
+def test_sparse_matches_dense_output(vendor_keys, run_vm_loop):
+    df = run_vm_loop()
+    sdf = run_vm_loop(sparse=True)
+    assert pd.api.types.is_sparse(sdf[vmc.clicks])
+    assert not pd.api.types.is_sparse(sdf[vmc.impressions])
+    assert sdf.columns.tolist() == df.columns.tolist()
+    assert len(sdf) == 250
+    df = cal.calculate_cost(df)
+    sdf = cal.calculate_cost(sdf)
+    assert sdf.columns.tolist() == df.columns.tolist()
+    assert sdf[vmc.clicks].sum() == df[vmc.clicks].sum()
+    assert sdf.to_csv(index=False) == df.to_csv(index=False)
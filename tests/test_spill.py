@@ -0,0 +1,120 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import reporting.calc as cal
+import reporting.utils as utl
+import reporting.vmcolumns as vmc
+import reporting.dictcolumns as dctc
+import reporting.accumulator as acm
+
+
+@pytest.fixture
+def over_budget(monkeypatch):
+    stages = []
+
+    def memory_check(stage):
+        stages.append(stage)
+        return True
+    monkeypatch.setattr(utl, 'memory_check', memory_check)
+    return stages
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    raw_file('vendor.csv', rows=80)
+    matrix_file([vendor_row('Rawfile_Spill', 'vendor.csv')])
+
+
+def test_size_conversion():
+    assert utl.size_to_bytes('4G') == 4 * 1024 ** 3
+    assert utl.size_to_bytes('512mb') == 512 * 1024 ** 2
+    assert utl.size_to_bytes('1000') == 1000
+    assert utl.bytes_to_size(1536) == '1.5KB'
+
+
+def test_spill_memory_threshold():
+    try:
+        utl.set_spill_memory(None)
+        assert not utl.memory_check('test')
+        utl.set_spill_memory('1K')
+        assert utl.spill_memory == 1024
+        assert utl.memory_check('test')
+    finally:
+        utl.set_spill_memory(None)
+
+
+def test_column_spill_restores_row_order(over_budget):
+    df = pd.DataFrame({vmc.vendorkey: ['a', 'b', 'c', 'd'],
+                       vmc.clicks: [1., 2., 3., 4.],
+                       'Notes': ['n1', 'n2', 'n3', 'n4']},
+                      columns=['Notes', vmc.vendorkey, vmc.clicks])
+    spill = cal.ColumnSpill()
+    sdf = spill.check(df, 'test')
+    assert over_budget == ['test']
+    assert sdf.columns.tolist() == [vmc.vendorkey, vmc.clicks, cal.SPILL_ROW]
+    assert os.path.isfile(spill.file_name)
+    file_name = spill.file_name
+    sdf = sdf.iloc[[2, 0, 3, 1, 1]]
+    sdf = spill.restore(sdf)
+    assert not os.path.isfile(file_name)
+    assert sdf.columns.tolist() == ['Notes', vmc.vendorkey, vmc.clicks]
+    assert sdf['Notes'].tolist() == ['n3', 'n1', 'n4', 'n2', 'n2']
+    assert sdf[vmc.vendorkey].tolist() == ['c', 'a', 'd', 'b', 'b']
+
+
+def test_calculate_cost_with_spill(vendor_keys, run_vm_loop, monkeypatch):
+    df = run_vm_loop(calculate=True)
+    restores = []
+    restore = cal.ColumnSpill.restore
+
+    def spy(self, tdf):
+        restores.append(self.columns)
+        return restore(self, tdf)
+    monkeypatch.setattr(cal.ColumnSpill, 'restore', spy)
+    monkeypatch.setattr(utl, 'memory_check', lambda stage: True)
+    sdf = run_vm_loop(calculate=True)
+    assert len(sdf) == 80
+    assert sdf.columns.tolist() == df.columns.tolist()
+    assert restores[0]
+    pd.testing.assert_frame_equal(sdf, df)
+
+
+def test_accumulator_spills_over_budget(project, monkeypatch):
+    acc = acm.FrameAccumulator(columns=[vmc.date], path=str(project))
+    acc.add('a', pd.DataFrame({'Ad': ['x', 'y'], vmc.clicks: [1, 2]}))
+    assert not acc.stream
+    monkeypatch.setattr(utl, 'memory_check', lambda stage: True)
+    acc.add('b', pd.DataFrame({vmc.clicks: [3.5], 'Campaign': ['c']}))
+    assert acc.stream
+    assert acc.spilled == 2
+    df = acc.get()
+    assert df.columns.tolist() == ['Ad', 'Campaign', vmc.clicks, vmc.date]
+    assert len(df) == 3
+    assert df[vmc.clicks].tolist() == [1, 2, 3.5]
+    assert df['Ad'].tolist()[:2] == ['x', 'y']
+    assert np.isnan(df['Ad'].tolist()[2])
+
+
+def test_calculate_cost_spill_on_shuffled_rows(vendor_keys, run_vm_loop,
+                                               monkeypatch):
+    df = run_vm_loop()
+    df = df.sample(frac=1, random_state=0)
+    df.index = df.index[::-1]
+    edf = cal.calculate_cost(df.copy())
+    monkeypatch.setattr(utl, 'memory_check', lambda stage: True)
+    sdf = cal.calculate_cost(df.copy())
+    assert cal.SPILL_ROW not in sdf
+    assert sdf.index.tolist() == edf.index.tolist()
+    cols = [dctc.CRE, dctc.CAM, vmc.clicks]
+    assert sdf[cols].values.tolist() == edf[cols].values.tolist()
+    pd.testing.assert_frame_equal(sdf, edf)
+
+
+def test_max_memory_alias(project):
+    try:
+        import main
+    except ImportError as e:
+        pytest.skip('main could not be imported: {}'.format(e))
+    assert main.get_args('--max-memory 4G').spill_memory == '4G'
+    assert main.get_args('--spill-memory 1G').spill_memory == '1G'
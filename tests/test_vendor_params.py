@@ -0,0 +1,64 @@
+import pickle
+import pytest
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    raw_file('vendor.csv', rows=10)
+    keys = ['API_Facebook_Test', 'API_Adwords_Test', 'FTP_Sizmek_Test',
+            'Rawfile_Test']
+    matrix_file([vendor_row(x, 'vendor.csv') for x in keys])
+    return keys
+
+
+def test_vendor_params_read_only(vendor_keys):
+    matrix = vm.VendorMatrix()
+    record = matrix.records['Rawfile_Test']
+    with pytest.raises(AttributeError):
+        record.values = ()
+    assert vmc.filename in record
+    assert 'Missing' not in record
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy.key == 'Rawfile_Test'
+    assert copy.index == record.index
+    assert [str(x) for x in copy.values] == [str(x) for x in record.values]
+
+
+def test_vendor_set_matches_matrix(vendor_keys):
+    matrix = vm.VendorMatrix()
+    matrix.sort_vendor_list()
+    for vk in vendor_keys + [vm.plan_key]:
+        params = matrix.vendor_set(vk)
+        assert params == {x: matrix.vm[x][vk] for x in matrix.vm}
+        assert matrix.vendor_param(vk, vmc.filename) == params[vmc.filename]
+    params = matrix.vendor_set('Rawfile_Test')
+    assert params[vmc.filename].endswith('vendor.csv')
+    assert params[vmc.fullplacename] == [
+        'Campaign', 'Vendor', 'Buy Model', 'Buy Rate', '::Ad']
+    params[vmc.startdate] = None
+    assert matrix.vendor_set('Rawfile_Test')[vmc.startdate] is not None
+
+
+def test_vendor_params_lists_are_copies(vendor_keys):
+    matrix = vm.VendorMatrix()
+    record = matrix.records['Rawfile_Test']
+    full_place_cols = record[vmc.fullplacename]
+    full_place_cols.append('Missing')
+    matrix.vendor_set('Rawfile_Test')[vmc.fullplacename].append('Missing')
+    record.to_dict()[vmc.fullplacename].append('Missing')
+    matrix.vendor_param('Rawfile_Test', vmc.fullplacename).append('Missing')
+    assert record[vmc.fullplacename] == full_place_cols[:-1]
+    assert 'Missing' not in matrix.vm[vmc.fullplacename]['Rawfile_Test']
+    assert 'Missing' not in matrix.vendor_set('Rawfile_Test')[
+        vmc.fullplacename]
+
+
+def test_vm_import_keys(vendor_keys):
+    matrix = vm.VendorMatrix()
+    assert matrix.api_fb_key == ['API_Facebook_Test']
+    assert matrix.api_aw_key == ['API_Adwords_Test']
+    assert matrix.ftp_sz_key == ['FTP_Sizmek_Test']
+    assert matrix.api_tw_key == []
+    assert matrix.s3_dna_key == []
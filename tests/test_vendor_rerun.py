@@ -0,0 +1,60 @@
+import pytest
+import pandas as pd
+import reporting.vmcolumns as vmc
+import reporting.vendormatrix as vm
+
+
+@pytest.fixture
+def vendor_keys(raw_file, vendor_row, matrix_file):
+    rows = []
+    for idx, name in enumerate(['Search_A', 'Search_B', 'Social_A']):
+        file_name = 'vendor_{}.csv'.format(idx)
+        raw_file(file_name, seed=idx, rows=40 + idx)
+        rows.append(vendor_row('Rawfile_{}'.format(name), file_name))
+    matrix_file(rows)
+    return [x[vmc.vendorkey] for x in rows]
+
+
+@pytest.fixture
+def imports(monkeypatch):
+    imported = []
+    vendor_get = vm.VendorMatrix.vendor_get
+
+    def spy(self, vk, *args):
+        if vk != vm.plan_key:
+            imported.append(vk)
+        return vendor_get(self, vk, *args)
+    monkeypatch.setattr(vm.VendorMatrix, 'vendor_get', spy)
+    return imported
+
+
+def sort_vendors(df):
+    df = df.dropna(axis=1, how='all')
+    df = df.sort_values(vmc.vendorkey, kind='mergesort')
+    return df.reset_index(drop=True)
+
+
+def test_get_vendor_keys(vendor_keys):
+    matrix = vm.VendorMatrix()
+    matrix.sort_vendor_list()
+    assert matrix.get_vendor_keys('Rawfile_Search_*') == [
+        'Rawfile_Search_A', 'Rawfile_Search_B']
+    assert matrix.get_vendor_keys('Rawfile_Social_A, Rawfile_S*_A') == [
+        'Rawfile_Social_A', 'Rawfile_Search_A']
+    assert matrix.get_vendor_keys('Missing') == []
+
+
+def test_vendor_rerun_matches_full_run(vendor_keys, imports, raw_file,
+                                       run_vm_loop):
+    vm.VendorMatrix().vm_loop(cache=True)
+    del imports[:]
+    raw_file('vendor_1.csv', seed=7, rows=55)
+    raw_file('vendor_2.csv', seed=8, rows=65)
+    df = vm.VendorMatrix().vm_loop(vendors='Rawfile_Search_B')
+    assert imports == ['Rawfile_Search_B']
+    assert df[vmc.vendorkey].value_counts().to_dict() == {
+        'Rawfile_Search_A': 40, 'Rawfile_Search_B': 55,
+        'Rawfile_Social_A': 42}
+    raw_file('vendor_2.csv', seed=2, rows=42)
+    pd.testing.assert_frame_equal(sort_vendors(df),
+                                  sort_vendors(run_vm_loop()))
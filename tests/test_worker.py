@@ -0,0 +1,71 @@
+import os
+import json
+import pytest
+import pandas as pd
+import reporting.utils as utl
+import reporting.worker as wk
+
+
+@pytest.fixture
+def csv_memo(project):
+    yield utl.set_csv_memo
+    utl.set_csv_memo([])
+
+
+@pytest.fixture
+def csv_reads(monkeypatch):
+    reads = []
+    read_csv = pd.read_csv
+
+    def spy(*args, **kwargs):
+        reads.append(args[0])
+        return read_csv(*args, **kwargs)
+    monkeypatch.setattr(pd, 'read_csv', spy)
+    return reads
+
+
+def test_strip_args():
+    assert wk.strip_args('--worker --watch --noprocess --cache') == (
+        '--noprocess --cache')
+    assert wk.strip_args('--submit') == ''
+
+
+def test_worker_runs_submitted_jobs(project):
+    calls = []
+
+    def main(arguments):
+        calls.append(arguments)
+        if arguments == 'fail':
+            raise ValueError('bad job')
+    first = wk.submit_job('--submit --noprocess')
+    second = wk.submit_job('fail')
+    worker = wk.Worker(main, poll=0)
+    worker.run(max_jobs=2)
+    assert calls == ['--noprocess', 'fail']
+    assert worker.get_jobs() == []
+    assert os.listdir(worker.run_path) == []
+    results = {}
+    for name in [first, second]:
+        with open(os.path.join(worker.done_path,
+                               '{}.json'.format(name))) as f:
+            results[name] = json.load(f)
+    assert results[first]['status'] == 'success'
+    assert results[first]['arguments'] == '--noprocess'
+    assert results[second]['status'] == 'error bad job'
+
+
+def test_csv_memo_reads_once(csv_memo, csv_reads, raw_file):
+    file_name = os.path.join(utl.config_path, 'memo.csv')
+    pd.DataFrame({'a': [1, 2]}).to_csv(file_name, index=False)
+    csv_memo([utl.config_path])
+    df = utl.import_read_csv(file_name)
+    df['a'] = 0
+    assert utl.import_read_csv(file_name)['a'].tolist() == [1, 2]
+    assert csv_reads == [file_name]
+    raw_file('vendor.csv', rows=5)
+    utl.import_read_csv(os.path.join(utl.raw_path, 'vendor.csv'))
+    utl.import_read_csv(os.path.join(utl.raw_path, 'vendor.csv'))
+    assert len(csv_reads) == 3
+    pd.DataFrame({'a': [1, 2, 3]}).to_csv(file_name, index=False)
+    assert utl.import_read_csv(file_name)['a'].tolist() == [1, 2, 3]
+    assert len(csv_reads) == 4